@@ -1,6 +1,6 @@
 from dotenv import load_dotenv
 import os
-from typing import List, Dict
+from typing import Any, List, Dict, Optional
 
 # Load environment variables
 load_dotenv()
@@ -38,9 +38,181 @@ os.makedirs(LOGS_DIR, exist_ok=True)
 # CORS Configuration
 CORS_ORIGINS = ["https://roamresearch.com"]
 
+# Startup
+# Load the model and brain indexes in the background at startup; /api/v1/ready
+# answers 503 until this finishes. Disable to load everything on first use.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Embedding Backend
+# Runtime that encodes blocks and queries: "torch" (PyTorch), "onnx" (ONNX
+# Runtime) or "onnx-int8" (ONNX Runtime on a dynamically quantized export of
+# the same model, usually the fastest on CPU). The ONNX backends need
+# `pip install optimum[onnxruntime]`; the *_FILE settings name the export
+# inside the model repository. "hash" is a model-free hashed n-gram encoder
+# for tests and benchmarks: deterministic, offline and instant, but only
+# lexically "semantic". Indexes record the model and dimension they were
+# built with, and searching one with a different model is refused.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+EMBEDDING_QUANTIZED_FILE = os.getenv("EMBEDDING_QUANTIZED_FILE", "onnx/model_quint8_avx2.onnx")
+EMBEDDING_HASH_DIMENSION = int(os.getenv("EMBEDDING_HASH_DIMENSION", "384"))  # MiniLM's dimension
+
+# Embedding Batching
+# Blocks are embedded in batches of similar token length: each forward pass
+# pads its texts to the longest one, so a batch holds as many texts as fit
+# EMBEDDING_BATCH_TOKENS padded tokens (32 texts of MiniLM's 256-token
+# maximum), up to EMBEDDING_MAX_BATCH_SIZE short ones.
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "8192"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "256"))
+
+# Worker Pools
+# Query-time encoding/search and index-time embedding run in separate thread
+# pools so a running reindex cannot starve interactive searches.
+QUERY_WORKERS = int(os.getenv("QUERY_WORKERS", "2"))
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", "1"))
+
+# Query Embedding Batching
+# Concurrent queries arriving within the wait window share one encode() call.
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+
+# Query Embedding Cache
+# Repeated queries reuse their embedding instead of re-running the model.
+# A byte budget of 0 disables the cache; a TTL of 0 keeps entries until evicted.
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+
+# Search Result Cache
+# Results are cached per (brain, query, top_k, mode, filters) and index
+# generation, so entries go stale on reindex; a byte budget of 0 disables it.
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "0"))
+
+# Hybrid Search
+# Hybrid mode fetches top_k * HYBRID_DEPTH candidates from both the vector
+# and BM25 indexes and fuses them with reciprocal rank fusion.
+HYBRID_DEPTH = int(os.getenv("HYBRID_DEPTH", "4"))
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+
 # Available Brains
 BRAINS: List[str] = ["ideas", "marketing"]
 
+# Reindexing
+# Incremental reindexes re-embed only blocks whose content changed since the
+# last build and reuse the stored vectors of the rest; a full reindex (or a
+# changed embedding model) embeds everything.
+REINDEX_INCREMENTAL = os.getenv("REINDEX_INCREMENTAL", "true").lower() in ("1", "true", "yes")
+
+# Reindex Jobs
+# POST /api/v1/reindex starts a background job and returns its id at once;
+# its progress is polled from /api/v1/reindex/jobs/<id>. Jobs live in the
+# serving process, which keeps the most recent REINDEX_JOBS_KEEP finished ones.
+REINDEX_JOBS_KEEP = int(os.getenv("REINDEX_JOBS_KEEP", "20"))
+
+# Reindex Pipeline
+# Reindexes stream blocks through fetch, prepare, embed and write stages
+# that run concurrently, so Roam requests overlap with embedding. References
+# are fetched for REINDEX_PAGE_SIZE TOC blocks per query, the encoder takes
+# up to REINDEX_EMBED_CHUNK blocks at a time, and the queues between stages
+# together hold at most REINDEX_PIPELINE_MAX_BYTES; vectors go straight to
+# the new generation's files rather than accumulating in memory.
+REINDEX_PAGE_SIZE = int(os.getenv("REINDEX_PAGE_SIZE", "500"))
+REINDEX_EMBED_CHUNK = int(os.getenv("REINDEX_EMBED_CHUNK", "1024"))
+REINDEX_PIPELINE_MAX_BYTES = int(os.getenv("REINDEX_PIPELINE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Embedding Cache
+# Block embeddings are kept on disk as float16 rows keyed by encoder and
+# content hash, so a reindex (full or incremental, of any brain) encodes only
+# text the encoder has not seen. Entries no brain references any more are
+# dropped after EMBEDDING_CACHE_MAX_AGE_DAYS, and least recently used entries
+# go first once the cache outgrows its byte budget (0 disables the cache).
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", f"{DATA_DIR}/embedding_cache")
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+EMBEDDING_CACHE_MAX_AGE_DAYS = float(os.getenv("EMBEDDING_CACHE_MAX_AGE_DAYS", "30"))
+
+# Vector Index Configuration
+# Index type per brain: "flat" (exact), "ivf" (IVF-Flat), "hnsw", or the
+# compressed "sq8" (8-bit scalar), "pq" (product) and "ivfpq" types, whose
+# shortlists are re-ranked against the exact vectors in vectors_<brain>.npy.
+# Every setting can be given for all brains (INDEX_TYPE=hnsw) or for one
+# brain (INDEX_TYPE_IDEAS=hnsw). Query-time knobs (nprobe, ef_search,
+# rerank) are read when a brain is loaded, so they can be tuned without
+# reindexing.
+# Open indexes memory-mapped and read-only where the index type allows it,
+# so every uvicorn worker shares one page-cache copy instead of its own heap.
+INDEX_MMAP = os.getenv("INDEX_MMAP", "true").lower() in ("1", "true", "yes")
+
+INDEX_DEFAULTS: Dict[str, Any] = {
+    "type": "flat",
+    "nlist": 0,              # IVF cells; 0 = 4 * sqrt(rows)
+    "nprobe": 16,            # IVF cells scanned per query
+    "m": 32,                 # HNSW neighbours per node
+    "ef_construction": 200,  # HNSW build-time search depth
+    "ef_search": 64,         # HNSW query-time search depth
+    "pq_m": 48,              # PQ sub-quantizers; must divide the dimension
+    "pq_nbits": 8,           # Bits per PQ sub-quantizer code
+    "rerank": 4,             # Compressed types fetch top_k * rerank candidates
+    "min_ann_rows": 10000,   # Smaller brains always get a flat index
+    "filter_exact_rows": 10000,  # Filters selecting fewer rows are scanned exactly
+}
+
+# Files a brain needs before it can be searched; the rest are optional
+REQUIRED_FILES = ("index", "meta")
+
+# Index Generations
+# Each reindex writes a new directory under data/brains/<brain>/ with a
+# manifest and then atomically repoints data/brains/<brain>/CURRENT at it,
+# so readers always see one complete build. The newest GENERATIONS_KEEP
+# generations are kept for rollback. Brains without a CURRENT pointer are
+# read from the flat files of earlier releases until their next reindex.
+BRAINS_DIR = f"{DATA_DIR}/brains"
+GENERATIONS_KEEP = int(os.getenv("GENERATIONS_KEEP", "3"))
+
+def _check_brain(brain: str) -> None:
+    if brain not in BRAINS:
+        raise ValueError(f"Invalid brain: {brain}. Must be one of {BRAINS}")
+
+def current_generation(brain: str) -> Optional[str]:
+    """
+    Get the id of a brain's published generation.
+    
+    Args:
+        brain: Name of the brain (must be one of BRAINS)
+        
+    Returns:
+        The generation id, or None if the brain has never been published
+    """
+    _check_brain(brain)
+    try:
+        with open(f"{BRAINS_DIR}/{brain}/CURRENT", "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def generation_filenames(brain: str, generation: str) -> Dict[str, str]:
+    """
+    Get the paths for the files of one generation of a brain.
+    
+    Args:
+        brain: Name of the brain (must be one of BRAINS)
+        generation: Generation id
+        
+    Returns:
+        Dict with the same keys as get_filenames()
+    """
+    _check_brain(brain)
+    directory = f"{BRAINS_DIR}/{brain}/{generation}"
+    return {
+        "index": f"{directory}/index.faiss",
+        "meta": f"{directory}/metadata.bin",
+        "params": f"{directory}/params.json",
+        "vectors": f"{directory}/vectors.npy",
+        "lexical": f"{directory}/lexical",
+        "attrs": f"{directory}/attrs",
+        "blocks": f"{directory}/blocks.npz"
+    }
+
 def get_filenames(brain: str) -> Dict[str, str]:
     """
     Get the paths for brain-specific files.
@@ -49,12 +221,41 @@ def get_filenames(brain: str) -> Dict[str, str]:
         brain: Name of the brain (must be one of BRAINS)
         
     Returns:
-        Dict containing paths for index and metadata files
+        Dict containing paths for the index, metadata, index parameter,
+        full-precision vector and block state files, and the BM25 and block
+        attribute directories of .npy arrays, of the brain's published
+        generation
     """
-    if brain not in BRAINS:
-        raise ValueError(f"Invalid brain: {brain}. Must be one of {BRAINS}")
+    generation = current_generation(brain)
+    if generation is not None:
+        return generation_filenames(brain, generation)
         
     return {
         "index": f"{DATA_DIR}/index_{brain}.faiss",
-        "meta": f"{DATA_DIR}/metadata_{brain}.json"
-    } 
\ No newline at end of file
+        "meta": f"{DATA_DIR}/metadata_{brain}.bin",
+        "params": f"{DATA_DIR}/index_{brain}.params.json",
+        "vectors": f"{DATA_DIR}/vectors_{brain}.npy",
+        "lexical": f"{DATA_DIR}/lexical_{brain}",
+        "attrs": f"{DATA_DIR}/attrs_{brain}",
+        "blocks": f"{DATA_DIR}/blocks_{brain}.npz"
+    }
+
+def get_index_config(brain: str) -> Dict[str, Any]:
+    """
+    Get the vector index settings for a brain.
+    
+    Args:
+        brain: Name of the brain (must be one of BRAINS)
+        
+    Returns:
+        Dict of INDEX_DEFAULTS keys with environment overrides applied
+    """
+    if brain not in BRAINS:
+        raise ValueError(f"Invalid brain: {brain}. Must be one of {BRAINS}")
+        
+    config = {}
+    for key, default in INDEX_DEFAULTS.items():
+        name = f"INDEX_{key.upper()}"
+        value = os.getenv(f"{name}_{brain.upper()}", os.getenv(name))
+        config[key] = default if value is None else type(default)(value)
+    return config 
\ No newline at end of file
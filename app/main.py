@@ -10,6 +10,8 @@ from app.services.indexing import IndexingService
 from app.models.api import (
     SearchRequest,
     SearchResponse,
+    MultiSearchRequest,
+    MultiSearchResponse,
     ReindexRequest,
     ReindexResponse,
     HealthResponse
@@ -64,6 +66,30 @@ async def search(
         top_k=search_request.top_k
     )
 
+@app.post("/api/search/multi", response_model=MultiSearchResponse)
+async def search_multi(
+    request: Request,
+    search_request: MultiSearchRequest,
+    token: str = Depends(get_token)
+):
+    """
+    Multi-brain search endpoint.
+    
+    Args:
+        request: The FastAPI request object
+        search_request: The search parameters; brains defaults to every
+            brain the token may read
+        token: The validated authentication token
+        
+    Returns:
+        MultiSearchResponse: The merged results with per-brain stats
+    """
+    # Restrict to the brains this token may read
+    brains = security_service.permitted_brains(token, search_request.brains)
+    
+    # Perform search
+    return await search_service.search_multi(search_request, brains)
+
 @app.post("/api/reindex", response_model=ReindexResponse)
 async def reindex(
     request: Request,
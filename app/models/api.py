@@ -1,7 +1,7 @@
 """API request and response models."""
 
 from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from app.config import BRAINS
 
 # Create a Literal type from the BRAINS list
@@ -11,11 +11,25 @@ class HealthResponse(BaseModel):
     """Health check response."""
     status: str = Field(..., example="ok")
 
+class SearchFilters(BaseModel):
+    """Block attribute filters; every given condition must match."""
+    block_type: Optional[Literal["block", "reference"]] = Field(default=None, example="reference")
+    edited_after: Optional[int] = Field(default=None, ge=0, example=1704067200000)
+    edited_before: Optional[int] = Field(default=None, ge=0, example=1735689600000)
+    tags: Optional[List[str]] = Field(default=None, max_length=50, example=["launch"])
+    references: Optional[List[str]] = Field(default=None, max_length=50, example=["aBc12XyZ"])
+
+    def is_empty(self) -> bool:
+        """Check whether the filters leave every block selected."""
+        return not any(self.model_dump().values())
+
 class SearchRequest(BaseModel):
     """Search request model."""
     query: str = Field(..., min_length=1, example="project management")
     brain: BrainLiteral = Field(..., example="marketing")
     top_k: Optional[int] = Field(default=5, gt=0, le=100)
+    mode: Literal["semantic", "lexical", "hybrid"] = Field(default="semantic", example="hybrid")
+    filters: Optional[SearchFilters] = None
 
 class SearchResult(BaseModel):
     """Single search result."""
@@ -29,6 +43,48 @@ class SearchResponse(BaseModel):
     query: str = Field(..., example="project management")
     results: List[SearchResult]
     count: int = Field(..., example=5)
+    timings: Optional[Dict[str, float]] = Field(default=None, example={"semantic_ms": 12.5, "lexical_ms": 0.8})
+
+class BatchSearchQuery(BaseModel):
+    """Single query within a batch search."""
+    query: str = Field(..., min_length=1, example="launch checklist")
+    top_k: Optional[int] = Field(default=None, gt=0, le=100)
+
+class BatchSearchRequest(BaseModel):
+    """Batch search request model."""
+    brain: BrainLiteral = Field(..., example="marketing")
+    # Default for queries without their own top_k, so never null
+    top_k: int = Field(default=5, gt=0, le=100)
+    queries: List[BatchSearchQuery] = Field(..., min_length=1, max_length=50)
+    filters: Optional[SearchFilters] = None
+
+class BatchSearchResponse(BaseModel):
+    """Batch search response model."""
+    results: List[SearchResponse]
+    count: int = Field(..., example=2)
+
+class MultiSearchRequest(BaseModel):
+    """Multi-brain search request model."""
+    query: str = Field(..., min_length=1, example="project management")
+    brains: Optional[List[BrainLiteral]] = Field(default=None, min_length=1, example=["ideas", "marketing"])
+    top_k: Optional[int] = Field(default=5, gt=0, le=100)
+    mode: Literal["semantic", "lexical", "hybrid"] = Field(default="semantic", example="hybrid")
+    filters: Optional[SearchFilters] = None
+
+class BrainSearchStats(BaseModel):
+    """Per-brain outcome of a multi-brain search."""
+    count: int = Field(..., example=3)
+    latency_ms: float = Field(..., example=8.4)
+    timings: Optional[Dict[str, float]] = Field(default=None, example={"semantic_ms": 6.1})
+    error: Optional[str] = Field(default=None, example=None)
+
+class MultiSearchResponse(BaseModel):
+    """Multi-brain search response model."""
+    query: str = Field(..., example="project management")
+    results: List[SearchResult]
+    count: int = Field(..., example=5)
+    brains: Dict[str, BrainSearchStats]
+    timings: Optional[Dict[str, float]] = Field(default=None, example={"encode_ms": 9.7, "merge_ms": 0.1})
 
 class ReindexRequest(BaseModel):
     """Reindex request model."""
@@ -38,6 +94,25 @@ class ReindexResponse(BaseModel):
     """Reindex response model."""
     status: str = Field(..., example="success")
 
+class ReindexJobResponse(BaseModel):
+    """Background reindex job status."""
+    job_id: str = Field(..., example="3f2c9a7e0d5b4c1e8a6f2b9d4e7c1a05")
+    brains: List[BrainLiteral] = Field(..., example=["ideas", "marketing"])
+    full: bool = Field(default=False)
+    status: Literal["queued", "running", "succeeded", "failed"] = Field(..., example="running")
+    phase: Optional[Literal["fetch", "references", "embed", "build", "publish"]] = Field(default=None, example="embed")
+    blocks_done: int = Field(default=0, example=1200)
+    blocks_total: int = Field(default=0, example=4800)
+    throughput: Optional[float] = Field(default=None, example=85.3)
+    eta_seconds: Optional[float] = Field(default=None, example=42.2)
+    attached: int = Field(default=0, example=1)
+    results: Dict[str, dict] = Field(default_factory=dict)
+    errors: Dict[str, str] = Field(default_factory=dict, example={"marketing": "No blocks found under TOC - marketing"})
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
 class ErrorResponse(BaseModel):
     """Error response model."""
     detail: str = Field(..., example="Access denied to brain: ideas")
@@ -0,0 +1,76 @@
+"""Admin routes for inspecting in-process search state."""
+
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.services.auth import authenticate
+from app.services.registry import get_registry
+from app.services.generations import list_generations, rollback
+from app.services.search import get_query_batcher, get_query_cache, get_result_cache, get_single_flight
+
+router = APIRouter()
+
+@router.get("/admin/registry")
+async def registry_stats(auth: bool = Depends(authenticate)):
+    """Get brain registry hit/miss/reload counters and resident brains."""
+    return get_registry().stats()
+
+@router.get("/admin/query-batcher")
+async def query_batcher_stats(auth: bool = Depends(authenticate)):
+    """Get query embedding batch size and queueing delay metrics."""
+    return get_query_batcher().stats()
+
+@router.get("/admin/query-cache")
+async def query_cache_stats(
+    entries: int = Query(default=0, ge=0, le=1000),
+    auth: bool = Depends(authenticate)
+):
+    """Get query embedding cache size and hit ratio, optionally with recent keys."""
+    return get_query_cache().stats(entries=entries)
+
+@router.delete("/admin/query-cache")
+async def flush_query_cache(auth: bool = Depends(authenticate)):
+    """Drop every cached query embedding."""
+    return {"flushed": get_query_cache().clear()}
+
+@router.get("/admin/result-cache")
+async def result_cache_stats(
+    entries: int = Query(default=0, ge=0, le=1000),
+    auth: bool = Depends(authenticate)
+):
+    """Get search result cache size and hit ratio, optionally with recent keys."""
+    return get_result_cache().stats(entries=entries)
+
+@router.delete("/admin/result-cache")
+async def flush_result_cache(auth: bool = Depends(authenticate)):
+    """Drop every cached search result."""
+    return {"flushed": get_result_cache().clear()}
+
+@router.get("/admin/coalescing")
+async def coalescing_stats(auth: bool = Depends(authenticate)):
+    """Get how many searches joined an identical search already in flight."""
+    return get_single_flight().stats()
+
+@router.get("/admin/brains/{brain}/generations")
+async def brain_generations(brain: str, auth: bool = Depends(authenticate)):
+    """List a brain's kept index generations, newest first."""
+    try:
+        return {"brain": brain, "generations": list_generations(brain)}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.post("/admin/brains/{brain}/rollback")
+async def rollback_brain(
+    brain: str,
+    generation: Optional[str] = Query(default=None, description="Generation to publish; defaults to the previous one"),
+    auth: bool = Depends(authenticate)
+):
+    """Republish an earlier index generation of a brain."""
+    try:
+        published = rollback(brain, generation)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    get_registry().invalidate(brain)
+    get_result_cache().invalidate(brain)
+    return {"brain": brain, "generation": published}
@@ -1,6 +1,8 @@
 """Health check routes."""
 
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.warmup import get_readiness
 
 router = APIRouter()
 
@@ -12,4 +14,10 @@ async def health_check():
 @router.get("/ping")
 async def ping():
     """Ping endpoint."""
-    return {"message": "pong"} 
\ No newline at end of file
+    return {"message": "pong"}
+
+@router.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 once startup warm-up has finished, 503 before."""
+    readiness = get_readiness()
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.to_dict())
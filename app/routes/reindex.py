@@ -1,33 +1,44 @@
 """Reindex routes."""
 
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.schemas import ReindexResponse
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.models.api import BrainLiteral, ReindexJobResponse
 from app.services.auth import authenticate
-from app.services.indexing import reindex_brain
+from app.services.jobs import get_reindex_jobs
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/reindex")
-async def reindex_endpoint(auth: bool = Depends(authenticate)) -> ReindexResponse:
+@router.post("/reindex", status_code=202)
+async def reindex_endpoint(
+    brain: Optional[BrainLiteral] = Query(default=None, description="Brain to reindex; defaults to all brains"),
+    full: bool = Query(default=False, description="Re-encode every block, ignoring the last build and the embedding cache"),
+    auth: bool = Depends(authenticate)
+) -> ReindexJobResponse:
     """
-    Reindex both brains (ideas and work) from Roam API data.
+    Start reindexing brains from Roam API data in the background.
+
+    Returns the job at once; poll /reindex/jobs/{job_id} for its progress.
+    A request for brains already being reindexed returns the running job.
     """
     try:
-        # Reindex both brains
-        results = {}
-        for brain in ["ideas", "work"]:
-            result = await reindex_brain(brain)
-            results[brain] = result["blocks_processed"]
-            
-        total_blocks = sum(results.values())
-        return ReindexResponse(
-            status="success",
-            blocks_processed=total_blocks
-        )
-            
-    except Exception as e:
-        logger.exception("Reindex failed")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        job = get_reindex_jobs().submit(None if brain is None else [brain], full)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return ReindexJobResponse(**job.to_dict())
+
+@router.get("/reindex/jobs")
+async def reindex_jobs(auth: bool = Depends(authenticate)) -> List[ReindexJobResponse]:
+    """List kept reindex jobs, newest first."""
+    return [ReindexJobResponse(**job.to_dict()) for job in get_reindex_jobs().list()]
+
+@router.get("/reindex/jobs/{job_id}")
+async def reindex_job_status(job_id: str, auth: bool = Depends(authenticate)) -> ReindexJobResponse:
+    """Get a reindex job's phase, block progress, throughput and ETA."""
+    try:
+        job = get_reindex_jobs().get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Reindex job {job_id} not found")
+    return ReindexJobResponse(**job.to_dict())
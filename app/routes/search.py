@@ -1,8 +1,17 @@
 """Search routes."""
 
 from fastapi import APIRouter, HTTPException, Depends
-from app.models.api import SearchRequest, SearchResult, SearchResponse
-from app.services.search import search
+from app.models.api import (
+    SearchRequest,
+    SearchResult,
+    SearchResponse,
+    BatchSearchRequest,
+    BatchSearchResponse,
+    MultiSearchRequest,
+    MultiSearchResponse
+)
+from app.services.search import search, search_batch, search_multi
+from app.config import BRAINS
 from app.services.auth import authenticate
 from typing import List
 import logging
@@ -26,11 +35,13 @@ async def search_endpoint(request: SearchRequest, auth: bool = Depends(authentic
         HTTPException: If search fails
     """
     try:
-        results = await search(request)
+        timings = {}
+        results = await search(request, timings=timings)
         return SearchResponse(
             results=results,
             count=len(results),
-            query=request.query
+            query=request.query,
+            timings=timings or None
         )
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
@@ -39,4 +50,68 @@ async def search_endpoint(request: SearchRequest, auth: bool = Depends(authentic
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error("Search failed", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}") 
+
+@router.post("/search/batch")
+async def search_batch_endpoint(request: BatchSearchRequest, auth: bool = Depends(authenticate)) -> BatchSearchResponse:
+    """
+    Batch search endpoint.
+    
+    Args:
+        request: Brain, default top_k and the list of queries
+        auth: Authentication dependency
+        
+    Returns:
+        BatchSearchResponse: One SearchResponse per query, in request order
+        
+    Raises:
+        HTTPException: If search fails
+    """
+    try:
+        batches = await search_batch(request)
+        responses = [
+            SearchResponse(results=results, count=len(results), query=item.query)
+            for item, results in zip(request.queries, batches)
+        ]
+        return BatchSearchResponse(results=responses, count=len(responses))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Batch search failed", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+
+@router.post("/search/multi")
+async def search_multi_endpoint(request: MultiSearchRequest, auth: bool = Depends(authenticate)) -> MultiSearchResponse:
+    """
+    Multi-brain search endpoint.
+    
+    Args:
+        request: Query, brains (default: all brains) and search parameters
+        auth: Authentication dependency (admin tokens may read every brain)
+        
+    Returns:
+        MultiSearchResponse: Merged top-k with per-brain counts and latency
+        
+    Raises:
+        HTTPException: If search fails
+    """
+    try:
+        timings = {}
+        brains = list(dict.fromkeys(request.brains or BRAINS))
+        results, per_brain = await search_multi(request, brains, timings=timings)
+        return MultiSearchResponse(
+            results=results,
+            count=len(results),
+            query=request.query,
+            brains=per_brain,
+            timings=timings or None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Multi-brain search failed", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Multi-brain search failed: {str(e)}")
\ No newline at end of file
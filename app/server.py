@@ -1,16 +1,36 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import search, reindex, health
-from app.config import API_TITLE, API_VERSION, CORS_ORIGINS
+from app.routes import search, reindex, health, admin
+from app.config import API_TITLE, API_VERSION, CORS_ORIGINS, WARMUP_ON_STARTUP
+from app.services.executors import shutdown_executors
+from app.services.warmup import warm_up, mark_ready
 from app.utils.logging import setup_logging
 
 # Set up logging
 setup_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up in the background so health checks answer while it runs."""
+    warmup_task = None
+    if WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(warm_up())
+    else:
+        mark_ready()
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    shutdown_executors(wait=False)
 
 # Create FastAPI app
 app = FastAPI(
     title=API_TITLE,
-    version=API_VERSION
+    version=API_VERSION,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -26,6 +46,7 @@ app.add_middleware(
 app.include_router(search.router, prefix="/api/v1", tags=["search"])
 app.include_router(reindex.router, prefix="/api/v1", tags=["reindex"])
 app.include_router(health.router, prefix="/api/v1", tags=["health"])
+app.include_router(admin.router, prefix="/api/v1", tags=["admin"])
 
 # Root health check endpoint
 @app.get("/", tags=["health"])
@@ -0,0 +1,38 @@
+"""Directories of named .npy arrays, memory-mapped when read."""
+
+import os
+from typing import Dict, Sequence
+
+import numpy as np
+
+def save_arrays(path: str, arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Write each array as <path>/<name>.npy.
+
+    Args:
+        path: Directory to write, created if missing
+        arrays: Arrays by name
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        with open(os.path.join(path, f"{name}.npy"), "wb") as f:
+            np.save(f, array, allow_pickle=False)
+
+def load_arrays(path: str, names: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Map arrays written by save_arrays() read-only.
+
+    Only the pages a caller touches are read, and workers loading the same
+    files share them through the page cache instead of each holding a copy.
+
+    Args:
+        path: Directory written by save_arrays()
+        names: Names of the arrays to map
+
+    Returns:
+        Read-only memory-mapped arrays by name
+    """
+    return {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+        for name in names
+    }
@@ -0,0 +1,167 @@
+"""Columnar per-block attributes used to filter searches."""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from app.services.array_store import load_arrays, save_arrays
+
+BLOCK_TYPES = ("block", "reference")
+
+# Roam tags and page links: #[[Multi Word]], [[Page Name]] and #tag
+TAG_PATTERN = re.compile(r"#?\[\[([^\[\]]+)\]\]|#([\w-]+)")
+
+def extract_tags(text: str) -> List[str]:
+    """Get the distinct lowercase tags and page links in a block, in order."""
+    tags = []
+    for linked, hashed in TAG_PATTERN.findall(text):
+        tag = (linked or hashed).strip().lower()
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+def _pack_lists(lists: Sequence[Iterable[str]]) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Pack one list of strings per row into CSR arrays.
+
+    Returns:
+        Tuple of (row offsets, vocabulary ids, vocabulary); the values of
+        row r are vocab[ids[offsets[r]:offsets[r + 1]]]
+    """
+    vocab: Dict[str, int] = {}
+    ids: List[int] = []
+    offsets = np.zeros(len(lists) + 1, dtype="uint64")
+    for row, values in enumerate(lists):
+        for value in values:
+            ids.append(vocab.setdefault(value, len(vocab)))
+        offsets[row + 1] = len(ids)
+    return offsets, np.asarray(ids, dtype="uint32"), list(vocab)
+
+class BlockAttributes:
+    """
+    Filterable attributes of a brain's blocks, one entry per FAISS row.
+
+    Scalars are stored as plain columns and multi-valued attributes (tags,
+    referenced block uids) as CSR arrays over a per-brain vocabulary, so a
+    filter is evaluated with vectorized numpy operations into a row mask.
+    """
+
+    def __init__(
+        self,
+        block_types: np.ndarray,
+        edit_times: np.ndarray,
+        tag_offsets: np.ndarray,
+        tag_ids: np.ndarray,
+        tags: Sequence[str],
+        ref_offsets: np.ndarray,
+        ref_ids: np.ndarray,
+        refs: Sequence[str]
+    ):
+        self.block_types = block_types
+        self.edit_times = edit_times
+        self.tag_offsets = tag_offsets
+        self.tag_ids = tag_ids
+        self.tags = list(tags)
+        self.ref_offsets = ref_offsets
+        self.ref_ids = ref_ids
+        self.refs = list(refs)
+
+    def __len__(self) -> int:
+        return len(self.block_types)
+
+    @classmethod
+    def build(cls, blocks: Sequence[Dict[str, Any]]) -> "BlockAttributes":
+        """
+        Collect attributes from blocks in FAISS row order.
+
+        Args:
+            blocks: Block dicts as assembled by reindex_brain(), with
+                content, type, timestamp and (for references) the uids
+                of the blocks they reference
+
+        Returns:
+            The populated attributes
+        """
+        block_types = np.array(
+            [BLOCK_TYPES.index(block.get("type", "block")) for block in blocks], dtype="uint8"
+        )
+        edit_times = np.array([block.get("timestamp") or 0 for block in blocks], dtype="int64")
+        tag_offsets, tag_ids, tags = _pack_lists([extract_tags(block["content"]) for block in blocks])
+        ref_offsets, ref_ids, refs = _pack_lists([block.get("references") or [] for block in blocks])
+        return cls(block_types, edit_times, tag_offsets, tag_ids, tags, ref_offsets, ref_ids, refs)
+
+    def save(self, path: str) -> None:
+        """Write the attributes as a directory of .npy arrays."""
+        save_arrays(path, {
+            "block_types": self.block_types,
+            "edit_times": self.edit_times,
+            "tag_offsets": self.tag_offsets,
+            "tag_ids": self.tag_ids,
+            "tags": np.array(self.tags, dtype=str),
+            "ref_offsets": self.ref_offsets,
+            "ref_ids": self.ref_ids,
+            "refs": np.array(self.refs, dtype=str)
+        })
+
+    @classmethod
+    def load(cls, path: str) -> "BlockAttributes":
+        """Read attributes written by save(), mapping the columns read-only."""
+        data = load_arrays(path, (
+            "block_types", "edit_times", "tag_offsets", "tag_ids", "tags", "ref_offsets", "ref_ids", "refs"
+        ))
+        return cls(
+            data["block_types"],
+            data["edit_times"],
+            data["tag_offsets"],
+            data["tag_ids"],
+            data["tags"].tolist(),
+            data["ref_offsets"],
+            data["ref_ids"],
+            data["refs"].tolist()
+        )
+
+    def _rows_with_any(self, offsets: np.ndarray, ids: np.ndarray, vocab: List[str], wanted: Iterable[str]) -> np.ndarray:
+        """Get a row mask of rows holding at least one of the wanted values."""
+        lookup = {value: i for i, value in enumerate(vocab)}
+        wanted_ids = [lookup[value] for value in wanted if value in lookup]
+        mask = np.zeros(len(self), dtype=bool)
+        if not wanted_ids:
+            return mask
+        rows = np.repeat(np.arange(len(self)), np.diff(offsets).astype("int64"))
+        mask[rows[np.isin(ids, wanted_ids)]] = True
+        return mask
+
+    def mask(
+        self,
+        block_type: Optional[str] = None,
+        edited_after: Optional[int] = None,
+        edited_before: Optional[int] = None,
+        tags: Optional[Sequence[str]] = None,
+        references: Optional[Sequence[str]] = None
+    ) -> np.ndarray:
+        """
+        Evaluate a filter into a boolean mask over rows.
+
+        Args:
+            block_type: Keep only "block" or "reference" rows
+            edited_after: Keep rows edited at or after this time (ms since epoch)
+            edited_before: Keep rows edited before this time (ms since epoch)
+            tags: Keep rows carrying any of these tags or page links
+            references: Keep rows referencing any of these block uids
+
+        Returns:
+            Boolean array, True for rows that pass every given condition
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if block_type is not None:
+            mask &= self.block_types == BLOCK_TYPES.index(block_type)
+        if edited_after is not None:
+            mask &= self.edit_times >= edited_after
+        if edited_before is not None:
+            mask &= self.edit_times < edited_before
+        if tags:
+            wanted = [tag.lstrip("#").strip("[]").strip().lower() for tag in tags]
+            mask &= self._rows_with_any(self.tag_offsets, self.tag_ids, self.tags, wanted)
+        if references:
+            mask &= self._rows_with_any(self.ref_offsets, self.ref_ids, self.refs, references)
+        return mask
@@ -0,0 +1,122 @@
+"""Dynamic micro-batching of concurrent query embeddings."""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.services.executors import run_query
+
+logger = logging.getLogger(__name__)
+
+class QueryBatcher:
+    """
+    Collects query texts that arrive within a short window and encodes them
+    with a single model call.
+
+    A batch is flushed as soon as it reaches max_batch_size or when the
+    oldest pending query has waited max_wait_ms, whichever comes first.
+    Each caller gets back the vector for its own text.
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: set = set()
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self.batches = 0
+        self.queries = 0
+        self.max_batch_seen = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+        self.batch_size_histogram: Dict[int, int] = {}
+
+    async def encode(self, text: str) -> np.ndarray:
+        """
+        Encode a single query, sharing the model call with concurrent callers.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Embedding vector for the text
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Timers and futures belong to one loop; start fresh on a new one
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Hand the pending queries to a worker thread as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        started = time.perf_counter()
+        texts = [text for text, _, _ in batch]
+        try:
+            vectors = await run_query(self.encode_batch, texts)
+        except Exception as e:
+            logger.exception("Query batch encoding failed")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._record(len(batch), [started - enqueued for _, _, enqueued in batch])
+        for (_, future, _), vector in zip(batch, vectors):
+            # The waiter may have been cancelled (e.g. client disconnect)
+            if not future.done():
+                future.set_result(vector)
+
+    def _record(self, size: int, delays: List[float]) -> None:
+        self.batches += 1
+        self.queries += size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        self.total_queue_delay += sum(delays)
+        self.max_queue_delay = max(self.max_queue_delay, max(delays))
+        # Power-of-two buckets: 1, 2, 4, 8, ...
+        bucket = 1 << (size - 1).bit_length()
+        self.batch_size_histogram[bucket] = self.batch_size_histogram.get(bucket, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get batch size and queueing delay metrics."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "largest_batch": self.max_batch_seen,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "avg_queue_delay_ms": self.total_queue_delay / self.queries * 1000 if self.queries else 0.0,
+            "max_queue_delay_ms": self.max_queue_delay * 1000
+        }
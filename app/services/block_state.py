@@ -0,0 +1,119 @@
+"""Per-block edit times and content hashes for incremental reindexing."""
+
+import hashlib
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+HASH_BYTES = 16
+
+def content_hash(text: str) -> bytes:
+    """Hash a block's content; blocks with equal hashes share an embedding."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=HASH_BYTES).digest()
+
+class BlockState:
+    """
+    The uid, last-seen edit time and content hash of every indexed block,
+    one entry per FAISS row, as of the last reindex.
+    """
+
+    def __init__(
+        self,
+        uids: Sequence[str],
+        edit_times: np.ndarray,
+        hashes: np.ndarray,
+        seconds_per_block: float = 0.0
+    ):
+        self.uids = list(uids)
+        self.edit_times = edit_times
+        self.hashes = hashes
+        # Embedding cost measured by the last reindex that embedded anything
+        self.seconds_per_block = seconds_per_block
+
+    def __len__(self) -> int:
+        return len(self.uids)
+
+    @classmethod
+    def build(cls, blocks: Sequence[Dict[str, Any]], seconds_per_block: float = 0.0) -> "BlockState":
+        """Collect the state of blocks in FAISS row order."""
+        return cls(
+            [block["uid"] for block in blocks],
+            np.array([block.get("timestamp") or 0 for block in blocks], dtype="int64"),
+            np.array([content_hash(block["content"]) for block in blocks], dtype=f"S{HASH_BYTES}"),
+            seconds_per_block
+        )
+
+    def save(self, path: str) -> None:
+        """Write the state as an uncompressed .npz archive."""
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                uids=np.array(self.uids, dtype=str),
+                edit_times=self.edit_times,
+                hashes=self.hashes,
+                seconds_per_block=np.float64(self.seconds_per_block)
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "BlockState":
+        """Read state written by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["uids"].tolist(),
+                data["edit_times"],
+                data["hashes"],
+                float(data["seconds_per_block"])
+            )
+
+    def same_as(self, other: "BlockState") -> bool:
+        """Check whether two states hold the same blocks, edits and order."""
+        return (
+            self.uids == other.uids
+            and np.array_equal(self.edit_times, other.edit_times)
+            and np.array_equal(self.hashes, other.hashes)
+        )
+
+class ReindexPlan:
+    """
+    Which rows of a new build reuse a stored embedding.
+
+    Attributes:
+        reuse_rows: Previous row to copy for each new row, -1 to embed it
+        added: Blocks not indexed before
+        updated: Blocks whose content changed
+        removed: Blocks no longer present
+        unchanged: Blocks whose content did not change
+    """
+
+    def __init__(self, previous: Optional[BlockState], current: BlockState):
+        self.reuse_rows = np.full(len(current), -1, dtype="int64")
+        self.added = self.updated = self.removed = self.unchanged = 0
+        if previous is None:
+            self.added = len(current)
+            return
+
+        previous_rows = {uid: row for row, uid in enumerate(previous.uids)}
+        for row, uid in enumerate(current.uids):
+            old = previous_rows.get(uid)
+            if old is None:
+                self.added += 1
+            elif previous.hashes[old] == current.hashes[row]:
+                # An edit that left the text as it was needs no new embedding
+                self.reuse_rows[row] = old
+                self.unchanged += 1
+            else:
+                self.updated += 1
+        self.removed = len(set(previous_rows) - set(current.uids))
+
+    @property
+    def embed_rows(self) -> np.ndarray:
+        """Rows of the new build that need embedding."""
+        return np.flatnonzero(self.reuse_rows < 0)
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "added": self.added,
+            "updated": self.updated,
+            "removed": self.removed,
+            "unchanged": self.unchanged
+        }
@@ -0,0 +1,67 @@
+"""Single-flight coalescing of identical concurrent work."""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time.
+
+    The first caller for a key starts the work as its own task; callers
+    arriving while it runs await the same task and receive the same result
+    (or exception). Because the work is a separate task, cancelling any one
+    caller - e.g. a client disconnecting - does not cancel it for the rest.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.flights = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run work() for key, or join the run already in flight.
+
+        Args:
+            key: Identity of the computation
+            work: Coroutine function producing the result
+
+        Returns:
+            The result of the single shared run
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Tasks belong to one loop; start fresh on a new one
+            self._loop = loop
+            self._flights = {}
+
+        task = self._flights.get(key)
+        if task is None:
+            self.flights += 1
+            task = loop.create_task(work())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieve the exception so an unawaited task does not warn
+            logger.debug(f"Shared computation for {key!r} failed: {task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get counts of shared runs and of callers that joined one."""
+        requests = self.flights + self.coalesced
+        return {
+            "flights": self.flights,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": self.coalesced / requests if requests else 0.0,
+            "in_flight": len(self._flights)
+        }
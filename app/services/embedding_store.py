@@ -0,0 +1,283 @@
+"""Persistent embedding cache keyed by encoder and content hash."""
+
+import fcntl
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+from app.config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_BYTES, EMBEDDING_CACHE_MAX_AGE_DAYS
+from app.services.block_state import HASH_BYTES
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingStore:
+    """
+    On-disk map from content hash to embedding for one encoder.
+
+    Vectors are appended as float16 rows to vectors.f16 and read through a
+    memory map; index.npz holds the hash and last-use time of each row.
+    The index is rewritten after the vectors, so a crash mid-append leaves
+    unindexed tail rows that the next write overwrites, and a vectors file
+    shorter than its index resets the cache rather than serving garbage.
+
+    The server and scripts/index.py may share a cache, so every operation
+    holds an flock on the directory's lock file (shared for lookups) and
+    first reloads index.npz if another process rewrote it since. A
+    compaction elsewhere thus cannot leave this process appending at a
+    stale row count or reading rows that have moved.
+    """
+
+    def __init__(self, path: str, dimension: int, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.dimension = dimension
+        self.max_bytes = max(0, max_bytes)
+        self.vectors_path = os.path.join(path, "vectors.f16")
+        self.index_path = os.path.join(path, "index.npz")
+        self.lock_path = os.path.join(path, ".lock")
+        self._lock = threading.Lock()
+        self._loaded_stamp: Optional[Tuple[int, int, int]] = None
+        self._map: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+        self.hashes = np.zeros(0, dtype=f"S{HASH_BYTES}")
+        self.used = np.zeros(0, dtype="int64")
+        self._rows: Dict[bytes, int] = {}
+        if self.enabled:
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def row_bytes(self) -> int:
+        # float16 vector plus its hash and last-use time
+        return self.dimension * 2 + HASH_BYTES + 8
+
+    @property
+    def bytes(self) -> int:
+        return len(self.hashes) * self.row_bytes
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def _stamp(self) -> Optional[Tuple[int, int, int]]:
+        """Identify the current index.npz; os.replace() gives each write a new inode."""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> None:
+        self._loaded_stamp = self._stamp()
+        if self._loaded_stamp is None:
+            return
+        try:
+            with np.load(self.index_path, allow_pickle=False) as data:
+                hashes, used = data["hashes"], data["used"]
+            stored = os.path.getsize(self.vectors_path) // (self.dimension * 2)
+            if stored < len(hashes):
+                raise ValueError(f"{self.vectors_path} holds {stored} rows, index has {len(hashes)}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Discarding unreadable embedding cache {self.path}: {e}")
+            return
+        self.hashes, self.used = hashes, used
+        self._rows = {digest: row for row, digest in enumerate(hashes.tolist())}
+
+    def _sync(self) -> None:
+        """Reload the index if another process rewrote it, keeping newer last-use times."""
+        if self._stamp() == self._loaded_stamp:
+            return
+        hashes, used = self.hashes, self.used
+        self.hashes = np.zeros(0, dtype=f"S{HASH_BYTES}")
+        self.used = np.zeros(0, dtype="int64")
+        self._rows = {}
+        self._map = None
+        self._load()
+        _, new_rows, old_rows = np.intersect1d(self.hashes, hashes, assume_unique=True, return_indices=True)
+        self.used[new_rows] = np.maximum(self.used[new_rows], used[old_rows])
+
+    @contextmanager
+    def _locked(self, shared: bool = False) -> Iterator[None]:
+        """Hold this store's thread lock and the cache directory's file lock."""
+        with self._lock:
+            if shared and not os.path.isdir(self.path):
+                # Nothing written yet, so nothing to read or reload
+                yield
+                return
+            os.makedirs(self.path, exist_ok=True)
+            with open(self.lock_path, "ab") as f:
+                fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                try:
+                    self._sync()
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _vectors(self) -> np.memmap:
+        if self._map is None or len(self._map) != len(self.hashes):
+            self._map = np.memmap(self.vectors_path, dtype="float16", mode="r", shape=(len(self.hashes), self.dimension))
+        return self._map
+
+    def _write_index(self) -> None:
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, hashes=self.hashes, used=self.used)
+        os.replace(tmp_path, self.index_path)
+        self._loaded_stamp = self._stamp()
+
+    def get_many(self, hashes: Sequence[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Look up embeddings by content hash.
+
+        Args:
+            hashes: Content hashes, one per text
+
+        Returns:
+            Tuple of (boolean found mask, float32 matrix with the cached
+            embedding in found rows and zeros elsewhere)
+        """
+        found = np.zeros(len(hashes), dtype=bool)
+        vectors = np.zeros((len(hashes), self.dimension), dtype="float32")
+        if not self.enabled:
+            return found, vectors
+        with self._locked(shared=True):
+            rows = np.array([self._rows.get(digest, -1) for digest in hashes], dtype="int64")
+            found = rows >= 0
+            if found.any():
+                vectors[found] = self._vectors()[rows[found]]
+                self.used[rows[found]] = int(time.time())
+            self.hits += int(found.sum())
+            self.misses += int((~found).sum())
+        return found, vectors
+
+    def put_many(self, hashes: Sequence[bytes], vectors: np.ndarray, overwrite: bool = False) -> None:
+        """
+        Store embeddings for content hashes.
+
+        Args:
+            hashes: Content hashes, one per vector
+            vectors: Embeddings to store
+            overwrite: Replace the vectors of hashes already cached, which
+                are otherwise kept
+        """
+        if not self.enabled:
+            return
+        with self._locked():
+            new, replaced = {}, {}
+            for digest, vector in zip(hashes, vectors):
+                if digest in self._rows:
+                    if overwrite:
+                        replaced[self._rows[digest]] = vector
+                elif digest not in new:
+                    new[digest] = vector
+            if replaced:
+                rows = np.fromiter(replaced, dtype="int64")
+                stored = np.memmap(self.vectors_path, dtype="float16", mode="r+", shape=(len(self.hashes), self.dimension))
+                stored[rows] = np.asarray(list(replaced.values()), dtype="float16")
+                stored.flush()
+                del stored
+                self.used[rows] = int(time.time())
+            if not new:
+                if replaced:
+                    self._write_index()
+                return
+            with open(self.vectors_path, "ab") as f:
+                # Drop tail rows a crashed append left behind
+                f.truncate(len(self.hashes) * self.dimension * 2)
+                f.write(np.asarray(list(new.values()), dtype="float16").tobytes())
+            start = len(self.hashes)
+            self.hashes = np.concatenate([self.hashes, np.array(list(new), dtype=f"S{HASH_BYTES}")])
+            self.used = np.concatenate([self.used, np.full(len(new), int(time.time()), dtype="int64")])
+            self._rows.update({digest: start + i for i, digest in enumerate(new)})
+            self._write_index()
+
+    def flush(self) -> None:
+        """Persist last-use times updated by lookups."""
+        if self.enabled and len(self.hashes):
+            with self._locked():
+                self._write_index()
+
+    def collect_garbage(self, referenced: Iterable[bytes], max_age_days: float = EMBEDDING_CACHE_MAX_AGE_DAYS) -> int:
+        """
+        Drop stale entries and shrink the cache to its byte budget.
+
+        Entries no brain references are dropped once unused for
+        max_age_days; if the cache is still over budget, the least recently
+        used go next, unreferenced before referenced.
+
+        Args:
+            referenced: Content hashes of every currently indexed block
+            max_age_days: Age after which unreferenced entries are dropped
+
+        Returns:
+            Number of entries dropped
+        """
+        if not self.enabled:
+            return 0
+        with self._locked():
+            if not len(self.hashes):
+                return 0
+            live = np.isin(self.hashes, np.fromiter(referenced, dtype=f"S{HASH_BYTES}"))
+            keep = live | (self.used >= time.time() - max_age_days * 86400)
+            budget = self.max_bytes // self.row_bytes
+            if keep.sum() > budget:
+                # Unreferenced first, then oldest first
+                order = np.lexsort((-self.used, ~live))
+                keep = np.zeros(len(self.hashes), dtype=bool)
+                keep[order[:budget]] = True
+            dropped = int(len(keep) - keep.sum())
+            if not dropped:
+                return 0
+
+            rows = np.flatnonzero(keep)
+            tmp_path = f"{self.vectors_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(np.ascontiguousarray(self._vectors()[rows]).tobytes())
+            self._map = None
+            os.replace(tmp_path, self.vectors_path)
+            self.hashes, self.used = self.hashes[rows], self.used[rows]
+            self._rows = {digest: row for row, digest in enumerate(self.hashes.tolist())}
+            self._write_index()
+            logger.info(f"Dropped {dropped} entries from embedding cache {self.path}")
+            return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        """Get size and lifetime hit ratio."""
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": len(self.hashes),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+_stores: Dict[str, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+def get_embedding_store(embedding: Dict[str, Any]) -> EmbeddingStore:
+    """
+    Get or open the cache for one encoder.
+
+    Args:
+        embedding: Backend description from embedding_info(); backends
+            and models each get their own cache, since their vectors differ
+
+    Returns:
+        The encoder's store
+    """
+    name = re.sub(r"[^\w.-]+", "_", f"{embedding['backend']}-{embedding['model']}-{embedding['dimension']}")
+    path = os.path.join(EMBEDDING_CACHE_DIR, name)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = EmbeddingStore(path, embedding["dimension"])
+        return _stores[path]
@@ -0,0 +1,285 @@
+"""Sentence embedding backends, imported and loaded on first use."""
+
+import re
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type, Union
+
+import numpy as np
+from app.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_TOKENS,
+    EMBEDDING_MAX_BATCH_SIZE,
+    EMBEDDING_HASH_DIMENSION,
+    EMBEDDING_MODEL,
+    EMBEDDING_ONNX_FILE,
+    EMBEDDING_QUANTIZED_FILE
+)
+
+MODEL_NAME = EMBEDDING_MODEL
+
+class EmbeddingMismatchError(RuntimeError):
+    """An index was built with a different embedding model than the configured one."""
+
+class EmbeddingBackend(ABC):
+    """
+    Encodes texts into embeddings with one inference runtime.
+
+    Backends expose the subset of the SentenceTransformer interface the
+    service uses, so callers do not care which runtime is behind it.
+    Subclasses must implement dimension and encode().
+    """
+
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        """Length of the embedding vectors."""
+
+    @abstractmethod
+    def encode(
+        self,
+        texts: Union[str, Sequence[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        **kwargs: Any
+    ) -> np.ndarray:
+        """
+        Embed one text (as a vector) or a list of texts (as a matrix).
+
+        Args:
+            texts: Text or texts to embed
+            batch_size: Texts per forward pass
+            convert_to_numpy: Accepted for SentenceTransformer compatibility;
+                results are always numpy arrays
+
+        Returns:
+            Float32 embeddings, not normalized
+        """
+
+    def count_tokens(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Estimate how many tokens each text occupies in a forward pass.
+
+        Used to group texts of similar length into batches; the default
+        assumes about four characters per token.
+
+        Args:
+            texts: Texts to measure
+
+        Returns:
+            Int array of token counts, including special tokens
+        """
+        return np.array([len(text) // 4 + 2 for text in texts], dtype="int64")
+
+    def info(self) -> Dict[str, Any]:
+        """Describe the backend for the index manifest."""
+        return {"backend": self.name, "model": self.model_name, "dimension": self.dimension}
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Runs the model through sentence-transformers on one of its runtimes."""
+
+    runtime = "torch"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        # Imported here: sentence_transformers pulls in torch and
+        # transformers, which would otherwise load with the app
+        from sentence_transformers import SentenceTransformer
+        # Download and cache the model
+        self.model = SentenceTransformer(
+            model_name, device="cpu", backend=self.runtime, model_kwargs=self.model_kwargs()
+        )
+
+    def model_kwargs(self) -> Optional[Dict[str, Any]]:
+        return None
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, **kwargs)
+
+    def count_tokens(self, texts):
+        # The model's own tokenizer, truncated where encode() truncates
+        encoded = self.model.tokenizer(
+            list(texts), add_special_tokens=True, truncation=True, max_length=self.model.max_seq_length
+        )
+        return np.array([len(ids) for ids in encoded["input_ids"]], dtype="int64")
+
+BACKENDS: Dict[str, Type[EmbeddingBackend]] = {}
+
+def register_backend(name: str) -> Callable[[Type[EmbeddingBackend]], Type[EmbeddingBackend]]:
+    """Register an EmbeddingBackend subclass under a config name."""
+    def register(cls: Type[EmbeddingBackend]) -> Type[EmbeddingBackend]:
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return register
+
+@register_backend("torch")
+class TorchBackend(SentenceTransformerBackend):
+    """PyTorch inference, the sentence-transformers default."""
+
+@register_backend("onnx")
+class OnnxBackend(SentenceTransformerBackend):
+    """ONNX Runtime inference of the exported model (needs optimum[onnxruntime])."""
+
+    runtime = "onnx"
+    file_name = EMBEDDING_ONNX_FILE
+
+    def model_kwargs(self):
+        return {"file_name": self.file_name, "provider": "CPUExecutionProvider"}
+
+@register_backend("onnx-int8")
+class QuantizedOnnxBackend(OnnxBackend):
+    """ONNX Runtime inference of a dynamically quantized int8 export."""
+
+    file_name = EMBEDDING_QUANTIZED_FILE
+
+@register_backend("hash")
+class HashingBackend(EmbeddingBackend):
+    """
+    Model-free encoder hashing word, word-pair and character trigram
+    features into a fixed number of signed buckets.
+
+    Vectors depend only on the text, so indexes and searches built with it
+    are reproducible across processes and need neither network access nor
+    model weights. Texts sharing words or word fragments score as similar;
+    nothing else about their meaning is captured.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, model_name: str, dimension: int = EMBEDDING_HASH_DIMENSION):
+        # The configured model is not loaded; the record names this encoder
+        super().__init__(f"hashed-ngrams-{dimension}")
+        self._dimension = dimension
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def features(self, text: str) -> List[str]:
+        """Get the hashed features of one text."""
+        words = self.TOKEN_PATTERN.findall(text.lower())
+        features = list(words)
+        features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        # Texts without words still get a (shared) non-zero vector
+        return features or [""]
+
+    def count_tokens(self, texts):
+        return np.array([len(self.TOKEN_PATTERN.findall(text)) + 2 for text in texts], dtype="int64")
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        vectors = np.zeros((len(batch), self._dimension), dtype="float32")
+        for row, text in enumerate(batch):
+            for feature in self.features(text):
+                bucket = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if (bucket // self._dimension) % 2 else -1.0
+                vectors[row, bucket % self._dimension] += sign
+        return vectors[0] if single else vectors
+
+def plan_batches(
+    token_counts: np.ndarray,
+    max_tokens: int = EMBEDDING_BATCH_TOKENS,
+    max_size: int = EMBEDDING_MAX_BATCH_SIZE
+) -> List[np.ndarray]:
+    """
+    Group texts into batches of similar length within a token budget.
+
+    A forward pass pads every text to the longest in its batch, so texts
+    are taken longest first and each batch grows while its padded size
+    (texts times longest text) stays within max_tokens. Long texts thus go
+    in small batches and short ones in large batches.
+
+    Args:
+        token_counts: Tokens per text, e.g. from EmbeddingBackend.count_tokens()
+        max_tokens: Padded tokens allowed per batch
+        max_size: Texts allowed per batch
+
+    Returns:
+        Arrays of text indices, one per batch
+    """
+    order = np.argsort(-np.asarray(token_counts), kind="stable")
+    batches = []
+    start = 0
+    while start < len(order):
+        longest = max(int(token_counts[order[start]]), 1)
+        size = min(max(max_tokens // longest, 1), max_size)
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+def load_backend(name: str, model_name: str = MODEL_NAME) -> EmbeddingBackend:
+    """
+    Load a new instance of a registered backend.
+
+    Args:
+        name: Registered backend name
+        model_name: Model to load
+
+    Returns:
+        The loaded backend
+
+    Raises:
+        ValueError: If no backend is registered under name
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Invalid embedding backend: {name}. Must be one of {list(BACKENDS)}")
+    return BACKENDS[name](model_name)
+
+# Initialize the configured backend on first use
+_model: Optional[EmbeddingBackend] = None
+_model_lock = threading.Lock()
+
+def get_model() -> EmbeddingBackend:
+    """Get or initialize the configured embedding backend."""
+    global _model
+    if _model is None:
+        # Worker threads may race here on the first request
+        with _model_lock:
+            if _model is None:
+                _model = load_backend(EMBEDDING_BACKEND)
+    return _model
+
+def embedding_info() -> Dict[str, Any]:
+    """Describe the configured backend, model and dimension."""
+    return get_model().info()
+
+def check_compatible(brain: str, recorded: Optional[Dict[str, Any]]) -> None:
+    """
+    Refuse to search an index built with a different embedding model.
+
+    The runtime may differ (a torch-built index is searchable with the ONNX
+    export of the same model); the model and dimension must not.
+
+    Args:
+        brain: Brain the index belongs to
+        recorded: Embedding section of the index manifest, None for indexes
+            built before it was recorded
+
+    Raises:
+        EmbeddingMismatchError: If the model or dimension differ
+    """
+    if not recorded:
+        return
+    current = get_model()
+    if recorded.get("model") != current.model_name or recorded.get("dimension") != current.dimension:
+        raise EmbeddingMismatchError(
+            f"The {brain} index was built with {recorded.get('model')} "
+            f"({recorded.get('dimension')} dims) but the configured embedding model is "
+            f"{current.model_name} ({current.dimension} dims). Reindex {brain} or "
+            f"change EMBEDDING_MODEL."
+        )
@@ -0,0 +1,51 @@
+"""Bounded thread pools for CPU-bound encoding and vector search."""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from app.config import QUERY_WORKERS, INDEX_WORKERS
+
+# Pool name -> max workers. SentenceTransformer.encode and faiss search both
+# release the GIL, so threads give real overlap without copying the model.
+POOL_SIZES: Dict[str, int] = {
+    "query": QUERY_WORKERS,
+    "index": INDEX_WORKERS,
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+
+def get_executor(pool: str) -> ThreadPoolExecutor:
+    """Get or create the thread pool with the given name."""
+    if pool not in POOL_SIZES:
+        raise ValueError(f"Invalid pool: {pool}. Must be one of {list(POOL_SIZES)}")
+    with _lock:
+        if pool not in _executors:
+            _executors[pool] = ThreadPoolExecutor(
+                max_workers=POOL_SIZES[pool],
+                thread_name_prefix=f"{pool}-worker"
+            )
+        return _executors[pool]
+
+async def run_in_pool(pool: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking function in the named pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(pool), functools.partial(func, *args, **kwargs))
+
+async def run_query(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run query-time work (query encoding, index search, index loading)."""
+    return await run_in_pool("query", func, *args, **kwargs)
+
+async def run_index(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run index-time work (block embedding, index building, writing)."""
+    return await run_in_pool("index", func, *args, **kwargs)
+
+def shutdown_executors(wait: bool = True) -> None:
+    """Shut down all pools; they are recreated lazily on next use."""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,277 @@
+"""Versioned brain builds published by an atomic pointer swap."""
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.config import BRAINS_DIR, GENERATIONS_KEEP, current_generation, generation_filenames
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+BUILD_LOCK = ".build.lock"
+# How often a reindex waiting for another process's build lock retries
+BUILD_LOCK_POLL_SECONDS = 0.5
+
+def _brain_dir(brain: str) -> str:
+    return os.path.join(BRAINS_DIR, brain)
+
+def _manifest_path(brain: str, generation: str) -> str:
+    return os.path.join(_brain_dir(brain), generation, MANIFEST)
+
+def _parts(path: str) -> List[str]:
+    """Get the files making up a brain file, which may be a directory of arrays."""
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))]
+
+def _size(path: str) -> int:
+    return sum(os.path.getsize(part) for part in _parts(path))
+
+def _checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    for part in _parts(path):
+        if part != path:
+            digest.update(os.path.basename(part).encode("utf-8"))
+        with open(part, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+@asynccontextmanager
+async def build_lock(brain: str) -> AsyncIterator[None]:
+    """
+    Hold a brain's build lock, shared by every process on the host.
+
+    The lock is an flock on data/brains/<brain>/.build.lock, so server
+    workers and scripts/index.py never build one brain at the same time.
+    Waiting polls the lock instead of blocking the event loop.
+
+    Args:
+        brain: Name of the brain
+    """
+    os.makedirs(_brain_dir(brain), exist_ok=True)
+    with open(os.path.join(_brain_dir(brain), BUILD_LOCK), "ab") as f:
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(BUILD_LOCK_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def create_generation(brain: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Create an empty directory for a new build of a brain.
+
+    Ids start with the UTC build time, so they sort oldest first.
+
+    Args:
+        brain: Name of the brain
+
+    Returns:
+        Tuple of (generation id, paths of its files)
+    """
+    generation = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+    files = generation_filenames(brain, generation)
+    os.makedirs(os.path.dirname(files["index"]))
+    return generation, files
+
+def discard_generation(brain: str, generation: str) -> None:
+    """Delete an unpublished generation, e.g. after a failed build."""
+    shutil.rmtree(os.path.join(_brain_dir(brain), generation), ignore_errors=True)
+
+def write_manifest(
+    brain: str,
+    generation: str,
+    files: Dict[str, str],
+    params: Dict[str, Any],
+    build_seconds: float
+) -> Dict[str, Any]:
+    """
+    Record what a generation holds, with checksums of its files.
+
+    The manifest is written last, so a directory without one is an
+    incomplete build that must not be published.
+
+    Args:
+        brain: Name of the brain
+        generation: Generation id
+        files: Paths of the generation's files
+        params: Index parameters, including rows and the embedding model
+        build_seconds: Time taken by the reindex
+
+    Returns:
+        The manifest
+    """
+    manifest = {
+        "generation": generation,
+        "brain": brain,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "build_seconds": round(build_seconds, 3),
+        "rows": params["rows"],
+        "dimension": params["dimension"],
+        "index_type": params["type"],
+        "embedding": params.get("embedding"),
+        "files": {
+            key: {
+                "name": os.path.basename(path),
+                "bytes": _size(path),
+                "sha256": _checksum(path)
+            }
+            for key, path in files.items() if os.path.exists(path)
+        }
+    }
+    path = _manifest_path(brain, generation)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return manifest
+
+def read_manifest(brain: str, generation: str) -> Optional[Dict[str, Any]]:
+    """Get a generation's manifest, or None if it is incomplete or missing."""
+    try:
+        with open(_manifest_path(brain, generation), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def verify_generation(brain: str, generation: str) -> None:
+    """
+    Check a generation's files against its manifest checksums.
+
+    Raises:
+        FileNotFoundError: If the generation or one of its files is missing
+        ValueError: If a file does not match its checksum
+    """
+    manifest = read_manifest(brain, generation)
+    if manifest is None:
+        raise FileNotFoundError(f"Generation {generation} of {brain} not found or incomplete")
+    files = generation_filenames(brain, generation)
+    for key, entry in manifest["files"].items():
+        if _checksum(files[key]) != entry["sha256"]:
+            raise ValueError(f"Generation {generation} of {brain} is corrupt: {entry['name']} checksum mismatch")
+
+def _point_to(brain: str, generation: str) -> None:
+    """Atomically repoint the brain's CURRENT file at a generation."""
+    path = os.path.join(_brain_dir(brain), "CURRENT")
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.write(generation)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+def list_generations(brain: str) -> List[Dict[str, Any]]:
+    """
+    Get the complete generations of a brain, newest first.
+
+    Args:
+        brain: Name of the brain
+
+    Returns:
+        Manifests, each with a "current" flag added
+    """
+    current = current_generation(brain)
+    directory = _brain_dir(brain)
+    if not os.path.isdir(directory):
+        return []
+    generations = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        manifest = read_manifest(brain, name) if os.path.isdir(os.path.join(directory, name)) else None
+        if manifest is not None:
+            generations.append({**manifest, "current": name == current})
+    return generations
+
+def prune_generations(brain: str, keep: int = GENERATIONS_KEEP) -> List[str]:
+    """
+    Delete all but the newest complete generations, and failed builds.
+
+    The published generation is always kept. Readers that already opened
+    files of a deleted generation keep working off their open handles.
+
+    Args:
+        brain: Name of the brain
+        keep: Number of complete generations to keep
+
+    Returns:
+        Ids of the deleted generations
+    """
+    directory = _brain_dir(brain)
+    current = current_generation(brain)
+    names = sorted(
+        (name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name))),
+        reverse=True
+    )
+    complete = [name for name in names if read_manifest(brain, name) is not None]
+    retained = set(complete[:keep]) | {current}
+    deleted = []
+    for name in names:
+        if name in retained:
+            continue
+        if name not in complete and (current is None or name > current):
+            # An unpublished build newer than the live one may still be in progress
+            continue
+        discard_generation(brain, name)
+        deleted.append(name)
+    if deleted:
+        logger.info(f"Pruned {len(deleted)} old generations of {brain}: {deleted}")
+    return deleted
+
+def publish_generation(brain: str, generation: str, keep: int = GENERATIONS_KEEP) -> None:
+    """
+    Make a complete generation the one searches read, then prune old ones.
+
+    Args:
+        brain: Name of the brain
+        generation: Generation id with a written manifest
+        keep: Number of complete generations to keep
+
+    Raises:
+        FileNotFoundError: If the generation has no manifest
+    """
+    if read_manifest(brain, generation) is None:
+        raise FileNotFoundError(f"Generation {generation} of {brain} not found or incomplete")
+    _point_to(brain, generation)
+    logger.info(f"Published generation {generation} of {brain}")
+    prune_generations(brain, keep)
+
+def rollback(brain: str, generation: Optional[str] = None) -> str:
+    """
+    Republish an earlier generation after verifying its checksums.
+
+    Args:
+        brain: Name of the brain
+        generation: Generation to publish; defaults to the newest one older
+            than the published generation
+
+    Returns:
+        The generation now published
+
+    Raises:
+        FileNotFoundError: If there is no such (or no older) generation
+        ValueError: If the generation's files fail verification
+    """
+    available = [entry["generation"] for entry in list_generations(brain)]
+    if generation is None:
+        current = current_generation(brain)
+        older = [name for name in available if current is not None and name < current]
+        if not older:
+            raise FileNotFoundError(f"No earlier generation of {brain} to roll back to")
+        generation = older[0]
+    elif generation not in available:
+        raise FileNotFoundError(f"Generation {generation} of {brain} not found or incomplete")
+    verify_generation(brain, generation)
+    _point_to(brain, generation)
+    logger.warning(f"Rolled back {brain} to generation {generation}")
+    return generation
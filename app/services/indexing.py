@@ -1,167 +1,832 @@
 """Indexing service for Roam semantic search."""
 
 import json
-import faiss
 import numpy as np
 import logging
 import re
 import asyncio
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Set, Callable, Tuple
 from datetime import datetime
-from app.config import get_filenames, DATA_DIR
-from app.services.search import get_model
+from app.config import (
+    get_filenames,
+    get_index_config,
+    current_generation,
+    BRAINS,
+    DATA_DIR,
+    REINDEX_INCREMENTAL,
+    REINDEX_PAGE_SIZE,
+    REINDEX_EMBED_CHUNK,
+    REINDEX_PIPELINE_MAX_BYTES
+)
+from app.services.search import get_model, get_result_cache
+from app.services.embeddings import embedding_info, plan_batches
+from app.services.registry import get_registry
+from app.services.executors import run_index
+from app.services.vector_index import build_index, index_params, write_index
+from app.services.metadata_store import write_metadata_store
+from app.services.lexical import LexicalIndex
+from app.services.attributes import BlockAttributes
+from app.services.block_state import BlockState, ReindexPlan, content_hash
+from app.services.embedding_store import get_embedding_store
+from app.services.generations import create_generation, discard_generation, write_manifest, publish_generation
+from app.services.pipeline import Pipeline
 from app.utils.export import save_roam_data
 from app.utils.roam_api import get_blocks_under_toc, get_block_references, get_block_references_batch
 import os
 
 logger = logging.getLogger(__name__)
 
+# Called as progress(phase, done, total) while a reindex runs; phases are
+# "fetch", "references", "embed", "build" and "publish", and done/total
+# count blocks where the phase has a meaningful count (0/0 otherwise)
+ProgressCallback = Callable[[str, int, int], None]
+
+class ReindexError(RuntimeError):
+    """
+    Some brains of a reindex failed; the others were still published.
+    
+    Attributes:
+        results: reindex_brain() results of the brains that succeeded
+        failures: The exception each failed brain raised
+    """
+    
+    def __init__(self, results: Dict[str, Dict[str, Any]], failures: Dict[str, BaseException]):
+        super().__init__("; ".join(f"{brain}: {error}" for brain, error in failures.items()))
+        self.results = results
+        self.failures = failures
+
+def _report(progress: Optional[ProgressCallback], phase: str, done: int = 0, total: int = 0) -> None:
+    if progress is not None:
+        progress(phase, done, total)
+
 def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
     """Normalize vectors to unit length for cosine similarity."""
     norms = np.linalg.norm(vectors, axis=1, keepdims=True)
     return vectors / norms
 
-async def process_references(refs: List[List[Any]], processed_uids: Set[str]) -> List[Dict[str, Any]]:
+async def process_references(
+    refs: List[List[Any]],
+    processed_uids: Set[str],
+    by_uid: Optional[Dict[str, Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
     """
     Process block references into a standardized format.
     
     Args:
         refs: List of reference data from Roam
         processed_uids: Set of already processed UIDs
+        by_uid: Reference blocks from earlier pages of the same brain, so
+            a block referencing TOC blocks on several pages is kept once
+            with all its targets; updated in place
         
     Returns:
-        List of processed block data
+        List of newly processed block data
     """
     blocks = []
+    by_uid = {} if by_uid is None else by_uid
     for ref in refs:
         ref_uid, ref_content, ref_time, ref_target = ref
+        if ref_uid in by_uid:
+            # A block referencing several TOC blocks comes back once per target
+            if ref_target not in by_uid[ref_uid]["references"]:
+                by_uid[ref_uid]["references"].append(ref_target)
+            continue
         if ref_uid not in processed_uids:
             processed_uids.add(ref_uid)
-            blocks.append({
+            by_uid[ref_uid] = {
                 "uid": ref_uid,
                 "content": ref_content,
                 "timestamp": ref_time,
                 "type": "reference",
-                "references": ref_target
-            })
+                "references": [ref_target]
+            }
+            blocks.append(by_uid[ref_uid])
     return blocks
 
-async def create_embeddings(blocks: List[Dict[str, Any]], brain: str) -> tuple[np.ndarray, List[Dict[str, Any]]]:
+def block_metadata(block: Dict[str, Any], brain: str) -> Dict[str, Any]:
+    """Build the metadata row stored for a block."""
+    return {
+        "uid": block["uid"],
+        "content": block["content"],
+        "brain": brain
+    }
+
+async def create_embeddings(
+    blocks: List[Dict[str, Any]],
+    brain: str,
+    stats: Optional[Dict[str, Any]] = None,
+    progress: Optional[ProgressCallback] = None
+) -> tuple[np.ndarray, List[Dict[str, Any]]]:
     """
     Create embeddings for blocks using the sentence transformer model.
     
+    Embeddings are looked up by content hash in the persistent embedding
+    cache first; only distinct texts it does not hold are encoded, and
+    those are added to it.
+    
     Args:
         blocks: List of block data
         brain: Brain name for metadata
+        stats: Optional dict that receives embedding cache hits and misses
+        progress: Optional callback told how many blocks have vectors,
+            once after the cache lookup and then after every batch
         
     Returns:
         Tuple of (embeddings array, metadata list)
     """
-    model = get_model()
-    embeddings = []
-    metadata = []
+    embeddings, _ = await _embed_blocks(blocks, stats, progress)
+    metadata = [block_metadata(block, brain) for block in blocks]
+    return embeddings, metadata
+
+async def _embed_blocks(
+    blocks: List[Dict[str, Any]],
+    stats: Optional[Dict[str, Any]] = None,
+    progress: Optional[ProgressCallback] = None,
+    refreshed: Optional[Set[bytes]] = None,
+    hashes: Optional[List[bytes]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Embed blocks through the embedding cache, encoding each new text once.
+    
+    Args:
+        refreshed: If given, re-encode texts instead of trusting their
+            cached vectors, except those whose hashes are in the set;
+            texts encoded here overwrite their cache entries and are added
+            to it, so a full reindex encodes each text once
+        hashes: Content hashes of blocks, if the caller already has them
+    
+    Returns:
+        Tuple of (normalized embeddings, boolean mask of the rows whose
+        text was encoded here, first occurrence only)
+    """
+    model = await run_index(get_model)
+    store = get_embedding_store(model.info())
+    if hashes is None:
+        hashes = await run_index(_content_hashes, blocks)
+    if refreshed is None:
+        found, embeddings = await run_index(store.get_many, hashes)
+    else:
+        found = np.zeros(len(blocks), dtype=bool)
+        embeddings = np.zeros((len(blocks), model.dimension), dtype="float32")
+        lookup = [row for row, digest in enumerate(hashes) if digest in refreshed]
+        if lookup:
+            found[lookup], embeddings[lookup] = await run_index(store.get_many, [hashes[row] for row in lookup])
     
-    # Process in batches to avoid memory issues
-    batch_size = 32
-    for i in range(0, len(blocks), batch_size):
-        batch = blocks[i:i + batch_size]
-        batch_texts = [block["content"] for block in batch]
-        batch_embeddings = model.encode(batch_texts, convert_to_numpy=True)
+    # Encode each distinct uncached text once
+    missing: Dict[bytes, List[int]] = {}
+    for row in np.flatnonzero(~found):
+        missing.setdefault(hashes[row], []).append(row)
+    texts = [blocks[rows[0]]["content"] for rows in missing.values()]
+    row_counts = np.array([len(rows) for rows in missing.values()], dtype="int64")
+    encoded_rows = np.zeros(len(blocks), dtype=bool)
+    encoded_rows[[rows[0] for rows in missing.values()]] = True
+    done = int(found.sum())
+    _report(progress, "embed", done, len(blocks))
+    
+    if texts:
+        # Batches of similar length, so short blocks are not padded to long ones
+        encoded = np.empty((len(texts), model.dimension), dtype="float32")
+        # Counting runs the tokenizer of the torch and ONNX backends, so keep it off the event loop
+        token_counts = await run_index(model.count_tokens, texts)
+        for batch in plan_batches(token_counts):
+            batch_embeddings = await run_index(
+                model.encode, [texts[i] for i in batch], batch_size=len(batch), convert_to_numpy=True
+            )
+            # Normalize vectors for cosine similarity
+            encoded[batch] = normalize_vectors(np.asarray(batch_embeddings, dtype="float32"))
+            done += int(row_counts[batch].sum())
+            _report(progress, "embed", done, len(blocks))
         
-        embeddings.extend(batch_embeddings)
-        for block in batch:
-            metadata.append({
-                "uid": block["uid"],
-                "content": block["content"],
-                "brain": brain
-            })
+        # Copy each text's vector to every row holding it, in input order
+        text_rows = np.concatenate([np.array(rows, dtype="int64") for rows in missing.values()])
+        embeddings[text_rows] = np.repeat(encoded, row_counts, axis=0)
+        await run_index(store.put_many, list(missing), encoded, refreshed is not None)
+        if refreshed is not None:
+            refreshed.update(missing)
+    if found.any():
+        await run_index(store.flush)
+    
+    if stats is not None:
+        hits = int(found.sum())
+        stats.update({
+            "hits": hits,
+            "misses": len(blocks) - hits,
+            "hit_rate": hits / len(blocks) if blocks else 0.0,
+            "encoded": len(texts)
+        })
+    # Cached rows come back from float16 slightly off unit length
+    return normalize_vectors(embeddings), encoded_rows
+
+def _content_hashes(blocks: List[Dict[str, Any]]) -> List[bytes]:
+    return [content_hash(block["content"]) for block in blocks]
+
+def replace_file(path: str, write: Callable[[str], None]) -> None:
+    """
+    Write a file beside its destination and swap it in with os.replace().
+    
+    Readers that memory-mapped the old file keep a valid mapping of the old
+    inode instead of seeing it truncated and rewritten underneath them.
+    """
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def save_brain_files(
+    files: Dict[str, str],
+    index: Any,
+    index_params: Dict[str, Any],
+    embeddings: np.ndarray,
+    metadata: List[Dict[str, Any]],
+    attributes: Optional[BlockAttributes] = None,
+    state: Optional[BlockState] = None
+) -> None:
+    """
+    Persist everything search needs for a brain.
+    
+    Args:
+        files: Paths returned by get_filenames()
+        index: Populated FAISS index
+        index_params: Build parameters returned by build_index()
+        embeddings: Normalized float32 vectors, one row per metadata entry
+        metadata: Metadata rows in index order
+        attributes: Filterable block attributes in index order
+        state: Block edit times and content hashes in index order
+    """
+    def write_json(data):
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(data, f)
+        return write
     
-    embeddings_array = np.array(embeddings).astype('float32')
-    # Normalize vectors for cosine similarity
-    normalized_embeddings = normalize_vectors(embeddings_array)
-    return normalized_embeddings, metadata
+    def write_vectors(path):
+        with open(path, "wb") as f:
+            np.save(f, embeddings)
+    
+    replace_file(files["index"], lambda path: write_index(index, path))
+    replace_file(files["meta"], lambda path: write_metadata_store(path, metadata))
+    replace_file(files["params"], write_json(index_params))
+    # Full-precision vectors for exact re-ranking of compressed indexes
+    replace_file(files["vectors"], write_vectors)
+    # BM25 postings over the same rows for lexical and hybrid search
+    lexical = LexicalIndex.build([row["content"] for row in metadata])
+    replace_file(files["lexical"], lexical.save)
+    # Block type, edit time and tag columns for filtered search
+    if attributes is not None:
+        replace_file(files["attrs"], attributes.save)
+    # Edit times and content hashes for the next incremental reindex
+    if state is not None:
+        replace_file(files["blocks"], state.save)
+
+def load_previous_build(
+    files: Dict[str, str],
+    embedding: Dict[str, Any]
+) -> Tuple[Optional[BlockState], Optional[np.ndarray], Optional[Dict[str, Any]]]:
+    """
+    Load the block state and vectors of the last build, if reusable.
+    
+    Vectors are only reused when they came from the same embedding model
+    and line up with the recorded block state.
+    
+    Args:
+        files: Paths returned by get_filenames()
+        embedding: Description of the current embedding backend
+        
+    Returns:
+        Tuple of (block state, memory-mapped vectors, index parameters),
+        all None if the last build cannot be reused
+    """
+    if not all(os.path.exists(files[key]) for key in ("blocks", "vectors", "params")):
+        return None, None, None
+    with open(files["params"], "r", encoding="utf-8") as f:
+        params = json.load(f)
+    built_with = params.get("embedding") or {}
+    if (built_with.get("model"), built_with.get("dimension")) != (embedding["model"], embedding["dimension"]):
+        logger.info(f"Embedding model changed from {built_with.get('model')}; embedding every block")
+        return None, None, None
+    state = BlockState.load(files["blocks"])
+    vectors = np.load(files["vectors"], mmap_mode="r")
+    if len(vectors) != len(state):
+        logger.warning(f"{files['vectors']} does not match {files['blocks']}; embedding every block")
+        return None, None, None
+    return state, vectors, params
 
-async def reindex_brain(brain: str) -> Dict[str, Any]:
+def referenced_hashes() -> Set[bytes]:
+    """Get the content hashes of every block indexed in any brain."""
+    referenced: Set[bytes] = set()
+    for brain in BRAINS:
+        path = get_filenames(brain)["blocks"]
+        if os.path.exists(path):
+            referenced.update(BlockState.load(path).hashes.tolist())
+    return referenced
+
+async def reindex_brain(
+    brain: str,
+    full: bool = False,
+    progress: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
     """
     Reindex a specific brain's content using Roam API data.
     
+    Unless full (or REINDEX_INCREMENTAL is off), blocks whose content hash
+    matches the last build reuse their stored vectors, so only new and
+    changed blocks are embedded; if neither the blocks nor the index config
+    changed, no files are written.
+    
     Args:
         brain: The brain to reindex ("ideas" or "marketing")
+        full: Re-encode every block, bypassing the last build and the
+            embedding cache
+        progress: Optional callback told the current phase and, while
+            embedding, how many blocks have vectors
         
     Returns:
-        Dict containing status and metrics
+        Dict containing status and metrics, including counts of added,
+        updated, removed and unchanged blocks, embedding cache hits and
+        the estimated embedding time saved
         
     Raises:
         Exception: If reindexing fails
     """
-    start_time = datetime.now()
-    processed_uids = set()  # Track processed block UIDs
-    
     try:
-        # Get blocks under TOC page
-        toc_page = f"TOC - {brain}"
-        logger.info(f"Fetching blocks under {toc_page}")
-        blocks = await get_blocks_under_toc(toc_page)
-        
-        if not blocks:
-            raise ValueError(f"No blocks found under {toc_page}")
-        
-        # Process TOC blocks first
-        all_blocks = []
-        toc_uids = []
-        for block in blocks:
-            uid, content, timestamp = block
-            if uid not in processed_uids:
-                processed_uids.add(uid)
-                all_blocks.append({
-                    "uid": uid,
-                    "content": content,
-                    "timestamp": timestamp,
-                    "type": "block"
-                })
-                toc_uids.append(uid)
-        
-        # Get all references in a single batch
-        logger.info("Fetching block references")
-        refs = await get_block_references_batch(toc_uids)
-        ref_blocks = await process_references(refs, processed_uids)
-        all_blocks.extend(ref_blocks)
-        
-        if not all_blocks:
-            raise ValueError(f"No valid blocks found to index in {brain} brain")
-            
-        # Create embeddings and metadata
-        logger.info("Creating embeddings")
-        embeddings, metadata = await create_embeddings(all_blocks, brain)
+        results = await reindex_brains([brain], full, progress)
+    except ReindexError as e:
+        raise e.failures[brain]
+    return results[brain]
+
+async def reindex_brains(
+    brains: Sequence[str],
+    full: bool = False,
+    progress: Optional[ProgressCallback] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Reindex several brains together through one streaming pipeline.
+    
+    Blocks flow through four concurrent stages joined by byte-bounded
+    queues: fetch (TOC blocks, then references REINDEX_PAGE_SIZE TOC blocks
+    per query, every brain at once), prepare (block records and reuse of
+    unchanged vectors), embed (cache lookups and encoding, up to
+    REINDEX_EMBED_CHUNK blocks of any brain at a time, so text shared by
+    brains is encoded once) and write (vectors straight into each brain's
+    new generation). Roam requests thus overlap with encoding, and the
+    queues hold at most REINDEX_PIPELINE_MAX_BYTES. Each brain's index is
+    then built and published as its own generation, concurrently.
+    
+    A brain that fails does not stop the others from being published;
+    once they are done, a ReindexError carries both the results and each
+    failed brain's error. Callers must hold each brain's build_lock(), so
+    that no brain is reindexed twice at once.
+    
+    Args:
+        brains: Brains to reindex
+        full: Re-encode every block, bypassing the last build and the
+            embedding cache
+        progress: Optional callback told the current phase and how many of
+            the blocks found so far have vectors
         
-        # Create and save FAISS index
-        logger.info("Creating FAISS index")
-        dimension = embeddings.shape[1]
-        # Use IndexFlatIP for inner product (cosine similarity with normalized vectors)
-        index = faiss.IndexFlatIP(dimension)
-        index.add(embeddings)
+    Returns:
+        Dict mapping each brain to its reindex_brain() result, each with
+        the pipeline's stage and queue metrics
         
-        # Save index and metadata
-        files = get_filenames(brain)
-        os.makedirs(os.path.dirname(files["index"]), exist_ok=True)
-        os.makedirs(os.path.dirname(files["meta"]), exist_ok=True)
+    Raises:
+        ReindexError: If any brain failed after the pipeline ran
+        Exception: If the pipeline itself failed, in which case no brain
+            was published
+    """
+    start_time = datetime.now()
+    embedding = await run_index(embedding_info)
+    builds = []
+    try:
+        for brain in brains:
+            previous, previous_vectors, previous_params = None, None, None
+            if not full and REINDEX_INCREMENTAL:
+                previous, previous_vectors, previous_params = await run_index(
+                    load_previous_build, get_filenames(brain), embedding
+                )
+            generation, files = await run_index(create_generation, brain)
+            builds.append(await run_index(
+                _BrainBuild, brain, generation, files, embedding["dimension"], previous, previous_vectors, previous_params
+            ))
         
-        faiss.write_index(index, files["index"])
-        with open(files["meta"], "w") as f:
-            json.dump(metadata, f)
+        pipeline = Pipeline(REINDEX_PIPELINE_MAX_BYTES, {"fetched": 0.25, "embed": 0.25, "vectors": 0.5})
+        cache_stats: Dict[str, Any] = {"hits": 0, "misses": 0, "hit_rate": 0.0, "encoded": 0, "deduplicated": 0}
+        await _stream_blocks(builds, pipeline, cache_stats, full, progress)
+        embed_seconds = pipeline.stage("embed").busy_seconds
+        seconds_per_block = embed_seconds / cache_stats["encoded"] if cache_stats["encoded"] else None
+        pipeline_stats = pipeline.stats()
+        logger.info(f"Reindex pipeline for {', '.join(brains)}: {pipeline_stats}")
+    except BaseException:
+        for build in builds:
+            build.close()
+            await run_index(discard_generation, build.brain, build.generation)
+        raise
+    
+    results: Dict[str, Dict[str, Any]] = {}
+    failures: Dict[str, BaseException] = {}
+    ready = []
+    for build in builds:
+        if build.error is None and not build.blocks:
+            build.error = ValueError(f"No valid blocks found to index in {build.brain} brain")
+        if build.error is not None:
+            build.close()
+            failures[build.brain] = build.error
+            await run_index(discard_generation, build.brain, build.generation)
+            continue
+        current = await run_index(BlockState.build, build.blocks)
+        plan = await run_index(ReindexPlan, build.previous, current)
+        mode = "full" if build.previous is None else "incremental"
+        logger.info(f"Embedded {len(plan.embed_rows)} of {len(build.blocks)} blocks in {build.brain} ({mode}: {plan.counts()})")
         
+        if build.previous is not None and build.previous.same_as(current) and _same_index(build, embedding):
+            build.close()
+            await run_index(discard_generation, build.brain, build.generation)
+            duration = (datetime.now() - start_time).total_seconds()
+            logger.info(f"No changes in {build.brain} brain since the last reindex ({duration:.2f} seconds)")
+            results[build.brain] = {
+                "status": "success",
+                "mode": mode,
+                "generation": current_generation(build.brain),
+                "blocks_processed": len(build.blocks),
+                "index_type": build.previous_params["type"],
+                "embedding_backend": embedding["backend"],
+                **plan.counts(),
+                "embedded": 0,
+                "embedding_cache": {"hits": 0, "misses": 0, "hit_rate": 0.0, "encoded": 0},
+                "time_saved_seconds": len(build.blocks) * build.previous.seconds_per_block,
+                "duration": duration,
+                "pipeline": pipeline_stats
+            }
+            continue
+        try:
+            await run_index(build.copy_reused)
+        except Exception as e:
+            failures[build.brain] = e
+            await run_index(discard_generation, build.brain, build.generation)
+            continue
+        finally:
+            build.close()
+        current.seconds_per_block = seconds_per_block or (
+            build.previous.seconds_per_block if build.previous is not None else 0.0
+        )
+        ready.append((build, mode, plan, current))
+    
+    # Build and publish every changed brain's generation concurrently
+    _report(progress, "build")
+    published = await asyncio.gather(
+        *(_publish_brain(build.brain, build.generation, build.files, build.blocks, build.vectors(),
+                         embedding, current, start_time, progress)
+          for build, _, _, current in ready),
+        return_exceptions=True
+    )
+    for (build, mode, plan, current), outcome in zip(ready, published):
+        build.remove_spill()
+        if isinstance(outcome, BaseException):
+            failures[build.brain] = outcome
+            continue
         duration = (datetime.now() - start_time).total_seconds()
-        logger.info(f"Successfully reindexed {brain} brain in {duration:.2f} seconds")
-        
-        return {
+        logger.info(f"Successfully reindexed {build.brain} brain in {duration:.2f} seconds")
+        results[build.brain] = {
             "status": "success",
-            "blocks_processed": len(all_blocks),
-            "duration": duration
+            "mode": mode,
+            "generation": build.generation,
+            "blocks_processed": len(build.blocks),
+            "index_type": outcome["type"],
+            "embedding_backend": embedding["backend"],
+            **plan.counts(),
+            "embedded": len(plan.embed_rows),
+            "embedding_cache": cache_stats,
+            "time_saved_seconds": (len(build.blocks) - build.encoded) * current.seconds_per_block,
+            "duration": duration,
+            "pipeline": pipeline_stats
         }
+    
+    if any(not isinstance(outcome, BaseException) for outcome in published):
+        # Drop cached embeddings of text no brain holds any more
+        store = get_embedding_store(embedding)
+        cache_stats["collected"] = await run_index(lambda: store.collect_garbage(referenced_hashes()))
+    
+    for brain, error in failures.items():
+        logger.error(f"❌ Failed to reindex {brain} brain", exc_info=error)
+    if failures:
+        raise ReindexError(results, failures)
+    return results
+
+def _same_index(build: "_BrainBuild", embedding: Dict[str, Any]) -> bool:
+    """Check whether the last build's index is what the current index config would build."""
+    built = {key: value for key, value in build.previous_params.items() if key != "embedding"}
+    if built == index_params(len(build.blocks), embedding["dimension"], get_index_config(build.brain)):
+        return True
+    logger.info(f"Index config of {build.brain} changed since the last reindex; rebuilding its index")
+    return False
+
+class _BrainBuild:
+    """
+    One brain's share of a streaming reindex.
+    
+    Blocks are appended in FAISS row order as they arrive; the vectors of
+    new and changed blocks, which arrive out of order, are written to a
+    spill file in the new generation's directory and read back
+    memory-mapped for the index build. Unchanged blocks only record which
+    previous row they reuse; those vectors are copied into the spill file
+    once the brain is known to need a new build, so an unchanged brain
+    writes nothing.
+    """
+    
+    def __init__(
+        self,
+        brain: str,
+        generation: str,
+        files: Dict[str, str],
+        dimension: int,
+        previous: Optional[BlockState],
+        previous_vectors: Optional[np.ndarray],
+        previous_params: Optional[Dict[str, Any]]
+    ):
+        self.brain = brain
+        self.generation = generation
+        self.files = files
+        self.dimension = dimension
+        self.previous = previous
+        self.previous_vectors = previous_vectors
+        self.previous_params = previous_params
+        self.previous_rows = {uid: row for row, uid in enumerate(previous.uids)} if previous is not None else {}
+        self.blocks: List[Dict[str, Any]] = []
+        self.processed_uids: Set[str] = set()
+        self.references: Dict[str, Dict[str, Any]] = {}
+        self.reuse_rows: List[int] = []
+        self.reuse_from: List[int] = []
+        self.written = 0
+        self.encoded = 0
+        self.error: Optional[BaseException] = None
+        self.spill_path = f"{files['vectors']}.spill"
+        self._spill = open(self.spill_path, "w+b")
+    
+    @property
+    def done(self) -> int:
+        """Rows whose vector is written or will be reused."""
+        return self.written + len(self.reuse_rows)
+    
+    def add(self, blocks: List[Dict[str, Any]]) -> List[int]:
+        """
+        Append blocks, recording the previous rows that unchanged ones reuse.
+        
+        Returns:
+            Rows of the blocks that need embedding
+        """
+        embed = []
+        for block in blocks:
+            row = len(self.blocks)
+            self.blocks.append(block)
+            old = self.previous_rows.get(block["uid"])
+            if old is not None and self.previous.hashes[old] == content_hash(block["content"]):
+                self.reuse_rows.append(row)
+                self.reuse_from.append(old)
+            else:
+                embed.append(row)
+        return embed
+    
+    def write(self, rows: Sequence[int], vectors: np.ndarray) -> None:
+        """Write the vectors of rows into the spill file, one write per run of consecutive rows."""
+        rows = np.asarray(rows, dtype="int64")
+        order = np.argsort(rows, kind="stable")
+        rows = rows[order]
+        vectors = np.ascontiguousarray(np.asarray(vectors, dtype="float32")[order])
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(rows) != 1) + 1, [len(rows)]])
+        for start, end in zip(starts[:-1], starts[1:]):
+            self._spill.seek(int(rows[start]) * self.dimension * 4)
+            self._spill.write(vectors[start:end].tobytes())
+    
+    def copy_reused(self, chunk: int = 4096) -> None:
+        """Copy the vectors of unchanged blocks from the previous build into the spill file."""
+        reused = len(self.reuse_rows)
+        for start in range(0, reused, chunk):
+            self.write(
+                self.reuse_rows[start:start + chunk],
+                self.previous_vectors[self.reuse_from[start:start + chunk]]
+            )
+    
+    def vectors(self) -> np.ndarray:
+        """Get every row's vector, memory-mapped from the spill file."""
+        return np.memmap(self.spill_path, dtype="float32", mode="r", shape=(len(self.blocks), self.dimension))
+    
+    def close(self) -> None:
+        if not self._spill.closed:
+            self._spill.close()
+    
+    def remove_spill(self) -> None:
+        if os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+def _text_bytes(texts: Iterable[str]) -> int:
+    """Rough in-memory size of blocks with these texts, for queue budgets."""
+    return sum(len(text) * 2 + 200 for text in texts)
+
+async def _stream_blocks(
+    builds: List[_BrainBuild],
+    pipeline: Pipeline,
+    cache_stats: Dict[str, Any],
+    full: bool = False,
+    progress: Optional[ProgressCallback] = None
+) -> None:
+    """
+    Run the fetch, prepare, embed and write stages of a reindex.
+    
+    A brain whose fetch fails gets its error recorded and is skipped by the
+    later stages; any other stage failing aborts the whole pipeline.
+    """
+    fetched, to_embed, to_write = (pipeline.queues[name] for name in ("fetched", "embed", "vectors"))
+    for name in ("fetch", "prepare", "embed", "write"):
+        pipeline.stage(name)
+    phases = ["fetch", "references", "embed"]
+    phase = "fetch"
+    
+    def advance(name: str) -> None:
+        nonlocal phase
+        if phases.index(name) > phases.index(phase):
+            phase = name
+        report()
+    
+    def report() -> None:
+        total = sum(len(build.blocks) for build in builds)
+        _report(progress, phase, sum(build.done for build in builds), total)
+    
+    async def fetch(build: _BrainBuild) -> None:
+        stage = pipeline.stage("fetch")
+        try:
+            toc_page = f"TOC - {build.brain}"
+            logger.info(f"Fetching blocks under {toc_page}")
+            with stage.busy():
+                blocks = await get_blocks_under_toc(toc_page)
+            stage.blocks += len(blocks)
+            if not blocks:
+                raise ValueError(f"No blocks found under {toc_page}")
+            for start in range(0, len(blocks), REINDEX_PAGE_SIZE):
+                page = blocks[start:start + REINDEX_PAGE_SIZE]
+                await fetched.put((build, "block", page), _text_bytes(block[1] for block in page))
+            
+            # References of REINDEX_PAGE_SIZE TOC blocks per query
+            logger.info(f"Fetching block references for {build.brain}")
+            advance("references")
+            toc_uids = list(dict.fromkeys(block[0] for block in blocks))
+            for start in range(0, len(toc_uids), REINDEX_PAGE_SIZE):
+                with stage.busy():
+                    refs = await get_block_references_batch(toc_uids[start:start + REINDEX_PAGE_SIZE])
+                stage.blocks += len(refs)
+                if refs:
+                    await fetched.put((build, "reference", refs), _text_bytes(ref[1] for ref in refs))
+        except Exception as e:
+            build.error = e
+    
+    async def fetch_all() -> None:
+        await asyncio.gather(*(fetch(build) for build in builds))
+        await fetched.close()
+        advance("embed")
+    
+    async def prepare() -> None:
+        stage = pipeline.stage("prepare")
+        while (item := await fetched.get()) is not None:
+            build, kind, rows = item
+            if build.error is not None:
+                continue
+            with stage.busy(len(rows)):
+                if kind == "block":
+                    new_blocks = []
+                    for uid, content, timestamp in rows:
+                        if uid not in build.processed_uids:
+                            build.processed_uids.add(uid)
+                            new_blocks.append({
+                                "uid": uid,
+                                "content": content,
+                                "timestamp": timestamp,
+                                "type": "block"
+                            })
+                else:
+                    new_blocks = await process_references(rows, build.processed_uids, build.references)
+                # Hashing every block would stall searches sharing the event loop
+                embed = await run_index(build.add, new_blocks)
+            if embed:
+                blocks = [build.blocks[row] for row in embed]
+                await to_embed.put((build, embed, blocks), _text_bytes(block["content"] for block in blocks))
+            report()
+        await to_embed.close()
+    
+    async def embed() -> None:
+        stage = pipeline.stage("embed")
+        seen: Set[bytes] = set()
+        # A full reindex re-encodes every text once instead of trusting the cache
+        refreshed: Optional[Set[bytes]] = set() if full else None
+        while (item := await to_embed.get()) is not None:
+            # Take whatever else is already waiting, up to a full chunk
+            chunk = [item]
+            while len(to_embed) and sum(len(rows) for _, rows, _ in chunk) < REINDEX_EMBED_CHUNK:
+                chunk.append(await to_embed.get())
+            chunk = [(build, rows, blocks) for build, rows, blocks in chunk if build.error is None]
+            blocks = [block for _, _, chunk_blocks in chunk for block in chunk_blocks]
+            if not blocks:
+                continue
             
-    except Exception as e:
-        logger.error(f"❌ Failed to reindex {brain} brain", exc_info=True)
+            stats: Dict[str, Any] = {}
+            with stage.busy(len(blocks)):
+                hashes = await run_index(_content_hashes, blocks)
+                for digest in hashes:
+                    cache_stats["deduplicated"] += digest in seen
+                    seen.add(digest)
+                vectors, encoded_rows = await _embed_blocks(blocks, stats, refreshed=refreshed, hashes=hashes)
+            for key in ("hits", "misses", "encoded"):
+                cache_stats[key] += stats[key]
+            lookups = cache_stats["hits"] + cache_stats["misses"]
+            cache_stats["hit_rate"] = cache_stats["hits"] / lookups if lookups else 0.0
+            
+            offset = 0
+            for build, rows, _ in chunk:
+                build.encoded += int(encoded_rows[offset:offset + len(rows)].sum())
+                part = vectors[offset:offset + len(rows)]
+                offset += len(rows)
+                await to_write.put((build, rows, part), part.nbytes)
+        await to_write.close()
+    
+    async def write() -> None:
+        stage = pipeline.stage("write")
+        while (item := await to_write.get()) is not None:
+            build, rows, vectors = item
+            if build.error is not None:
+                continue
+            with stage.busy(len(rows)):
+                await run_index(build.write, rows, vectors)
+            build.written += len(rows)
+            report()
+    
+    _report(progress, "fetch")
+    await pipeline.run(fetch_all(), prepare(), embed(), write())
+    report()
+
+async def _publish_brain(
+    brain: str,
+    generation: str,
+    files: Dict[str, str],
+    all_blocks: List[Dict[str, Any]],
+    embeddings: np.ndarray,
+    embedding: Dict[str, Any],
+    current: BlockState,
+    start_time: datetime,
+    progress: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    Build a brain's index into its new generation and publish it.
+    
+    Searches keep reading the published generation until the new build is
+    complete; a failed build is discarded.
+    
+    Returns:
+        The index parameters
+    """
+    try:
+        index_params = await _build_generation(brain, all_blocks, embeddings, embedding, current, files)
+        _report(progress, "publish")
+        await run_index(
+            write_manifest, brain, generation, files, index_params,
+            (datetime.now() - start_time).total_seconds()
+        )
+        await run_index(publish_generation, brain, generation)
+    except BaseException:
+        if current_generation(brain) != generation:
+            await run_index(discard_generation, brain, generation)
         raise
+    
+    # Drop the resident copy so this worker reloads the new index, and
+    # free cached results for the old one (other workers see them go
+    # stale through the changed file signature)
+    get_registry().invalidate(brain)
+    get_result_cache().invalidate(brain)
+    return index_params
+
+def _block_rows(blocks: List[Dict[str, Any]], brain: str) -> Tuple[List[Dict[str, Any]], BlockAttributes]:
+    """Get the metadata rows and filterable attributes of blocks in index order."""
+    return [block_metadata(block, brain) for block in blocks], BlockAttributes.build(blocks)
+
+async def _build_generation(
+    brain: str,
+    all_blocks: List[Dict[str, Any]],
+    embeddings: np.ndarray,
+    embedding: Dict[str, Any],
+    current: BlockState,
+    files: Dict[str, str]
+) -> Dict[str, Any]:
+    """
+    Index and save a brain's blocks into one generation's files.
+    
+    Returns:
+        The index parameters written to the generation
+    """
+    # Create FAISS index (inner product = cosine similarity on normalized vectors)
+    index_config = get_index_config(brain)
+    logger.info(f"Creating FAISS index for {brain} (configured type: {index_config['type']})")
+    index, index_params = await run_index(build_index, embeddings, index_config)
+    # Recorded so searches refuse to query it with a different model
+    index_params["embedding"] = embedding
+    
+    metadata, attributes = await run_index(_block_rows, all_blocks, brain)
+    await run_index(save_brain_files, files, index, index_params, embeddings, metadata, attributes, current)
+    return index_params
 
 class IndexingService:
     """Service for handling brain indexing operations."""
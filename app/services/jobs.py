@@ -0,0 +1,212 @@
+"""Background reindex jobs with progress reporting."""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.config import BRAINS, REINDEX_JOBS_KEEP
+from app.services.generations import build_lock
+from app.services.indexing import ReindexError, reindex_brains
+
+logger = logging.getLogger(__name__)
+
+class ReindexJob:
+    """
+    State of one background reindex of one or more brains.
+
+    The job's brains are reindexed together by reindex_brains(), so
+    progress counts the blocks of all of them. Throughput and ETA are
+    measured from the first report of a phase, so blocks served from the
+    embedding cache right away do not inflate them.
+    """
+
+    def __init__(self, brains: Sequence[str], full: bool = False):
+        self.id = uuid.uuid4().hex
+        self.brains = list(brains)
+        self.full = full
+        self.state = "queued"
+        self.phase: Optional[str] = None
+        self.done = 0
+        self.total = 0
+        self.attached = 0
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.errors: Dict[str, str] = {}
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._rate_from: Optional[tuple] = None
+
+    @property
+    def active(self) -> bool:
+        return self.state in ("queued", "running")
+
+    def covers(self, brains: Sequence[str], full: bool) -> bool:
+        """Check whether this job already does what a new request asks for."""
+        return self.active and set(brains) <= set(self.brains) and (self.full or not full)
+
+    def report(self, phase: str, done: int = 0, total: int = 0) -> None:
+        """Progress callback passed to reindex_brains()."""
+        if phase != self.phase:
+            self.phase = phase
+            self._rate_from = None
+        if self._rate_from is None:
+            self._rate_from = (time.perf_counter(), done)
+        self.done, self.total = done, total
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """Blocks per second in the current phase, once measurable."""
+        if self._rate_from is None:
+            return None
+        started, done = self._rate_from
+        elapsed = time.perf_counter() - started
+        if elapsed <= 0 or self.done <= done:
+            return None
+        return (self.done - done) / elapsed
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Estimated seconds until the current phase has all its blocks."""
+        rate = self.throughput
+        if not self.active or rate is None or self.total <= self.done:
+            return None
+        return (self.total - self.done) / rate
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "brains": self.brains,
+            "full": self.full,
+            "status": self.state,
+            "phase": self.phase,
+            "blocks_done": self.done,
+            "blocks_total": self.total,
+            "throughput": self.throughput,
+            "eta_seconds": self.eta_seconds,
+            "attached": self.attached,
+            "results": self.results,
+            "errors": self.errors,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+class ReindexJobs:
+    """
+    Starts reindex jobs and tracks them by id.
+
+    A request for brains a queued or running job already covers attaches to
+    that job instead of starting another. Otherwise a new job starts; jobs
+    sharing a brain take turns on per-brain locks, since two builds of one
+    brain would race to publish. Each brain's build_lock() also makes jobs
+    wait for builds in other worker processes and scripts/index.py; a job
+    stays queued until it holds every lock.
+
+    Jobs are tracked in memory by the worker that started them, so with
+    several workers a job's status is only found on that worker, and
+    requests only attach to jobs running in the same worker.
+    """
+
+    def __init__(self, keep: int = REINDEX_JOBS_KEEP):
+        self.keep = keep
+        self._jobs: "OrderedDict[str, ReindexJob]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def submit(self, brains: Optional[Sequence[str]] = None, full: bool = False) -> ReindexJob:
+        """
+        Start reindexing brains in the background, or join a job doing so.
+
+        Args:
+            brains: Brains to reindex; defaults to all of BRAINS
+            full: Re-encode every block, bypassing the last build and the
+                embedding cache
+
+        Returns:
+            The new job, or the running job the request attached to
+
+        Raises:
+            ValueError: If a brain is not one of BRAINS
+        """
+        brains = list(BRAINS if brains is None else brains)
+        for brain in brains:
+            if brain not in BRAINS:
+                raise ValueError(f"Invalid brain: {brain}. Must be one of {BRAINS}")
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Tasks and locks belong to one loop; start fresh on a new one
+            self._loop = loop
+            self._locks = {}
+            self._jobs = OrderedDict((key, job) for key, job in self._jobs.items() if not job.active)
+
+        for job in self._jobs.values():
+            if job.covers(brains, full):
+                job.attached += 1
+                logger.info(f"Reindex request for {brains} attached to running job {job.id}")
+                return job
+
+        job = ReindexJob(brains, full)
+        self._jobs[job.id] = job
+        job.task = loop.create_task(self._run(job))
+        self._prune()
+        logger.info(f"Started reindex job {job.id} for {brains}")
+        return job
+
+    async def _run(self, job: ReindexJob) -> None:
+        try:
+            async with AsyncExitStack() as stack:
+                # Always lock in the same order so overlapping jobs cannot deadlock
+                for brain in sorted(job.brains):
+                    await stack.enter_async_context(self._locks.setdefault(brain, asyncio.Lock()))
+                    await stack.enter_async_context(build_lock(brain))
+                job.state = "running"
+                job.started_at = time.time()
+                job.results = await reindex_brains(job.brains, full=job.full, progress=job.report)
+            job.state = "succeeded"
+        except ReindexError as e:
+            # The brains that succeeded were published all the same
+            job.state = "failed"
+            job.results = e.results
+            job.errors = {brain: str(error) for brain, error in e.failures.items()}
+            job.error = str(e)
+            logger.error(f"Reindex job {job.id} failed for {', '.join(e.failures)}")
+        except Exception as e:
+            job.state = "failed"
+            job.errors = {brain: str(e) for brain in job.brains}
+            job.error = f"{', '.join(job.brains)}: {e}"
+            logger.error(f"Reindex job {job.id} failed", exc_info=True)
+        finally:
+            job.finished_at = time.time()
+            self._prune()
+
+    def _prune(self) -> None:
+        finished = [key for key, job in self._jobs.items() if not job.active]
+        for key in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[key]
+
+    def get(self, job_id: str) -> ReindexJob:
+        """
+        Get a job by id.
+
+        Raises:
+            KeyError: If no job with that id is kept
+        """
+        return self._jobs[job_id]
+
+    def list(self) -> List[ReindexJob]:
+        """Get kept jobs, newest first."""
+        return list(reversed(self._jobs.values()))
+
+_jobs = ReindexJobs()
+
+def get_reindex_jobs() -> ReindexJobs:
+    """Get the process-wide reindex job tracker."""
+    return _jobs
@@ -0,0 +1,140 @@
+"""In-process BM25 inverted index over block content."""
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from app.services.array_store import load_arrays, save_arrays
+
+# Word characters plus inner hyphens/apostrophes, so "follow-up" and
+# "don't" stay whole; "#tag" and "[[Page Name]]" reduce to their words.
+TOKEN_PATTERN = re.compile(r"\w+(?:[-']\w+)*")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class LexicalIndex:
+    """
+    BM25 index stored as compact postings arrays.
+
+    Postings for term t are doc_ids[term_offsets[t]:term_offsets[t + 1]]
+    with matching term frequencies in tfs; doc ids are FAISS row ids, so
+    lexical and semantic hits refer to the same metadata rows.
+    """
+
+    def __init__(
+        self,
+        terms: Sequence[str],
+        term_offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        tfs: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float = 1.2,
+        b: float = 0.75
+    ):
+        self.term_ids: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, texts: Sequence[str]) -> "LexicalIndex":
+        """
+        Build an index with one document per text, in row order.
+
+        Args:
+            texts: Block contents, one per FAISS row
+
+        Returns:
+            The populated index
+        """
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(texts), dtype="uint32")
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, []).append((doc_id, count))
+
+        terms = sorted(postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype="uint64")
+        for i, term in enumerate(terms):
+            term_offsets[i + 1] = term_offsets[i] + len(postings[term])
+        doc_ids = np.fromiter(
+            (doc_id for term in terms for doc_id, _ in postings[term]),
+            dtype="uint32", count=int(term_offsets[-1])
+        )
+        tfs = np.fromiter(
+            (min(count, 65535) for term in terms for _, count in postings[term]),
+            dtype="uint16", count=int(term_offsets[-1])
+        )
+        return cls(terms, term_offsets, doc_ids, tfs, doc_lengths)
+
+    def save(self, path: str) -> None:
+        """Write the index as a directory of .npy arrays."""
+        terms = np.array(sorted(self.term_ids, key=self.term_ids.get), dtype=str)
+        save_arrays(path, {
+            "terms": terms,
+            "term_offsets": self.term_offsets,
+            "doc_ids": self.doc_ids,
+            "tfs": self.tfs,
+            "doc_lengths": self.doc_lengths
+        })
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        """Read an index written by save(), mapping its postings read-only."""
+        data = load_arrays(path, ("terms", "term_offsets", "doc_ids", "tfs", "doc_lengths"))
+        return cls(
+            data["terms"].tolist(),
+            data["term_offsets"],
+            data["doc_ids"],
+            data["tfs"],
+            data["doc_lengths"]
+        )
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score documents against the query with BM25.
+
+        Args:
+            query: Query text
+            k: Maximum number of results
+            mask: Optional boolean array over rows; False rows are never returned
+
+        Returns:
+            Tuple of (scores, row ids) for matching rows, best first
+        """
+        n_docs = len(self)
+        term_ids = {self.term_ids[t] for t in tokenize(query) if t in self.term_ids}
+        if not n_docs or not term_ids:
+            return np.zeros(0, dtype="float32"), np.zeros(0, dtype="int64")
+
+        scores = np.zeros(n_docs, dtype="float32")
+        for term_id in term_ids:
+            start, end = int(self.term_offsets[term_id]), int(self.term_offsets[term_id + 1])
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end].astype("float32")
+            df = end - start
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / max(self.avg_length, 1e-9))
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if mask is not None:
+            scores[~mask] = 0
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return scores[order], order.astype("int64")
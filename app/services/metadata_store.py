@@ -0,0 +1,104 @@
+"""Compact, random-access storage for per-brain block metadata."""
+
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterable, List, Sequence, Union
+
+import numpy as np
+
+# Layout: magic | row count (uint64) | row count + 1 offsets (uint64) | records
+# Each record is one compact UTF-8 JSON object, so reading a row touches
+# only its own bytes and search never parses the whole file.
+MAGIC = b"RSSMETA1"
+HEADER = struct.Struct("<8sQ")
+
+# Keys implied by the file a row lives in, dropped when writing
+IMPLIED_KEYS = ("brain",)
+
+class MetadataStore:
+    """Read-only, memory-mapped view of a metadata store file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a metadata store")
+        self._count = count
+        self._offsets = np.frombuffer(self._mmap, dtype="<u8", count=count + 1, offset=HEADER.size)
+        self._data_start = HEADER.size + self._offsets.nbytes
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        if not 0 <= row < self._count:
+            raise IndexError(f"Metadata row {row} out of range")
+        start = self._data_start + int(self._offsets[row])
+        end = self._data_start + int(self._offsets[row + 1])
+        return json.loads(self._mmap[start:end])
+
+    def get_many(self, rows: Sequence[int]) -> List[Dict[str, Any]]:
+        """Read several rows, e.g. the top-k hits of a search."""
+        return [self[int(row)] for row in rows]
+
+def write_metadata_store(path: str, rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Write metadata rows to a store file, in FAISS row order.
+
+    Args:
+        path: Destination file
+        rows: Metadata dicts; keys in IMPLIED_KEYS are dropped
+
+    Returns:
+        Number of rows written
+    """
+    records = bytearray()
+    offsets = [0]
+    for row in rows:
+        compact = {key: value for key, value in row.items() if key not in IMPLIED_KEYS}
+        records += json.dumps(compact, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        offsets.append(len(records))
+
+    count = len(offsets) - 1
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, count))
+        f.write(np.asarray(offsets, dtype="<u8").tobytes())
+        f.write(records)
+    return count
+
+def open_metadata(path: str) -> Union[MetadataStore, List[Dict[str, Any]]]:
+    """
+    Open a brain's metadata for row lookups.
+
+    Args:
+        path: A metadata store, or a legacy metadata JSON list
+
+    Returns:
+        A sequence of metadata dicts indexed by FAISS row id
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return MetadataStore(path)
+
+def convert_json_metadata(json_path: str, store_path: str) -> int:
+    """
+    Convert a legacy metadata JSON list into a metadata store.
+
+    Args:
+        json_path: Existing metadata_<brain>.json file
+        store_path: Store file to create
+
+    Returns:
+        Number of rows converted
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    tmp_path = f"{store_path}.tmp"
+    count = write_metadata_store(tmp_path, rows)
+    os.replace(tmp_path, store_path)
+    return count
@@ -0,0 +1,157 @@
+"""Bounded producer/consumer stages for streaming reindexes."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Deque, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class StageQueue:
+    """
+    Queue between two pipeline stages, bounded by the bytes it holds.
+
+    put() waits while the queue is over its byte budget, so a fast producer
+    is held back by a slow consumer instead of buffering without limit. An
+    item larger than the whole budget is still let through once the queue
+    is empty, so oversized items cannot stall the pipeline.
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._items: Deque[Tuple[Any, int]] = deque()
+        self._bytes = 0
+        self._closed = False
+        self._changed = asyncio.Condition()
+        self.puts = 0
+        self.peak_depth = 0
+        self.peak_bytes = 0
+        self.wait_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def put(self, item: Any, nbytes: int) -> None:
+        """Add an item of roughly nbytes, waiting for room if needed."""
+        async with self._changed:
+            if self._bytes and self._bytes + nbytes > self.max_bytes:
+                started = time.perf_counter()
+                await self._changed.wait_for(lambda: not self._bytes or self._bytes + nbytes <= self.max_bytes)
+                self.wait_seconds += time.perf_counter() - started
+            self._items.append((item, nbytes))
+            self._bytes += nbytes
+            self.puts += 1
+            self.peak_depth = max(self.peak_depth, len(self._items))
+            self.peak_bytes = max(self.peak_bytes, self._bytes)
+            self._changed.notify_all()
+
+    async def get(self) -> Optional[Any]:
+        """Take the oldest item, or None once the queue is closed and empty."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._items or self._closed)
+            if not self._items:
+                return None
+            item, nbytes = self._items.popleft()
+            self._bytes -= nbytes
+            self._changed.notify_all()
+            return item
+
+    async def close(self) -> None:
+        """Tell consumers no more items are coming."""
+        async with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self._items),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "peak_depth": self.peak_depth,
+            "peak_bytes": self.peak_bytes,
+            "items": self.puts,
+            "producer_wait_seconds": round(self.wait_seconds, 3)
+        }
+
+class StageMetrics:
+    """Work done by one pipeline stage and the time it spent doing it."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.blocks = 0
+        self.busy_seconds = 0.0
+
+    @contextmanager
+    def busy(self, blocks: int = 0) -> Iterator[None]:
+        """Time one unit of work on blocks, excluding time spent waiting on queues."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+            self.items += 1
+            self.blocks += blocks
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "blocks": self.blocks,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "blocks_per_second": self.blocks / self.busy_seconds if self.busy_seconds else None
+        }
+
+class Pipeline:
+    """
+    Stage metrics and byte-bounded queues sharing one memory ceiling.
+
+    Each queue gets its share of max_bytes, so the queues together stay
+    within the ceiling (give or take one item larger than a queue's share).
+    A stage only ever waits for room on the queue after it, which the next
+    stage drains independently, so the pipeline cannot deadlock.
+    """
+
+    def __init__(self, max_bytes: int, shares: Dict[str, float]):
+        self.max_bytes = max_bytes
+        self.queues = {name: StageQueue(name, max(1, int(max_bytes * share))) for name, share in shares.items()}
+        self.stages: Dict[str, StageMetrics] = {}
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def stage(self, name: str) -> StageMetrics:
+        """Get or create the metrics of a stage."""
+        if name not in self.stages:
+            self.stages[name] = StageMetrics(name)
+        return self.stages[name]
+
+    async def run(self, *stages: Awaitable[Any]) -> None:
+        """
+        Run stage coroutines to completion.
+
+        If one fails, the rest are cancelled (they may be blocked on a queue
+        the failed stage would have drained) and the failure is raised.
+        """
+        tasks = [asyncio.ensure_future(stage) for stage in stages]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.finished = time.perf_counter()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get per-stage throughput and per-queue depth and backpressure."""
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        return {
+            "seconds": round(elapsed, 3),
+            "max_bytes": self.max_bytes,
+            "stages": {name: stage.stats() for name, stage in self.stages.items()},
+            "queues": {name: queue.stats() for name, queue in self.queues.items()}
+        }
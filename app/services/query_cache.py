@@ -0,0 +1,186 @@
+"""LRU caches for query embeddings and search results."""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# Rough per-entry bookkeeping cost (dict slot, tuple, array header)
+ENTRY_OVERHEAD_BYTES = 200
+
+def normalize_query(text: str) -> str:
+    """
+    Reduce a query to its cache key.
+
+    Queries differing only in case or spacing share one cache entry. The
+    key is never what gets embedded: callers encode the query as written.
+    """
+    return " ".join(text.split()).lower()
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by the total size of its entries.
+
+    Entries are evicted least-recently-used first once the cache holds more
+    than max_bytes, and expire ttl_seconds after they were stored (a TTL of
+    0 keeps them until evicted).
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max(0, max_bytes)
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: Hashable) -> Optional[Any]:
+        """Get a stored value, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and time.monotonic() - entry[1] > self.ttl:
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _put(self, key: Hashable, value: Any, size: int) -> None:
+        """Store a value of the given size, evicting old entries to fit."""
+        size += ENTRY_OVERHEAD_BYTES
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, time.monotonic(), size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self) -> int:
+        """Drop every entry; returns how many were dropped."""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self.bytes = 0
+            return count
+
+    def stats(self, entries: int = 0) -> Dict[str, Any]:
+        """
+        Get size, hit ratio and eviction counters.
+
+        Args:
+            entries: Also list up to this many keys, most recently used first
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats: Dict[str, Any] = {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+            if entries > 0:
+                now = time.monotonic()
+                keys: List[Dict[str, Any]] = []
+                for key in reversed(self._entries):
+                    _, stored_at, size = self._entries[key]
+                    keys.append({"key": key, "bytes": size, "age_seconds": round(now - stored_at, 3)})
+                    if len(keys) >= entries:
+                        break
+                stats["recent"] = keys
+            return stats
+
+class QueryEmbeddingCache(LRUCache):
+    """
+    Maps normalized query text to its normalized embedding.
+
+    Cached vectors are read-only so callers cannot corrupt them in place.
+    """
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Get a cached embedding, or None if absent or expired."""
+        return self._get(key)
+
+    def put(self, key: str, embedding: np.ndarray) -> None:
+        """Store an embedding, evicting the least recently used entries to fit."""
+        if not self.enabled:
+            return
+        vector = np.array(embedding, dtype="float32")
+        vector.setflags(write=False)
+        self._put(key, vector, vector.nbytes + len(key.encode("utf-8")))
+
+class SearchResultCache(LRUCache):
+    """
+    Maps search parameters to serialized results for one index generation.
+
+    Each entry remembers the generation (the brain's file signature) it was
+    computed against; a lookup with a different generation is a miss, so a
+    reindex makes every older entry for the brain unreachable even in
+    workers that never saw the reindex happen.
+    """
+
+    @staticmethod
+    def make_key(brain: str, query: str, top_k: int, mode: str, filters: Optional[Dict[str, Any]]) -> Tuple:
+        """Build the cache key for one brain's search."""
+        filters_key = json.dumps(filters, sort_keys=True) if filters else ""
+        return (brain, normalize_query(query), top_k, mode, filters_key)
+
+    def get(self, key: Tuple, generation: Hashable) -> Optional[List[Dict[str, Any]]]:
+        """Get cached results computed against this generation, or None."""
+        entry = self._get(key)
+        if entry is None:
+            return None
+        stored_generation, payload = entry
+        if stored_generation != generation:
+            with self._lock:
+                # Counted as a hit by _get(); it is really a stale miss
+                self.hits -= 1
+                self.misses += 1
+                if key in self._entries:
+                    self._drop(key)
+            return None
+        return json.loads(payload)
+
+    def put(self, key: Tuple, generation: Hashable, results: List[Dict[str, Any]]) -> None:
+        """Store serialized results for a generation."""
+        if not self.enabled:
+            return
+        payload = json.dumps(results, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._put(key, (generation, payload), len(payload))
+
+    def invalidate(self, brain: str) -> int:
+        """Drop every entry for a brain; returns how many were dropped."""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == brain]
+            for key in stale:
+                self._drop(key)
+            return len(stale)
@@ -0,0 +1,169 @@
+"""Process-resident registry of loaded brain indexes and metadata."""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from app.config import REQUIRED_FILES, INDEX_MMAP, get_index_config
+from app.services.vector_index import make_search_params, read_index, COMPRESSED_TYPES
+from app.services.metadata_store import open_metadata
+from app.services.lexical import LexicalIndex
+from app.services.attributes import BlockAttributes
+
+logger = logging.getLogger(__name__)
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+class LoadedBrain:
+    """A brain's FAISS index and metadata held in memory."""
+
+    def __init__(
+        self,
+        brain: str,
+        index: Any,
+        metadata: Sequence[Dict[str, Any]],
+        signature: Signature,
+        params: Optional[Dict[str, Any]] = None,
+        vectors: Optional[np.ndarray] = None,
+        lexical: Optional[LexicalIndex] = None,
+        attributes: Optional[BlockAttributes] = None
+    ):
+        self.brain = brain
+        self.index = index
+        self.metadata = metadata
+        self.signature = signature
+        # Build parameters persisted by reindex_brain(); older brains have none
+        self.params = params or {"type": "flat"}
+        self.config = get_index_config(brain)
+        self.search_params = make_search_params(self.params["type"], self.config)
+        # Compressed indexes re-rank a top_k * rerank shortlist exactly, and
+        # approximate indexes scan small filtered selections exactly
+        self.vectors = vectors
+        self.rerank = self.config["rerank"] if vectors is not None and self.params["type"] in COMPRESSED_TYPES else 1
+        # BM25 index for lexical/hybrid search; brains indexed before it existed have none
+        self.lexical = lexical
+        # Block type/edit time/tag columns for filtered search
+        self.attributes = attributes
+        self.loaded_at = time.time()
+
+class BrainRegistry:
+    """
+    Keeps each brain's index and metadata resident between searches.
+
+    Entries are validated against the (path, mtime, size) of the files that
+    reindex_brain() writes, so a rebuilt brain is picked up on the next
+    search without restarting the worker.
+    """
+
+    def __init__(self):
+        self._brains: Dict[str, LoadedBrain] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @staticmethod
+    def signature(files: Dict[str, str]) -> Signature:
+        """Build a signature that changes whenever any brain file is rewritten."""
+        signature = []
+        for key in sorted(files):
+            try:
+                stat = os.stat(files[key])
+            except FileNotFoundError:
+                if key in REQUIRED_FILES:
+                    raise
+                signature.append((files[key], -1, -1))
+                continue
+            signature.append((files[key], stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def get(self, brain: str, files: Dict[str, str]) -> LoadedBrain:
+        """
+        Get a brain's index and metadata, loading them if needed.
+
+        Args:
+            brain: Name of the brain
+            files: Paths returned by get_filenames() for the brain
+
+        Returns:
+            LoadedBrain for the current on-disk files
+
+        Raises:
+            FileNotFoundError: If any of the files disappeared
+        """
+        signature = self.signature(files)
+        with self._lock:
+            entry = self._brains.get(brain)
+            if entry is not None and entry.signature == signature:
+                self.hits += 1
+                return entry
+
+            params = None
+            if files.get("params") and os.path.exists(files["params"]):
+                with open(files["params"], "r", encoding="utf-8") as f:
+                    params = json.load(f)
+            index = read_index(files["index"], (params or {}).get("type", "flat"), INDEX_MMAP)
+            metadata = open_metadata(files["meta"])
+            lexical = None
+            if files.get("lexical") and os.path.exists(files["lexical"]):
+                lexical = LexicalIndex.load(files["lexical"])
+            attributes = None
+            if files.get("attrs") and os.path.exists(files["attrs"]):
+                attributes = BlockAttributes.load(files["attrs"])
+            vectors = None
+            if params and params["type"] != "flat" and os.path.exists(files.get("vectors", "")):
+                # Mapped read-only: only re-ranked or filtered rows are paged in
+                vectors = np.load(files["vectors"], mmap_mode="r")
+
+            if entry is None:
+                self.misses += 1
+                logger.info(f"Loaded {brain} brain into registry ({len(metadata)} rows)")
+            else:
+                self.reloads += 1
+                logger.info(f"Reloaded {brain} brain after index change ({len(metadata)} rows)")
+
+            entry = LoadedBrain(brain, index, metadata, signature, params, vectors, lexical, attributes)
+            self._brains[brain] = entry
+            return entry
+
+    def invalidate(self, brain: Optional[str] = None) -> None:
+        """Drop one brain (or all brains) so the next search reloads from disk."""
+        with self._lock:
+            if brain is None:
+                self._brains.clear()
+            else:
+                self._brains.pop(brain, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss/reload counters and the currently resident brains."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "brains": {
+                    name: {
+                        "rows": len(entry.metadata),
+                        "index_type": entry.params["type"],
+                        "embedding": entry.params.get("embedding"),
+                        "lexical": entry.lexical is not None,
+                        "attributes": entry.attributes is not None,
+                        "vectors": int(entry.index.ntotal),
+                        "loaded_at": entry.loaded_at
+                    }
+                    for name, entry in self._brains.items()
+                }
+            }
+
+_registry = None
+
+def get_registry() -> BrainRegistry:
+    """Get or initialize the process-wide brain registry."""
+    global _registry
+    if _registry is None:
+        _registry = BrainRegistry()
+    return _registry
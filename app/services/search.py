@@ -1,28 +1,90 @@
-"""Search service for semantic search functionality."""
+"""Search service for semantic, lexical and hybrid search."""
 
-import faiss
+import asyncio
 import numpy as np
-import json
 import logging
 import os
-from sentence_transformers import SentenceTransformer, util
-from typing import List, Dict, Any
-from app.config import get_filenames
-from app.models.api import SearchRequest, SearchResult
+import time
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+from app.config import (
+    get_filenames,
+    REQUIRED_FILES,
+    QUERY_BATCH_MAX_SIZE,
+    QUERY_BATCH_MAX_WAIT_MS,
+    QUERY_CACHE_MAX_BYTES,
+    QUERY_CACHE_TTL_SECONDS,
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_TTL_SECONDS,
+    SEARCH_RRF_K,
+    HYBRID_DEPTH
+)
+from app.models.api import (
+    SearchRequest,
+    SearchResult,
+    SearchFilters,
+    BatchSearchRequest,
+    MultiSearchRequest
+)
+from app.services.registry import get_registry, LoadedBrain, BrainRegistry
+from app.services.executors import run_query
+from app.services.batching import QueryBatcher
+from app.services.embeddings import get_model, check_compatible
+from app.services.query_cache import QueryEmbeddingCache, SearchResultCache, normalize_query
+from app.services.coalescing import SingleFlight
+from app.services.vector_index import (
+    search_index,
+    search_subset,
+    make_search_params,
+    make_selector,
+    SELECTOR_TYPES
+)
 import uuid
 
 logger = logging.getLogger(__name__)
 
-# Initialize the sentence transformer model
-_model = None
+def _encode_query_batch(texts: List[str]) -> np.ndarray:
+    """Encode a batch of query texts with the shared model."""
+    return get_model().encode(texts, convert_to_numpy=True)
 
-def get_model() -> SentenceTransformer:
-    """Get or initialize the sentence transformer model."""
-    global _model
-    if _model is None:
-        # Download and cache the model
-        _model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-    return _model
+_query_batcher = None
+
+def get_query_batcher() -> QueryBatcher:
+    """Get or initialize the query embedding batcher."""
+    global _query_batcher
+    if _query_batcher is None:
+        _query_batcher = QueryBatcher(
+            _encode_query_batch,
+            max_batch_size=QUERY_BATCH_MAX_SIZE,
+            max_wait_ms=QUERY_BATCH_MAX_WAIT_MS
+        )
+    return _query_batcher
+
+_query_cache = None
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """Get or initialize the query embedding cache."""
+    global _query_cache
+    if _query_cache is None:
+        _query_cache = QueryEmbeddingCache(QUERY_CACHE_MAX_BYTES, QUERY_CACHE_TTL_SECONDS)
+    return _query_cache
+
+_result_cache = None
+
+def get_result_cache() -> SearchResultCache:
+    """Get or initialize the search result cache."""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = SearchResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS)
+    return _result_cache
+
+_single_flight = None
+
+def get_single_flight() -> SingleFlight:
+    """Get or initialize the coalescer for identical in-flight searches."""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
 
 def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
     """Normalize vectors to unit length for cosine similarity."""
@@ -37,12 +99,329 @@ def normalize_score(score: float) -> float:
     """
     return (score + 1) / 2
 
-async def search(request: SearchRequest) -> List[SearchResult]:
+async def load_brain(brain: str) -> LoadedBrain:
+    """
+    Get a brain's resident index and metadata.
+    
+    Args:
+        brain: The brain to load
+        
+    Returns:
+        LoadedBrain for the brain's current files
+        
+    Raises:
+        FileNotFoundError: If index or metadata files are missing
+    """
+    files = get_filenames(brain)
+    
+    # Verify files exist
+    missing_files = [f for f in REQUIRED_FILES if not os.path.exists(files[f])]
+    if missing_files:
+        raise FileNotFoundError(f"Missing files: {', '.join(missing_files)}. Try reindexing first.")
+        
+    # Get the resident index and metadata, reloading if the files changed
+    return await run_query(get_registry().get, brain, files)
+
+def build_results(
+    brain: str,
+    metadata: Sequence[Dict[str, Any]],
+    scores: np.ndarray,
+    ids: np.ndarray,
+    score_fn: Optional[Callable[[float], float]] = None
+) -> List[SearchResult]:
+    """
+    Convert one row of retriever output into search results.
+    
+    Args:
+        brain: Brain the rows belong to
+        metadata: Metadata rows indexed by row id
+        scores: Raw retriever scores, best first
+        ids: Row ids matching scores
+        score_fn: Maps a raw score to 0-1 (defaults to normalize_score)
+    """
+    score_fn = score_fn or normalize_score
+    results = []
+    for score, idx in zip(scores, ids):
+        if 0 <= idx < len(metadata):  # FAISS pads missing hits with -1
+            meta = metadata[idx]
+            result = SearchResult(
+                content=meta["content"],
+                score=score_fn(float(score)),
+                brain=brain,
+                metadata={"uid": meta.get("uid", str(uuid.uuid4()))}
+            )
+            results.append(result)
+    return results
+
+def normalize_bm25(score: float) -> float:
+    """Map an unbounded BM25 score into the 0-1 range."""
+    return score / (score + 1)
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuse ranked row id lists with reciprocal rank fusion.
+    
+    Each row scores sum(1 / (SEARCH_RRF_K + rank)) over the rankings it
+    appears in; scores are divided by the best possible total, so a row
+    ranked first by every retriever scores 1.
+    
+    Args:
+        rankings: Row ids from each retriever, best first (-1 is ignored)
+        k: Number of fused results
+        
+    Returns:
+        Tuple of (fused scores, row ids), best first
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, idx in enumerate(int(i) for i in ranking if i >= 0):
+            fused[idx] = fused.get(idx, 0.0) + 1.0 / (SEARCH_RRF_K + rank + 1)
+    best = sorted(fused.items(), key=lambda item: -item[1])[:k]
+    max_score = len(rankings) / (SEARCH_RRF_K + 1)
+    scores = np.array([score / max_score for _, score in best], dtype="float32")
+    ids = np.array([idx for idx, _ in best], dtype="int64")
+    return scores, ids
+
+def filter_mask(loaded: LoadedBrain, filters: Optional[SearchFilters]) -> Optional[np.ndarray]:
+    """
+    Evaluate request filters into a row mask for a brain.
+    
+    Args:
+        loaded: The brain being searched
+        filters: Filters from the request, if any
+        
+    Returns:
+        Boolean array over rows, or None when nothing is filtered
+        
+    Raises:
+        FileNotFoundError: If the brain was indexed without block attributes
+    """
+    if filters is None or filters.is_empty():
+        return None
+    if loaded.attributes is None:
+        raise FileNotFoundError(f"Missing files: attrs. Try reindexing {loaded.brain} first.")
+    return loaded.attributes.mask(**filters.model_dump())
+
+def search_vectors(
+    loaded: LoadedBrain,
+    queries: np.ndarray,
+    k: int,
+    mask: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Search a brain's vector index, optionally restricted to masked rows.
+    
+    Filtered searches pass an ID selector to FAISS along with nprobe/efSearch
+    widened by the filter's selectivity, so excluded rows are skipped during
+    the scan instead of over-fetching and discarding them afterwards.
+    
+    Args:
+        loaded: The brain to search
+        queries: Float32 matrix of normalized query vectors
+        k: Number of results per query
+        mask: Optional boolean array over rows to search
+        
+    Returns:
+        Tuple of (scores, row ids), each shaped (len(queries), k)
+        
+    Raises:
+        EmbeddingMismatchError: If the index was built with another model
+    """
+    check_compatible(loaded.brain, loaded.params.get("embedding"))
+    if mask is None:
+        return search_index(loaded.index, queries, k, loaded.search_params, loaded.vectors, loaded.rerank)
+    index_type = loaded.params["type"]
+    selected = np.flatnonzero(mask)
+    if loaded.vectors is not None and (
+        index_type not in SELECTOR_TYPES or len(selected) <= loaded.config["filter_exact_rows"]
+    ):
+        # Small selections (and plain PQ, which takes no selector) are
+        # cheaper to score exactly than to find through the ANN structure
+        return search_subset(loaded.vectors, queries, selected, k)
+    if index_type not in SELECTOR_TYPES:
+        raise FileNotFoundError(f"Missing files: vectors. Try reindexing {loaded.brain} first.")
+    selectivity = len(selected) / max(1, len(mask))
+    params = make_search_params(index_type, loaded.config, make_selector(mask), selectivity)
+    return search_index(loaded.index, queries, k, params, loaded.vectors, loaded.rerank)
+
+async def encode_query(query_text: str, timings: Dict[str, float]) -> np.ndarray:
+    """
+    Embed one query as a normalized float32 row.
+    
+    Cached embeddings are reused; misses are batched with concurrent
+    searches and then cached. The normalized text is only the cache key:
+    the model always sees the query as it was written.
+    """
+    started = time.perf_counter()
+    key = normalize_query(query_text)
+    cache = get_query_cache()
+    embedding = cache.get(key)
+    if embedding is None:
+        embedding = await get_query_batcher().encode(query_text.strip())
+        # Normalize query vector for cosine similarity
+        embedding = normalize_vectors(np.array([embedding])).astype('float32')[0]
+        cache.put(key, embedding)
+    timings["encode_ms"] = (time.perf_counter() - started) * 1000
+    return embedding[np.newaxis, :]
+
+async def encode_queries(query_texts: List[str]) -> np.ndarray:
+    """
+    Embed several queries with one model call for the uncached ones.
+    
+    Args:
+        query_texts: Query texts
+        
+    Returns:
+        Float32 matrix of normalized embeddings, one row per query
+    """
+    cache = get_query_cache()
+    keys = [normalize_query(text) for text in query_texts]
+    # Encode the first spelling of each key, not the normalized key itself
+    texts: Dict[str, str] = {}
+    for key, text in zip(keys, query_texts):
+        texts.setdefault(key, text.strip())
+    found = {key: cache.get(key) for key in texts}
+    missing = [key for key, embedding in found.items() if embedding is None]
+    if missing:
+        # The request is already a batch, so encode it directly
+        embeddings = await run_query(_encode_query_batch, [texts[key] for key in missing])
+        embeddings = normalize_vectors(np.asarray(embeddings)).astype('float32')
+        for key, embedding in zip(missing, embeddings):
+            cache.put(key, embedding)
+            found[key] = embedding
+    return np.stack([found[key] for key in keys])
+
+async def _semantic_search(
+    loaded: LoadedBrain,
+    embedding: np.ndarray,
+    k: int,
+    timings: Dict[str, float],
+    mask: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Search the brain's vector index with an encoded query."""
+    started = time.perf_counter()
+    D, I = await run_query(search_vectors, loaded, embedding, k, mask)
+    timings["semantic_ms"] = (time.perf_counter() - started) * 1000
+    return D[0], I[0]
+
+async def _lexical_search(
+    loaded: LoadedBrain,
+    query_text: str,
+    k: int,
+    timings: Dict[str, float],
+    mask: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Score the query against the brain's BM25 index."""
+    if loaded.lexical is None:
+        raise FileNotFoundError(f"Missing files: lexical. Try reindexing {loaded.brain} first.")
+    started = time.perf_counter()
+    scores, ids = await run_query(loaded.lexical.search, query_text, k, mask)
+    timings["lexical_ms"] = (time.perf_counter() - started) * 1000
+    return scores, ids
+
+async def _search_brain(
+    loaded: LoadedBrain,
+    query_text: str,
+    embedding: Optional[np.ndarray],
+    top_k: int,
+    mode: str,
+    filters: Optional[SearchFilters],
+    timings: Dict[str, float]
+) -> List[SearchResult]:
+    """Run one brain's retrievers for an already encoded query."""
+    mask = filter_mask(loaded, filters)
+    
+    if mode == "lexical":
+        scores, ids = await _lexical_search(loaded, query_text, top_k, timings, mask)
+        return build_results(loaded.brain, loaded.metadata, scores, ids, normalize_bm25)
+        
+    if mode == "hybrid":
+        # Both retrievers run concurrently over a deeper candidate pool
+        depth = top_k * HYBRID_DEPTH
+        (_, semantic_ids), (_, lexical_ids) = await asyncio.gather(
+            _semantic_search(loaded, embedding, depth, timings, mask),
+            _lexical_search(loaded, query_text, depth, timings, mask)
+        )
+        started = time.perf_counter()
+        scores, ids = reciprocal_rank_fusion([semantic_ids, lexical_ids], top_k)
+        timings["fusion_ms"] = (time.perf_counter() - started) * 1000
+        return build_results(loaded.brain, loaded.metadata, scores, ids, float)
+        
+    scores, ids = await _semantic_search(loaded, embedding, top_k, timings, mask)
+    return build_results(loaded.brain, loaded.metadata, scores, ids)
+
+def _result_key(brain: str, query_text: str, top_k: int, mode: str, filters: Optional[SearchFilters]) -> Tuple:
+    """Build the result cache key for one brain's search."""
+    filter_values = None if filters is None or filters.is_empty() else filters.model_dump(exclude_none=True)
+    return SearchResultCache.make_key(brain, query_text, top_k, mode, filter_values)
+
+def _cached_results(brain: str, key: Tuple, timings: Dict[str, float]) -> Optional[List[SearchResult]]:
+    """
+    Get cached results computed against the brain's current index files.
+    
+    The generation is the same (path, mtime, size) signature the registry
+    checks, read with a few stat() calls, so a hit never touches the
+    registry, the model or FAISS.
+    """
+    started = time.perf_counter()
+    try:
+        generation = BrainRegistry.signature(get_filenames(brain))
+    except FileNotFoundError:
+        return None
+    rows = get_result_cache().get(key, generation)
+    if rows is None:
+        return None
+    timings["cached_ms"] = (time.perf_counter() - started) * 1000
+    return [SearchResult(**row) for row in rows]
+
+def _cache_results(loaded: LoadedBrain, key: Tuple, results: List[SearchResult]) -> None:
+    """Cache results under the signature of the files they were computed from."""
+    get_result_cache().put(key, loaded.signature, [result.model_dump() for result in results])
+
+async def _run_brain_search(
+    brain: str,
+    key: Tuple,
+    query_text: str,
+    embedding: Optional[np.ndarray],
+    top_k: int,
+    mode: str,
+    filters: Optional[SearchFilters]
+) -> Tuple[List[SearchResult], Dict[str, float]]:
     """
-    Perform semantic search using FAISS.
+    Search one brain and cache the results, sharing the work between
+    identical concurrent searches.
+    
+    Args:
+        brain: Brain to search
+        key: Result cache key, also identifying identical searches
+        query_text: Stripped query text
+        embedding: Query embedding, or None to encode it here if needed
+        top_k: Number of results
+        mode: Retrieval mode
+        filters: Optional block attribute filters
+        
+    Returns:
+        Tuple of (results, timings of the run that produced them)
+    """
+    async def work() -> Tuple[List[SearchResult], Dict[str, float]]:
+        timings: Dict[str, float] = {}
+        loaded = await load_brain(brain)
+        query_embedding = embedding
+        if query_embedding is None and mode != "lexical":
+            query_embedding = await encode_query(query_text, timings)
+        results = await _search_brain(loaded, query_text, query_embedding, top_k, mode, filters, timings)
+        _cache_results(loaded, key, results)
+        return results, timings
+    
+    return await get_single_flight().do(key, work)
+
+async def search(request: SearchRequest, timings: Optional[Dict[str, float]] = None) -> List[SearchResult]:
+    """
+    Perform semantic, lexical or hybrid search.
     
     Args:
         request: Search request parameters
+        timings: Optional dict that receives per-stage timings in ms
         
     Returns:
         List of search results
@@ -55,45 +434,18 @@ async def search(request: SearchRequest) -> List[SearchResult]:
     if not request.query.strip():
         raise ValueError("Search query cannot be empty")
 
+    timings = {} if timings is None else timings
     try:
-        files = get_filenames(request.brain)
-        
-        # Verify files exist
-        missing_files = [f for f, path in files.items() if not os.path.exists(path)]
-        if missing_files:
-            raise FileNotFoundError(f"Missing files: {', '.join(missing_files)}. Try reindexing first.")
-            
-        # Load FAISS index
-        index = faiss.read_index(files["index"])
-        
-        # Load metadata
-        with open(files["meta"], "r", encoding="utf-8") as f:
-            metadata = json.load(f)
-            
-        # Generate embedding for query
-        model = get_model()
         query_text = request.query.strip()
-        embedding = model.encode(query_text, convert_to_numpy=True)
+        key = _result_key(request.brain, query_text, request.top_k, request.mode, request.filters)
+        cached = _cached_results(request.brain, key, timings)
+        if cached is not None:
+            return cached
         
-        # Normalize query vector for cosine similarity
-        embedding = normalize_vectors(np.array([embedding]))[0]
-        
-        # Search
-        D, I = index.search(np.array([embedding]).astype('float32'), request.top_k)
-        
-        # Convert results
-        results = []
-        for score, idx in zip(D[0], I[0]):
-            if idx < len(metadata):  # Safety check
-                meta = metadata[idx]
-                result = SearchResult(
-                    content=meta["content"],
-                    score=normalize_score(float(score)),  # Convert cosine similarity to 0-1 range
-                    brain=request.brain,
-                    metadata={"uid": meta.get("uid", str(uuid.uuid4()))}
-                )
-                results.append(result)
-                
+        results, run_timings = await _run_brain_search(
+            request.brain, key, query_text, None, request.top_k, request.mode, request.filters
+        )
+        timings.update(run_timings)
         return results
         
     except (FileNotFoundError, ValueError) as e:
@@ -103,6 +455,130 @@ async def search(request: SearchRequest) -> List[SearchResult]:
         logger.exception("Unexpected error during search")
         raise Exception(f"Search failed: {str(e)}")
 
+async def search_multi(
+    request: MultiSearchRequest,
+    brains: Sequence[str],
+    timings: Optional[Dict[str, float]] = None
+) -> Tuple[List[SearchResult], Dict[str, Dict[str, Any]]]:
+    """
+    Search several brains concurrently and merge their results.
+    
+    The query is encoded once (and only if some brain's results are not
+    cached) and the same embedding is searched in every brain; results are
+    merged by score into one global top_k.
+    
+    Args:
+        request: Multi-brain search parameters
+        brains: Brains to search, already checked against the caller's access
+        timings: Optional dict that receives shared stage timings in ms
+        
+    Returns:
+        Tuple of (merged results, per-brain count/latency/error keyed by brain)
+        
+    Raises:
+        FileNotFoundError: If none of the brains can be searched
+        ValueError: If query is empty or invalid
+        Exception: For other unexpected errors
+    """
+    if not request.query.strip():
+        raise ValueError("Search query cannot be empty")
+    if not brains:
+        raise ValueError("No brains to search")
+
+    timings = {} if timings is None else timings
+    query_text = request.query.strip()
+    keys = {brain: _result_key(brain, query_text, request.top_k, request.mode, request.filters) for brain in brains}
+    brain_timings = {brain: {} for brain in brains}
+    cached = {brain: _cached_results(brain, keys[brain], brain_timings[brain]) for brain in brains}
+
+    async def search_one(brain: str) -> Tuple[List[SearchResult], Dict[str, Any]]:
+        started = time.perf_counter()
+        results, error = cached[brain], None
+        try:
+            if results is None:
+                results, run_timings = await _run_brain_search(
+                    brain, keys[brain], query_text, embedding, request.top_k, request.mode, request.filters
+                )
+                brain_timings[brain].update(run_timings)
+        except FileNotFoundError as e:
+            # One unindexed brain should not hide the others' results
+            results, error = [], str(e)
+        return results, {
+            "count": len(results),
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "timings": brain_timings[brain] or None,
+            "error": error
+        }
+
+    try:
+        uncached = any(results is None for results in cached.values())
+        embedding = None
+        if uncached and request.mode != "lexical":
+            embedding = await encode_query(query_text, timings)
+        outcomes = await asyncio.gather(*(search_one(brain) for brain in brains))
+
+        per_brain = {brain: stats for brain, (_, stats) in zip(brains, outcomes)}
+        if all(stats["error"] for stats in per_brain.values()):
+            raise FileNotFoundError("; ".join(f"{brain}: {stats['error']}" for brain, stats in per_brain.items()))
+
+        started = time.perf_counter()
+        merged = sorted(
+            (result for results, _ in outcomes for result in results),
+            key=lambda result: -result.score
+        )[:request.top_k]
+        timings["merge_ms"] = (time.perf_counter() - started) * 1000
+        return merged, per_brain
+
+    except (FileNotFoundError, ValueError) as e:
+        logger.warning(f"Multi-brain search validation error: {str(e)}")
+        raise
+    except Exception as e:
+        logger.exception("Unexpected error during multi-brain search")
+        raise Exception(f"Multi-brain search failed: {str(e)}")
+
+async def search_batch(request: BatchSearchRequest) -> List[List[SearchResult]]:
+    """
+    Run several queries against one brain with a single encode and FAISS call.
+    
+    Args:
+        request: Batch search parameters
+        
+    Returns:
+        One list of search results per query, in request order
+        
+    Raises:
+        FileNotFoundError: If index or metadata files are missing
+        ValueError: If any query is empty
+        Exception: For other unexpected errors
+    """
+    query_texts = [item.query.strip() for item in request.queries]
+    empty = [i for i, text in enumerate(query_texts) if not text]
+    if empty:
+        raise ValueError(f"Search query cannot be empty (queries {empty})")
+
+    top_ks = [item.top_k or request.top_k for item in request.queries]
+
+    try:
+        loaded = await load_brain(request.brain)
+        mask = filter_mask(loaded, request.filters)
+
+        embeddings = await encode_queries(query_texts)
+
+        # One multi-row search at the largest k, trimmed per query below
+        D, I = await run_query(search_vectors, loaded, embeddings, max(top_ks), mask)
+
+        return [
+            build_results(request.brain, loaded.metadata, D[row][:k], I[row][:k])
+            for row, k in enumerate(top_ks)
+        ]
+
+    except (FileNotFoundError, ValueError) as e:
+        logger.warning(f"Batch search validation error: {str(e)}")
+        raise
+    except Exception as e:
+        logger.exception("Unexpected error during batch search")
+        raise Exception(f"Batch search failed: {str(e)}")
+
 class SearchService:
     """Service for handling semantic search operations."""
     
@@ -129,4 +605,28 @@ class SearchService:
             "query": query,
             "results": results,
             "count": len(results)
-        } 
\ No newline at end of file
+        } 
+    
+    async def search_multi(
+        self,
+        request: MultiSearchRequest,
+        brains: List[str]
+    ) -> Dict[str, Any]:
+        """
+        Search several brains and merge the results.
+        
+        Args:
+            request: The search parameters, including mode and filters
+            brains: The brains to search in, already checked against the
+                caller's permissions
+            
+        Returns:
+            Dict containing merged results and per-brain stats
+        """
+        results, per_brain = await search_multi(request, brains)
+        return {
+            "query": request.query,
+            "results": results,
+            "count": len(results),
+            "brains": per_brain
+        }
\ No newline at end of file
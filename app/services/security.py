@@ -1,13 +1,14 @@
 """Security service for token validation and access control."""
 
 import time
-from typing import Dict, Optional, Set
+from typing import Dict, List, Optional, Sequence, Set
 from fastapi import HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import secrets
 import os
 import logging
 from datetime import datetime, timedelta
+from app.config import BRAINS
 
 # Configure audit logging
 audit_logger = logging.getLogger("audit")
@@ -36,6 +37,10 @@ class SecurityService:
         self.security = HTTPBearer(auto_error=False)
         debug_logger.debug(f"Initialized SecurityService with admin tokens: {self.admin_tokens}")
     
+    def can_access_brain(self, token: str, brain: str) -> bool:
+        """Check whether a token may access a brain; marketing tokens only reach the marketing brain."""
+        return token not in self.marketing_tokens or brain == "marketing"
+    
     async def validate_token(
         self, 
         credentials: Optional[HTTPAuthorizationCredentials],
@@ -111,7 +116,7 @@ class SecurityService:
             HTTPException: If access is denied
         """
         debug_logger.debug(f"Validating brain access - token: {token}, brain: {brain}")
-        if token in self.marketing_tokens and brain != "marketing":
+        if not self.can_access_brain(token, brain):
             debug_logger.debug(f"Access denied to brain {brain} for marketing token")
             raise HTTPException(
                 status_code=403,
@@ -119,6 +124,26 @@ class SecurityService:
             )
         debug_logger.debug(f"Brain access validated successfully")
     
+    def permitted_brains(self, token: str, brains: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        Get the brains a token may search.
+        
+        Args:
+            token: The authentication token
+            brains: Brains explicitly requested, or None for every permitted brain
+            
+        Returns:
+            List of brains to search, without duplicates
+            
+        Raises:
+            HTTPException: If access to a requested brain is denied
+        """
+        if brains:
+            for brain in brains:
+                self.validate_brain_access(token, brain)
+            return list(dict.fromkeys(brains))
+        return [brain for brain in BRAINS if self.can_access_brain(token, brain)]
+    
     async def _audit_log(self, token: str, request: Request):
         """Log request details for audit purposes."""
         # Get request body if available
@@ -0,0 +1,343 @@
+"""Construction and query configuration of per-brain FAISS indexes."""
+
+import logging
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# faiss is imported inside the functions that need it: it loads BLAS and
+# OpenMP on import, which the web app and CLI tools should not pay for
+# until an index is actually built, read or searched.
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "sq8", "pq", "ivfpq")
+
+# Index types that store lossy codes and re-rank against exact vectors
+COMPRESSED_TYPES = ("sq8", "pq", "ivfpq")
+
+# Index types whose search() honours an IDSelector; plain PQ rejects one,
+# so filtered searches on it scan the selected rows' exact vectors instead
+SELECTOR_TYPES = ("flat", "ivf", "hnsw", "sq8", "ivfpq")
+
+# FAISS warns below ~39 training points per IVF cell or PQ centroid
+MIN_POINTS_PER_CELL = 39
+# Training on more than this many points per cell buys nothing
+MAX_POINTS_PER_CELL = 256
+
+def resolve_index_type(rows: int, config: Dict[str, Any]) -> str:
+    """
+    Pick the index type to build for a corpus of the given size.
+
+    Args:
+        rows: Number of vectors to index
+        config: Settings from get_index_config()
+
+    Returns:
+        The configured type, or "flat" for corpora too small to benefit
+    """
+    index_type = config["type"]
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Invalid index type: {index_type}. Must be one of {INDEX_TYPES}")
+    if index_type != "flat" and rows < config["min_ann_rows"]:
+        logger.info(f"Using flat index for {rows} rows (below min_ann_rows={config['min_ann_rows']})")
+        return "flat"
+    if index_type in ("pq", "ivfpq") and rows < MIN_POINTS_PER_CELL * 2 ** config["pq_nbits"]:
+        logger.info(f"Using flat index for {rows} rows (too few to train {config['pq_nbits']}-bit PQ)")
+        return "flat"
+    return index_type
+
+def resolve_nlist(rows: int, config: Dict[str, Any]) -> int:
+    """Get the number of IVF cells, capped so each cell has enough training points."""
+    nlist = config["nlist"] or int(4 * math.sqrt(rows))
+    return max(1, min(nlist, rows // MIN_POINTS_PER_CELL))
+
+def index_params(rows: int, dimension: int, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the parameters build_index() would use and persist for a corpus.
+
+    Args:
+        rows: Number of vectors to index
+        dimension: Embedding dimension
+        config: Settings from get_index_config()
+
+    Returns:
+        The index type, shape and the type's build settings
+    """
+    index_type = resolve_index_type(rows, config)
+    params: Dict[str, Any] = {"type": index_type, "dimension": dimension, "rows": rows}
+    if index_type in ("pq", "ivfpq") and dimension % config["pq_m"]:
+        raise ValueError(f"pq_m={config['pq_m']} must divide the embedding dimension {dimension}")
+    if index_type in ("ivf", "ivfpq"):
+        params["nlist"] = resolve_nlist(rows, config)
+    if index_type == "hnsw":
+        params["m"] = config["m"]
+        params["ef_construction"] = config["ef_construction"]
+    if index_type in ("pq", "ivfpq"):
+        params["pq_m"] = config["pq_m"]
+        params["pq_nbits"] = config["pq_nbits"]
+    return params
+
+def build_index(embeddings: np.ndarray, config: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Build (and train, if needed) an inner-product index over normalized vectors.
+
+    Args:
+        embeddings: Float32 matrix of normalized vectors, one row per block
+        config: Settings from get_index_config()
+
+    Returns:
+        Tuple of (populated FAISS index, parameters to persist alongside it)
+    """
+    import faiss
+
+    rows, dimension = embeddings.shape
+    params = index_params(rows, dimension, config)
+    index_type = params["type"]
+
+    if index_type == "ivf":
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, params["nlist"], faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, params["m"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params["ef_construction"]
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "pq":
+        index = faiss.IndexPQ(dimension, params["pq_m"], params["pq_nbits"], faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "ivfpq":
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFPQ(
+            quantizer, dimension, params["nlist"], params["pq_m"], params["pq_nbits"], faiss.METRIC_INNER_PRODUCT
+        )
+    else:
+        index = faiss.IndexFlatIP(dimension)
+
+    if not index.is_trained:
+        index.train(_training_sample(embeddings, _training_cells(index_type, params)))
+    index.add(embeddings)
+    return index, params
+
+def _training_cells(index_type: str, params: Dict[str, Any]) -> int:
+    """Get the largest number of centroids the index has to learn."""
+    cells = params.get("nlist", 1)
+    if index_type in ("pq", "ivfpq"):
+        cells = max(cells, 2 ** params["pq_nbits"])
+    return cells
+
+def _training_sample(embeddings: np.ndarray, cells: int) -> np.ndarray:
+    """Get a random subset of rows large enough to train the given number of cells."""
+    limit = cells * MAX_POINTS_PER_CELL
+    if len(embeddings) <= limit:
+        return embeddings
+    rows = np.random.default_rng(0).choice(len(embeddings), size=limit, replace=False)
+    return embeddings[np.sort(rows)]
+
+def _mmap_flags(index_type: str) -> List[int]:
+    """Get the read flags to try, in order, for mapping an index of this type."""
+    import faiss
+
+    flags = []
+    # Maps the codes of flat/SQ/PQ indexes, HNSW storage and IVF lists
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        flags.append(faiss.IO_FLAG_MMAP_IFC)
+    # Older FAISS builds can still map IVF inverted lists
+    if index_type in ("ivf", "ivfpq"):
+        flags.append(faiss.IO_FLAG_MMAP)
+    return flags
+
+def read_index(path: str, index_type: str = "flat", mmap: bool = True) -> Any:
+    """
+    Open a persisted index, memory-mapped and read-only when possible.
+
+    A mapped index is backed by the page cache, so workers opening the same
+    file share one copy and opening it does not read the whole file. Writers
+    must replace the file (new inode) rather than rewrite it in place.
+
+    Args:
+        path: Index file written by faiss.write_index()
+        index_type: Type recorded in the index parameters file
+        mmap: Whether to try memory-mapping at all
+
+    Returns:
+        The loaded FAISS index
+    """
+    import faiss
+
+    if mmap:
+        for flag in _mmap_flags(index_type):
+            try:
+                return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                logger.debug(f"Cannot mmap {path} with flag {flag:#x}: {e}")
+        logger.info(f"Loading {path} into memory ({index_type} index cannot be memory-mapped)")
+    return faiss.read_index(path)
+
+def make_selector(mask: np.ndarray) -> Any:
+    """
+    Wrap a boolean row mask in a FAISS ID selector.
+
+    The bitmap packs one bit per row, so testing an id during the search is
+    a single lookup and excluded rows are never scored.
+
+    Args:
+        mask: Boolean array over index rows, True for rows to keep
+
+    Returns:
+        An IDSelectorBitmap that owns its bitmap buffer
+    """
+    import faiss
+
+    bitmap = np.packbits(np.asarray(mask, dtype=bool), bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+    # FAISS only holds a raw pointer; keep the buffer alive with the selector
+    selector.bitmap_buffer = bitmap
+    return selector
+
+def make_search_params(
+    index_type: str,
+    config: Dict[str, Any],
+    selector: Optional[Any] = None,
+    selectivity: float = 1.0
+) -> Optional[Any]:
+    """
+    Build per-call FAISS search parameters carrying the query-time knobs.
+
+    Passing these to index.search() instead of mutating the index keeps
+    concurrent searches on the shared index independent of each other.
+
+    Args:
+        index_type: Type recorded in the index parameters file
+        config: Settings from get_index_config()
+        selector: Optional ID selector restricting which rows are searched
+        selectivity: Fraction of rows the selector keeps; nprobe and
+            efSearch are scaled by its inverse so a filtered query still
+            meets about as many candidates as an unfiltered one
+
+    Returns:
+        SearchParameters for ANN or filtered searches, or None for
+        unfiltered flat-style indexes
+    """
+    import faiss
+
+    widen = 1.0 / max(selectivity, 1e-6)
+    if index_type in ("ivf", "ivfpq"):
+        # FAISS caps nprobe at the index's nlist
+        return faiss.SearchParametersIVF(sel=selector, nprobe=math.ceil(config["nprobe"] * widen))
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=math.ceil(config["ef_search"] * widen))
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+def search_subset(vectors: np.ndarray, queries: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exactly search only the given rows of a vector matrix.
+
+    Args:
+        vectors: Full-precision vectors (may be a read-only memory map)
+        queries: Float32 matrix of normalized query vectors
+        rows: Sorted row ids to consider
+        k: Number of results per query
+
+    Returns:
+        Tuple of (scores, row ids), each shaped (len(queries), k)
+    """
+    rows = np.asarray(rows, dtype='int64')
+    candidates = np.broadcast_to(rows, (len(queries), len(rows)))
+    return rerank_exact(vectors, queries, candidates, k)
+
+def search_index(
+    index: Any,
+    queries: np.ndarray,
+    k: int,
+    params: Optional[Any] = None,
+    vectors: Optional[np.ndarray] = None,
+    rerank: int = 1
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Search an index, optionally re-ranking a larger shortlist exactly.
+
+    Args:
+        index: FAISS index to search
+        queries: Float32 matrix of normalized query vectors
+        k: Number of results per query
+        params: Query-time SearchParameters, if any
+        vectors: Full-precision vectors for the index rows, used to re-rank
+        rerank: Shortlist size as a multiple of k (1 disables re-ranking)
+
+    Returns:
+        Tuple of (scores, row ids), each shaped (len(queries), k)
+    """
+    fetch = k * rerank if vectors is not None and rerank > 1 else k
+    if params is None:
+        D, I = index.search(queries, fetch)
+    else:
+        D, I = index.search(queries, fetch, params=params)
+    if fetch == k:
+        return D, I
+    return rerank_exact(vectors, queries, I, k)
+
+def rerank_exact(vectors: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-score candidate rows with exact inner products and keep the best k.
+
+    Args:
+        vectors: Full-precision vectors (may be a read-only memory map)
+        queries: Float32 matrix of normalized query vectors
+        candidates: Row ids from the compressed index, -1 for padding
+        k: Number of results per query
+
+    Returns:
+        Tuple of (scores, row ids), each shaped (len(queries), k)
+    """
+    D = np.full((len(queries), k), -np.inf, dtype='float32')
+    I = np.full((len(queries), k), -1, dtype='int64')
+    for row, (query, ids) in enumerate(zip(queries, candidates)):
+        # Sorted ids keep reads from a memory-mapped matrix sequential
+        ids = np.sort(ids[ids >= 0])
+        if not len(ids):
+            continue
+        scores = np.asarray(vectors[ids], dtype='float32') @ query
+        order = np.argsort(-scores)[:k]
+        D[row, :len(order)] = scores[order]
+        I[row, :len(order)] = ids[order]
+    return D, I
+
+def measure_recall(
+    index: Any,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    params: Optional[Any] = None,
+    rerank: int = 1
+) -> float:
+    """
+    Measure recall@k of an index against exact search over the same vectors.
+
+    Args:
+        index: Index to evaluate
+        vectors: Full-precision vectors the index was built from
+        queries: Float32 matrix of normalized query vectors
+        k: Number of results per query
+        params: Query-time SearchParameters, if any
+        rerank: Shortlist multiple used for re-ranking
+
+    Returns:
+        Fraction of the exact top-k ids the index also returned
+    """
+    import faiss
+
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(np.ascontiguousarray(vectors, dtype='float32'))
+    _, truth = exact.search(queries, k)
+    _, found = search_index(index, queries, k, params, vectors if rerank > 1 else None, rerank)
+    hits = sum(len(set(t[t >= 0]) & set(f[f >= 0])) for t, f in zip(truth, found))
+    return hits / max(1, int((truth >= 0).sum()))
+
+def write_index(index: Any, path: str) -> None:
+    """Write an index to disk in the format read_index() maps."""
+    import faiss
+
+    faiss.write_index(index, path)
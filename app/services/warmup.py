@@ -0,0 +1,126 @@
+"""Startup warm-up of the model and brain indexes, and readiness state."""
+
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from app.config import BRAINS, REQUIRED_FILES, get_filenames
+from app.services.executors import run_query
+from app.services.search import get_model, load_brain, search_vectors, normalize_vectors
+
+logger = logging.getLogger(__name__)
+
+# Encoded once at startup so the first real query does not pay for lazy
+# kernel selection and allocator growth inside the model
+WARMUP_QUERIES = [
+    "warm up",
+    "project timeline and launch checklist for the spring marketing campaign",
+]
+
+class Readiness:
+    """Tracks startup progress for the readiness endpoint."""
+
+    def __init__(self):
+        self.state = "starting"
+        self.phase: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+        self.brains: Dict[str, str] = {}
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.state,
+            "phase": self.phase,
+            "phases_ms": self.phases,
+            "brains": self.brains,
+            "error": self.error,
+            "startup_seconds": (self.ready_at or time.time()) - self.started_at
+        }
+
+_readiness = Readiness()
+
+def get_readiness() -> Readiness:
+    """Get the process-wide readiness state."""
+    return _readiness
+
+def mark_ready() -> None:
+    """Report ready without warming up (warm-up disabled)."""
+    _readiness.state = "ready"
+    _readiness.ready_at = time.time()
+
+async def warm_up(brains: Sequence[str] = BRAINS) -> Readiness:
+    """
+    Load the model and brain indexes and run warm-up encodes and searches.
+
+    Each phase's duration is recorded in the readiness state and logged.
+    Brains without index files are skipped, not treated as failures, so a
+    fresh deployment becomes ready before its first reindex. A brain that
+    fails to load or search is recorded as failed in the readiness brains
+    and skipped the same way: its searches report the error, while the
+    other brains keep being served.
+
+    Args:
+        brains: Brains whose indexes to preload
+
+    Returns:
+        The readiness state, "ready" unless the model itself failed
+    """
+    readiness = _readiness
+
+    async def phase(name: str, coro):
+        readiness.phase = name
+        started = time.perf_counter()
+        result = await coro
+        readiness.phases[name] = (time.perf_counter() - started) * 1000
+        logger.info(f"Startup phase {name} took {readiness.phases[name]:.0f} ms")
+        return result
+
+    try:
+        model = await phase("model", run_query(get_model))
+
+        loaded: List[Any] = []
+        async def load_brains():
+            for brain in brains:
+                files = get_filenames(brain)
+                if not all(os.path.exists(files[f]) for f in REQUIRED_FILES):
+                    readiness.brains[brain] = "not indexed"
+                    logger.info(f"Skipping warm-up of {brain} brain: not indexed yet")
+                    continue
+                try:
+                    loaded.append((brain, await load_brain(brain)))
+                except Exception as e:
+                    readiness.brains[brain] = f"failed: {e}"
+                    logger.exception(f"Skipping warm-up of {brain} brain: load failed")
+                    continue
+                readiness.brains[brain] = "loaded"
+        await phase("indexes", load_brains())
+
+        embeddings = await phase("encode", run_query(model.encode, WARMUP_QUERIES, convert_to_numpy=True))
+        embeddings = normalize_vectors(np.asarray(embeddings)).astype('float32')
+
+        async def search_brains():
+            for brain, entry in loaded:
+                try:
+                    await run_query(search_vectors, entry, embeddings, 5)
+                except Exception as e:
+                    readiness.brains[brain] = f"failed: {e}"
+                    logger.exception(f"Warm-up search of {brain} brain failed")
+        await phase("search", search_brains())
+
+        readiness.phase = None
+        readiness.state = "ready"
+        readiness.ready_at = time.time()
+        logger.info(f"Service ready after {readiness.ready_at - readiness.started_at:.1f} s ({readiness.phases})")
+    except Exception as e:
+        readiness.state = "failed"
+        readiness.error = f"{readiness.phase}: {e}"
+        logger.exception(f"Startup warm-up failed during {readiness.phase}")
+    return readiness
@@ -0,0 +1,113 @@
+"""Benchmark fixed-size against length-bucketed embedding batches."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path so we can import app
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import os
+import time
+from typing import List
+import numpy as np
+from app.config import BRAINS, EMBEDDING_BATCH_TOKENS, EMBEDDING_MAX_BATCH_SIZE, get_filenames
+from app.services.embeddings import BACKENDS, MODEL_NAME, load_backend, plan_batches
+from app.services.metadata_store import open_metadata
+
+WORDS = (
+    "project launch campaign review notes idea draft meeting budget design "
+    "customer research plan roadmap feedback release metric growth team "
+    "content outline summary question decision follow-up weekly goal"
+).split()
+
+def load_texts(args) -> List[str]:
+    """
+    Sample a brain's block contents, or generate Roam-like blocks.
+
+    Generated blocks follow the skew of a typical graph: mostly short
+    bullets and links (median about ten words) with a long tail of
+    pasted paragraphs of several hundred words.
+    """
+    rng = np.random.default_rng(0)
+    if args.brain:
+        path = get_filenames(args.brain)["meta"]
+        if not os.path.exists(path):
+            raise SystemExit(f"{path} not found; reindex {args.brain} first")
+        metadata = open_metadata(path)
+        rows = rng.choice(len(metadata), size=min(args.texts, len(metadata)), replace=False)
+        return [metadata[int(row)]["content"] for row in rows]
+    lengths = np.clip(rng.lognormal(mean=2.3, sigma=1.0, size=args.texts), 1, 400).astype(int)
+    return [" ".join(rng.choice(WORDS, size=length)) for length in lengths]
+
+def fixed_batches(backend, texts: List[str], batch_size: int) -> np.ndarray:
+    """The previous create_embeddings() loop: input order, fixed batch size."""
+    encoded = []
+    for i in range(0, len(texts), batch_size):
+        encoded.extend(backend.encode(texts[i:i + batch_size], batch_size=batch_size))
+    return np.array(encoded).astype("float32")
+
+def bucketed_batches(backend, texts: List[str], max_tokens: int, max_size: int) -> np.ndarray:
+    """Length-sorted batches within a token budget, into a preallocated matrix."""
+    encoded = np.empty((len(texts), backend.dimension), dtype="float32")
+    for batch in plan_batches(backend.count_tokens(texts), max_tokens, max_size):
+        encoded[batch] = backend.encode([texts[i] for i in batch], batch_size=len(batch))
+    return encoded
+
+def padding_efficiency(counts: np.ndarray, batches: List[np.ndarray]) -> float:
+    """Fraction of the padded tokens in all batches that are real tokens."""
+    padded = sum(len(batch) * counts[batch].max() for batch in batches)
+    return float(counts.sum() / padded)
+
+def main():
+    """Embed the same blocks both ways and report throughput."""
+    parser = argparse.ArgumentParser(description="Compare fixed and length-bucketed embedding batches")
+    parser.add_argument("--backend", type=str, default="torch", choices=list(BACKENDS), help="Backend to benchmark")
+    parser.add_argument("--model", type=str, default=MODEL_NAME, help="Model to load")
+    parser.add_argument("--brain", type=str, choices=BRAINS,
+                      help="Embed this brain's blocks instead of generated ones")
+    parser.add_argument("--texts", type=int, default=2000, help="Number of blocks to embed")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per batch of the fixed strategy")
+    parser.add_argument("--max-tokens", type=int, default=EMBEDDING_BATCH_TOKENS, help="Padded tokens per bucketed batch")
+    parser.add_argument("--max-size", type=int, default=EMBEDDING_MAX_BATCH_SIZE, help="Texts per bucketed batch")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per strategy; the best is reported")
+    args = parser.parse_args()
+
+    texts = load_texts(args)
+    backend = load_backend(args.backend, args.model)
+    counts = backend.count_tokens(texts)
+    print(
+        f"{len(texts)} blocks, {args.backend} {backend.model_name}, tokens per block: "
+        f"median {int(np.median(counts))}, p90 {int(np.percentile(counts, 90))}, max {int(counts.max())}"
+    )
+
+    fixed = [np.arange(i, min(i + args.batch_size, len(texts))) for i in range(0, len(texts), args.batch_size)]
+    strategies = {
+        f"fixed {args.batch_size}": (lambda: fixed_batches(backend, texts, args.batch_size), fixed),
+        "bucketed": (
+            lambda: bucketed_batches(backend, texts, args.max_tokens, args.max_size),
+            plan_batches(counts, args.max_tokens, args.max_size)
+        ),
+    }
+
+    # One untimed call so lazy initialization is not counted
+    backend.encode(texts[:args.batch_size], batch_size=args.batch_size)
+    print(f"{'strategy':12} {'batches':>8} {'padding eff':>12} {'blocks/s':>9}")
+    results = {}
+    for name, (run, batches) in strategies.items():
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results[name] = run()
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:12} {len(batches):8} {padding_efficiency(counts, batches):12.2f} {len(texts) / best:9.0f}")
+
+    # Both strategies must produce the same vectors in the same order
+    first, second = results.values()
+    cosines = np.sum(first * second, axis=1) / (
+        np.linalg.norm(first, axis=1) * np.linalg.norm(second, axis=1)
+    )
+    print(f"min cosine between strategies: {cosines.min():.5f}")
+
+if __name__ == "__main__":
+    main()
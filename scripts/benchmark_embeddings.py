@@ -0,0 +1,93 @@
+"""Benchmark embedding backends for throughput and agreement with a baseline."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path so we can import app
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import os
+import time
+import numpy as np
+from app.config import BRAINS, get_filenames
+from app.services.embeddings import BACKENDS, MODEL_NAME, load_backend
+from app.services.metadata_store import open_metadata
+
+WORDS = (
+    "project launch campaign review notes idea draft meeting budget design "
+    "customer research plan roadmap feedback release metric growth team "
+    "content outline summary question decision follow-up weekly goal"
+).split()
+
+def load_texts(args) -> list:
+    """Sample a brain's block contents, or generate random sentences."""
+    rng = np.random.default_rng(0)
+    if args.brain:
+        path = get_filenames(args.brain)["meta"]
+        if not os.path.exists(path):
+            raise SystemExit(f"{path} not found; reindex {args.brain} first")
+        metadata = open_metadata(path)
+        rows = rng.choice(len(metadata), size=min(args.texts, len(metadata)), replace=False)
+        return [metadata[int(row)]["content"] for row in rows]
+    return [
+        " ".join(rng.choice(WORDS, size=rng.integers(4, 40)))
+        for _ in range(args.texts)
+    ]
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def neighbour_overlap(baseline: np.ndarray, candidate: np.ndarray, k: int) -> float:
+    """Mean fraction of each text's top-k neighbours that both embeddings agree on."""
+    k = min(k, len(baseline) - 1)
+    if k < 1:
+        return 1.0
+    def neighbours(vectors):
+        scores = vectors @ vectors.T
+        np.fill_diagonal(scores, -np.inf)
+        return np.argsort(-scores, axis=1)[:, :k]
+    expected, found = neighbours(baseline), neighbours(candidate)
+    return float(np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)]))
+
+def main():
+    """Encode the same texts with each backend and report speed and agreement."""
+    parser = argparse.ArgumentParser(description="Compare embedding backends")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"], choices=list(BACKENDS),
+                      help="Backends to compare; the first is the agreement baseline")
+    parser.add_argument("--model", type=str, default=MODEL_NAME, help="Model to load in every backend")
+    parser.add_argument("--brain", type=str, choices=BRAINS,
+                      help="Embed this brain's blocks instead of random sentences")
+    parser.add_argument("--texts", type=int, default=1000, help="Number of texts to embed")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per encode() call")
+    parser.add_argument("--top-k", type=int, default=10, help="Neighbours compared for agreement")
+    args = parser.parse_args()
+
+    texts = load_texts(args)
+    print(f"{len(texts)} texts, batch size {args.batch_size}, model {args.model}")
+    print(f"{'backend':10} {'load s':>7} {'texts/s':>8} {'cos mean':>9} {'cos min':>8} {'top-k':>6}")
+
+    baseline = None
+    for name in args.backends:
+        try:
+            start = time.perf_counter()
+            backend = load_backend(name, args.model)
+            load_time = time.perf_counter() - start
+        except Exception as e:
+            print(f"{name:10} unavailable: {e}")
+            continue
+
+        # One untimed call so lazy initialization is not counted
+        backend.encode(texts[:args.batch_size], batch_size=args.batch_size)
+        start = time.perf_counter()
+        embeddings = normalize(np.asarray(backend.encode(texts, batch_size=args.batch_size), dtype="float32"))
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        if baseline is None:
+            baseline = embeddings
+        cosines = np.sum(baseline * embeddings, axis=1)
+        overlap = neighbour_overlap(baseline, embeddings, args.top_k)
+        print(f"{name:10} {load_time:7.1f} {throughput:8.0f} {cosines.mean():9.4f} {cosines.min():8.4f} {overlap:6.3f}")
+
+if __name__ == "__main__":
+    main()
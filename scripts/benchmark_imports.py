@@ -0,0 +1,86 @@
+"""Benchmark how long importing the app takes and which heavy modules it loads."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path so we can import app
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import os
+import statistics
+import subprocess
+
+ROOT = Path(__file__).parent.parent
+
+# Modules that must only load when a model or index is first used
+HEAVY_MODULES = ("faiss", "torch", "sentence_transformers", "transformers", "onnxruntime")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+def import_once(module: str) -> tuple:
+    """Import a module in a fresh interpreter; returns (seconds, heavy modules loaded)."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1]
+    seconds, heavy = output.split(" ", 1) if " " in output else (output, "")
+    return float(seconds), [name for name in heavy.split(",") if name]
+
+def slowest_imports(module: str, count: int) -> list:
+    """Get the modules with the largest cumulative import time (-X importtime)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+def main():
+    """Time cold imports and fail if they are too slow or load heavy modules."""
+    parser = argparse.ArgumentParser(description="Benchmark app import time")
+    parser.add_argument("--module", default="app.server", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Cold imports to time")
+    parser.add_argument("--max-seconds", type=float, default=None,
+                      help="Fail if the median import takes longer than this")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    timings = []
+    heavy = []
+    for _ in range(args.runs):
+        seconds, heavy = import_once(args.module)
+        timings.append(seconds)
+    median = statistics.median(timings)
+
+    print(f"import {args.module}: median {median * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms over {args.runs} runs")
+    print(f"heavy modules loaded: {', '.join(heavy) or 'none'}")
+    print(f"\n{'cumulative ms':>14}  module")
+    for cumulative, name in slowest_imports(args.module, args.top):
+        print(f"{cumulative / 1000:>14.1f}  {name}")
+
+    failed = False
+    if heavy:
+        print(f"\nFAIL: importing {args.module} loads {', '.join(heavy)}")
+        failed = True
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f"\nFAIL: median import time {median:.2f}s exceeds {args.max_seconds:.2f}s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark index types for memory, latency and recall against a flat baseline."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path so we can import app
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import os
+import time
+import faiss
+import numpy as np
+from app.config import BRAINS, INDEX_DEFAULTS, get_filenames
+from app.services.embeddings import HashingBackend
+from app.services.vector_index import (
+    INDEX_TYPES,
+    COMPRESSED_TYPES,
+    build_index,
+    make_search_params,
+    measure_recall,
+    search_index
+)
+
+def load_vectors(args) -> np.ndarray:
+    """Load a brain's stored vectors, or generate random or hashed-text ones."""
+    if args.brain:
+        path = get_filenames(args.brain)["vectors"]
+        if not os.path.exists(path):
+            raise SystemExit(f"{path} not found; reindex {args.brain} first")
+        return np.load(path)
+    if args.hashed:
+        # Generated sentences over a small vocabulary share words, giving the
+        # clustered structure of real text without loading a model
+        rng = np.random.default_rng(0)
+        vocab = [f"w{i}" for i in range(2000)]
+        texts = [" ".join(rng.choice(vocab, size=rng.integers(4, 30))) for _ in range(args.rows)]
+        vectors = HashingBackend("", args.dim).encode(texts)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = np.random.default_rng(0).standard_normal((args.rows, args.dim)).astype('float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def main():
+    """Build every index type over the same vectors and report the trade-offs."""
+    parser = argparse.ArgumentParser(description="Compare index types")
+    parser.add_argument("--brain", type=str, choices=BRAINS,
+                      help="Use this brain's stored vectors instead of random data")
+    parser.add_argument("--rows", type=int, default=50000, help="Random vectors to generate")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of random vectors")
+    parser.add_argument("--hashed", action="store_true",
+                      help="Embed generated sentences with the hash backend instead of random vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries to run")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    # Perturbed stored vectors stand in for queries near real content
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), size=args.queries)] + rng.normal(0, 0.05, (args.queries, vectors.shape[1]))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype('float32')
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, k={args.top_k}")
+    print(f"{'type':8} {'bytes/vec':>10} {'build s':>8} {'ms/query':>9} {'recall':>7} {'reranked':>9}")
+    for index_type in args.types:
+        config = {**INDEX_DEFAULTS, "type": index_type, "min_ann_rows": 0}
+        start = time.perf_counter()
+        index, params = build_index(vectors, config)
+        build_time = time.perf_counter() - start
+
+        search_params = make_search_params(params["type"], config)
+        size = len(faiss.serialize_index(index)) / len(vectors)
+        start = time.perf_counter()
+        search_index(index, queries, args.top_k, search_params)
+        latency = (time.perf_counter() - start) / args.queries * 1000
+        recall = measure_recall(index, vectors, queries, args.top_k, search_params)
+        reranked = ""
+        if params["type"] in COMPRESSED_TYPES:
+            reranked = f"{measure_recall(index, vectors, queries, args.top_k, search_params, config['rerank']):.3f}"
+        print(f"{params['type']:8} {size:10.0f} {build_time:8.2f} {latency:9.3f} {recall:7.3f} {reranked:>9}")
+
+if __name__ == "__main__":
+    main()
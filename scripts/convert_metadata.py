@@ -0,0 +1,42 @@
+"""One-time conversion of legacy metadata JSON files into metadata stores."""
+
+import sys
+import os
+from pathlib import Path
+
+# Add parent directory to Python path so we can import app
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import logging
+from app.config import BRAINS, DATA_DIR, get_filenames
+from app.services.metadata_store import convert_json_metadata
+from app.utils.logging import setup_logging
+
+# Set up logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+def main():
+    """Convert metadata_<brain>.json to the store format search reads."""
+    parser = argparse.ArgumentParser(description="Convert legacy metadata JSON files")
+    parser.add_argument("--brain", type=str, choices=BRAINS,
+                      help="Brain to convert (default: all brains)")
+    parser.add_argument("--force", action="store_true",
+                      help="Overwrite an existing metadata store")
+    args = parser.parse_args()
+
+    for brain in [args.brain] if args.brain else BRAINS:
+        json_path = f"{DATA_DIR}/metadata_{brain}.json"
+        store_path = get_filenames(brain)["meta"]
+        if not os.path.exists(json_path):
+            logger.info(f"Skipping {brain}: {json_path} not found")
+            continue
+        if os.path.exists(store_path) and not args.force:
+            logger.info(f"Skipping {brain}: {store_path} already exists (use --force to overwrite)")
+            continue
+        count = convert_json_metadata(json_path, store_path)
+        logger.info(f"✅ Converted {count} rows for {brain} brain to {store_path}")
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,9 @@ sys.path.append(str(Path(__file__).parent.parent))
 import asyncio
 import argparse
 import logging
-from app.services.indexing import reindex_brain
+from contextlib import AsyncExitStack
+from app.services.generations import build_lock
+from app.services.indexing import ReindexError, reindex_brains
 from app.utils.logging import setup_logging
 from app.config import BRAINS
 
@@ -18,20 +20,40 @@ from app.config import BRAINS
 setup_logging()
 logger = logging.getLogger(__name__)
 
+def log_result(brain, result):
+    """Log one brain's reindex result."""
+    logger.info(f"✅ Successfully reindexed {brain} brain ({result['mode']})")
+    logger.info(f"Processed {result['blocks_processed']} blocks in {result['duration']:.2f} seconds")
+    logger.info(
+        f"Added {result['added']}, updated {result['updated']}, removed {result['removed']}, "
+        f"unchanged {result['unchanged']}; saved ~{result['time_saved_seconds']:.1f} seconds of embedding"
+    )
+
 async def main():
     """Main function to run reindexing."""
-    parser = argparse.ArgumentParser(description="Reindex a brain")
-    parser.add_argument("--brain", type=str, required=True, choices=BRAINS,
-                      help=f"Brain to reindex (one of: {', '.join(BRAINS)})")
+    parser = argparse.ArgumentParser(description="Reindex one or more brains")
+    parser.add_argument("--brain", type=str, required=True, nargs="+", choices=BRAINS,
+                      help=f"Brains to reindex together (any of: {', '.join(BRAINS)})")
+    parser.add_argument("--full", action="store_true",
+                      help="Re-encode every block, ignoring the last build and the embedding cache")
     args = parser.parse_args()
     
     try:
-        logger.info(f"Starting reindex of {args.brain} brain")
-        result = await reindex_brain(args.brain)
-        logger.info(f"✅ Successfully reindexed {args.brain} brain")
-        logger.info(f"Processed {result['blocks_processed']} blocks in {result['duration']:.2f} seconds")
+        async with AsyncExitStack() as stack:
+            # Wait for reindex jobs of the running server to finish these brains
+            for brain in sorted(set(args.brain)):
+                await stack.enter_async_context(build_lock(brain))
+            logger.info(f"Starting reindex of {', '.join(args.brain)}")
+            results = await reindex_brains(args.brain, full=args.full)
+        for brain, result in results.items():
+            log_result(brain, result)
+    except ReindexError as e:
+        for brain, result in e.results.items():
+            log_result(brain, result)
+        logger.error(f"❌ Failed to reindex {e}")
+        raise
     except Exception as e:
-        logger.error(f"❌ Failed to reindex {args.brain} brain", exc_info=True)
+        logger.error(f"❌ Failed to reindex {', '.join(args.brain)}", exc_info=True)
         raise
 
 if __name__ == "__main__":
@@ -1,14 +1,25 @@
 """Global test fixtures."""
 
 import os
+import tempfile
+
+# Embed with the deterministic hashed n-gram backend so the suite runs
+# offline without downloading a model; export EMBEDDING_BACKEND to override.
+# Set before importing app, whose config reads it at import time.
+os.environ.setdefault("EMBEDDING_BACKEND", "hash")
+# Keep the persistent embedding cache out of the real data directory
+os.environ.setdefault("EMBEDDING_CACHE_DIR", tempfile.mkdtemp(prefix="embedding-cache-"))
+
+import asyncio
 import json
+import threading
 import pytest
 import faiss
 import numpy as np
 from faker import Faker
 from httpx import AsyncClient
 from fastapi import FastAPI
-from typing import Dict, List, AsyncGenerator
+from typing import Dict, List, Optional, AsyncGenerator
 import factory
 from datetime import datetime
 from fastapi.testclient import TestClient
@@ -16,6 +27,8 @@ from httpx import ASGITransport
 
 from app.server import app
 from app.models.search import SearchResult
+from app.services import embeddings, indexing
+from app.services.embeddings import HashingBackend
 from app.services.search import get_model
 
 fake = Faker()
@@ -57,10 +70,95 @@ def search_results() -> List[SearchResult]:
         for _ in range(5)
     ]
 
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point brain files and index generations at a temporary directory."""
+    monkeypatch.setattr("app.config.DATA_DIR", str(tmp_path))
+    monkeypatch.setattr("app.config.BRAINS_DIR", str(tmp_path / "brains"))
+    monkeypatch.setattr("app.services.generations.BRAINS_DIR", str(tmp_path / "brains"))
+    return tmp_path
+
+class FakeRoam:
+    """
+    Roam API stand-in for reindexes.
+
+    Every TOC page serves blocks unless pages has its own list, and refs
+    maps TOC block uids to the [uid, content, timestamp] rows of blocks
+    referencing them. Each call is appended to events, and both calls
+    wait delay seconds before answering.
+    """
+
+    def __init__(self):
+        self.blocks: List[List] = [[f"uid-{i}", f"Block number {i}", 1000 + i] for i in range(6)]
+        self.pages: Dict[str, List[List]] = {}
+        self.refs: Dict[str, List[List]] = {}
+        self.events: List[str] = []
+        self.delay = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def toc_blocks(self, page: str) -> List[List]:
+        self.events.append("toc")
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return list(self.pages.get(page, self.blocks))
+
+    async def references(self, uids: List[str]) -> List[List]:
+        self.events.append("references")
+        await asyncio.sleep(self.delay)
+        return [[*ref, uid] for uid in uids for ref in self.refs.get(uid, [])]
+
+@pytest.fixture
+def roam(data_dir, monkeypatch) -> FakeRoam:
+    """Reindex from a FakeRoam with the hashing backend and an empty embedding cache."""
+    fake = FakeRoam()
+    monkeypatch.setattr(embeddings, "_model", HashingBackend("ignored"))
+    monkeypatch.setattr("app.services.embedding_store.EMBEDDING_CACHE_DIR", str(data_dir / "cache"))
+    monkeypatch.setattr(indexing, "get_blocks_under_toc", fake.toc_blocks)
+    monkeypatch.setattr(indexing, "get_block_references_batch", fake.references)
+    return fake
+
+class CountingBackend(HashingBackend):
+    """
+    Hashing backend recording how it was called.
+
+    texts collects every text encoded and batches each encode() call's
+    texts and batch size; token_threads holds the thread each
+    count_tokens() call ran on. If events is set, every encode() also
+    appends "encode" to it, e.g. to interleave with FakeRoam.events.
+    """
+
+    def __init__(self):
+        super().__init__("ignored")
+        self.texts: List[str] = []
+        self.batches: List[tuple] = []
+        self.token_threads: List[threading.Thread] = []
+        self.events: Optional[List[str]] = None
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        self.texts.extend(texts)
+        self.batches.append((list(texts), batch_size))
+        if self.events is not None:
+            self.events.append("encode")
+        return super().encode(texts, batch_size, convert_to_numpy, **kwargs)
+
+    def count_tokens(self, texts):
+        self.token_threads.append(threading.current_thread())
+        return super().count_tokens(texts)
+
+@pytest.fixture
+def counting_backend(monkeypatch) -> CountingBackend:
+    """Embed with a CountingBackend; request it after roam, which installs its own backend."""
+    backend = CountingBackend()
+    monkeypatch.setattr(embeddings, "_model", backend)
+    return backend
+
 @pytest.fixture
 def test_index(tmp_path):
     """Create a test FAISS index."""
-    # Get the actual model to ensure dimension matches
+    # Get the configured backend to ensure dimension matches
     model = get_model()
     # Create a small test sentence and get its embedding to determine dimension
     test_embedding = model.encode("test", convert_to_numpy=True)
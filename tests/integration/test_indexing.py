@@ -1,9 +1,9 @@
 import pytest
 import os
 import faiss
-import json
 from app.services.indexing import reindex_brain
 from app.config import get_filenames
+from app.services.metadata_store import open_metadata
 from faker import Faker
 from datetime import datetime
 
@@ -60,10 +60,9 @@ class TestIndexingIntegration:
         assert index.ntotal > 0  # Has vectors
 
         # Verify metadata
-        with open(files["meta"], "r") as f:
-            metadata = json.load(f)
-            assert len(metadata) > 0
-            assert all(isinstance(m, dict) for m in metadata)
+        metadata = open_metadata(files["meta"])
+        assert len(metadata) == index.ntotal
+        assert all(isinstance(metadata[i], dict) for i in range(len(metadata)))
 
     @pytest.mark.timeout(10)
     async def test_indexing_error_handling(self, monkeypatch):
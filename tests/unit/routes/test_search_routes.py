@@ -1,7 +1,15 @@
 import pytest
 from fastapi import HTTPException
-from app.routes.search import search_endpoint
-from app.models.api import SearchRequest, SearchResult, SearchResponse
+from app.routes.search import search_endpoint, search_batch_endpoint, search_multi_endpoint
+from app.models.api import (
+    SearchRequest,
+    SearchResult,
+    SearchResponse,
+    BatchSearchRequest,
+    BatchSearchResponse,
+    MultiSearchRequest,
+    MultiSearchResponse
+)
 
 @pytest.mark.unit
 class TestSearchRoutes:
@@ -67,4 +75,78 @@ class TestSearchRoutes:
         with pytest.raises(HTTPException) as exc:
             await search_endpoint(request, auth=True)
         assert exc.value.status_code == 404
-        assert "Index not found" in str(exc.value.detail) 
\ No newline at end of file
+        assert "Index not found" in str(exc.value.detail) 
+
+    async def test_search_batch_endpoint_success(self, monkeypatch):
+        """Test batch endpoint returns one response per query."""
+        async def mock_search_batch(request):
+            return [
+                [SearchResult(content=f"Result for {item.query}", score=0.9, brain="ideas", metadata={"uid": item.query})]
+                for item in request.queries
+            ]
+        monkeypatch.setattr("app.routes.search.search_batch", mock_search_batch)
+
+        request = BatchSearchRequest(brain="ideas", queries=[{"query": "one"}, {"query": "two", "top_k": 2}])
+        response = await search_batch_endpoint(request, auth=True)
+
+        assert isinstance(response, BatchSearchResponse)
+        assert response.count == 2
+        assert [r.query for r in response.results] == ["one", "two"]
+        assert response.results[1].results[0].metadata == {"uid": "two"}
+
+    async def test_search_batch_endpoint_error(self, monkeypatch):
+        """Test batch endpoint maps validation errors to 422."""
+        async def mock_search_batch(request):
+            raise ValueError("Search query cannot be empty")
+        monkeypatch.setattr("app.routes.search.search_batch", mock_search_batch)
+
+        request = BatchSearchRequest(brain="ideas", queries=[{"query": " "}])
+        with pytest.raises(HTTPException) as exc:
+            await search_batch_endpoint(request, auth=True)
+        assert exc.value.status_code == 422
+
+    async def test_search_multi_endpoint_defaults_to_all_brains(self, monkeypatch):
+        """Test multi-brain endpoint searches every brain when none are given."""
+        searched = []
+        async def mock_search_multi(request, brains, timings=None):
+            searched.extend(brains)
+            results = [SearchResult(content="Hit", score=0.9, brain="marketing", metadata={"uid": "m1"})]
+            per_brain = {brain: {"count": int(brain == "marketing"), "latency_ms": 1.0} for brain in brains}
+            return results, per_brain
+        monkeypatch.setattr("app.routes.search.search_multi", mock_search_multi)
+
+        response = await search_multi_endpoint(MultiSearchRequest(query="launch"), auth=True)
+
+        assert isinstance(response, MultiSearchResponse)
+        assert searched == ["ideas", "marketing"]
+        assert response.count == 1
+        assert response.brains["marketing"].count == 1
+        assert response.brains["ideas"].error is None
+
+    async def test_search_multi_endpoint_not_found(self, monkeypatch):
+        """Test multi-brain endpoint maps all-brains-missing to 404."""
+        async def mock_search_multi(request, brains, timings=None):
+            raise FileNotFoundError("ideas: Missing files: index")
+        monkeypatch.setattr("app.routes.search.search_multi", mock_search_multi)
+
+        with pytest.raises(HTTPException) as exc:
+            await search_multi_endpoint(MultiSearchRequest(query="launch", brains=["ideas"]), auth=True)
+        assert exc.value.status_code == 404
+
+    async def test_legacy_multi_search_keeps_mode_and_filters(self, monkeypatch):
+        """Test the token-scoped multi-brain endpoint passes mode and filters on."""
+        from app.main import search_multi as legacy_search_multi
+        searched = []
+        async def mock_search_multi(request, brains, timings=None):
+            searched.append((request, brains))
+            return [], {brain: {"count": 0, "latency_ms": 1.0} for brain in brains}
+        monkeypatch.setattr("app.services.search.search_multi", mock_search_multi)
+
+        request = MultiSearchRequest(query="launch", mode="lexical", filters={"tags": ["launch"]})
+        response = await legacy_search_multi(None, request, token="marketing-test-token")
+
+        (sent, brains), = searched
+        assert brains == ["marketing"]
+        assert sent.mode == "lexical"
+        assert sent.filters.tags == ["launch"]
+        assert response["brains"] == {"marketing": {"count": 0, "latency_ms": 1.0}}
@@ -0,0 +1,53 @@
+"""Test block attribute filters."""
+
+import pytest
+import numpy as np
+from app.services.attributes import BlockAttributes, extract_tags
+
+BLOCKS = [
+    {"uid": "a1", "content": "Launch plan #marketing", "timestamp": 1000, "type": "block"},
+    {"uid": "b2", "content": "Notes for [[Dana Whitfield]]", "timestamp": 2000, "type": "block"},
+    {"uid": "c3", "content": "See #[[Spring Launch]] and #marketing", "timestamp": 3000,
+     "type": "reference", "references": ["a1", "b2"]},
+    {"uid": "d4", "content": "Unrelated", "timestamp": 4000, "type": "reference", "references": ["b2"]},
+]
+
+@pytest.mark.unit
+class TestBlockAttributes:
+    def test_extract_tags(self):
+        """Test tags and page links are found once each, lowercased."""
+        assert extract_tags("#[[Spring Launch]] with [[Dana]] #Follow-up #follow-up") == [
+            "spring launch", "dana", "follow-up"
+        ]
+
+    def test_scalar_filters(self):
+        """Test block type and edit time range filters."""
+        attributes = BlockAttributes.build(BLOCKS)
+
+        assert attributes.mask(block_type="reference").tolist() == [False, False, True, True]
+        assert attributes.mask(edited_after=2000, edited_before=4000).tolist() == [False, True, True, False]
+        assert attributes.mask().all()
+
+    def test_multi_valued_filters(self):
+        """Test tag and reference filters match any of the given values."""
+        attributes = BlockAttributes.build(BLOCKS)
+
+        assert attributes.mask(tags=["#marketing"]).tolist() == [True, False, True, False]
+        assert attributes.mask(tags=["#[[Spring Launch]]", "dana whitfield"]).tolist() == [False, True, True, False]
+        assert attributes.mask(references=["a1"]).tolist() == [False, False, True, False]
+        assert attributes.mask(references=["b2"], block_type="reference", edited_before=4000).tolist() == [
+            False, False, True, False
+        ]
+        assert not attributes.mask(tags=["missing"]).any()
+
+    def test_save_and_load(self, tmp_path):
+        """Test saved attributes evaluate filters identically after loading."""
+        attributes = BlockAttributes.build(BLOCKS)
+        path = str(tmp_path / "attrs")
+        attributes.save(path)
+
+        loaded = BlockAttributes.load(path)
+        assert len(loaded) == len(BLOCKS)
+        assert isinstance(loaded.edit_times, np.memmap) and isinstance(loaded.tag_ids, np.memmap)
+        filters = {"tags": ["marketing"], "references": ["b2"]}
+        assert np.array_equal(loaded.mask(**filters), attributes.mask(**filters))
@@ -0,0 +1,53 @@
+"""Test query embedding batcher."""
+
+import asyncio
+import pytest
+import numpy as np
+from app.services.batching import QueryBatcher
+
+def fake_encode(calls):
+    """Build an encoder that records each batch it receives."""
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(text)), 1.0] for text in texts], dtype="float32")
+    return encode
+
+@pytest.mark.unit
+class TestQueryBatcher:
+    async def test_concurrent_queries_share_one_call(self):
+        """Test queries in the same window are encoded together."""
+        calls = []
+        batcher = QueryBatcher(fake_encode(calls), max_batch_size=16, max_wait_ms=20)
+
+        vectors = await asyncio.gather(*(batcher.encode("q" * n) for n in range(1, 6)))
+
+        assert len(calls) == 1
+        assert [float(v[0]) for v in vectors] == [1.0, 2.0, 3.0, 4.0, 5.0]
+        stats = batcher.stats()
+        assert stats["batches"] == 1
+        assert stats["largest_batch"] == 5
+        assert stats["batch_size_histogram"] == {8: 1}
+
+    async def test_full_batch_flushes_immediately(self):
+        """Test reaching max batch size does not wait for the timer."""
+        calls = []
+        batcher = QueryBatcher(fake_encode(calls), max_batch_size=2, max_wait_ms=10_000)
+
+        await asyncio.wait_for(
+            asyncio.gather(*(batcher.encode(str(n)) for n in range(4))),
+            timeout=1
+        )
+
+        assert [len(batch) for batch in calls] == [2, 2]
+
+    async def test_errors_reach_every_waiter(self):
+        """Test an encoding failure is raised to all callers in the batch."""
+        def failing(texts):
+            raise RuntimeError("model crashed")
+        batcher = QueryBatcher(failing, max_batch_size=8, max_wait_ms=1)
+
+        results = await asyncio.gather(
+            batcher.encode("a"), batcher.encode("b"), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
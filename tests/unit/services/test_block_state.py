@@ -0,0 +1,143 @@
+"""Test block state tracking and incremental reindexing."""
+
+import json
+import pytest
+import numpy as np
+from app.config import current_generation, get_filenames
+from app.services import indexing
+from app.services.block_state import BlockState, ReindexPlan, content_hash
+
+BLOCKS = [
+    {"uid": "a1", "content": "Launch plan", "timestamp": 1000},
+    {"uid": "b2", "content": "Budget review", "timestamp": 2000},
+    {"uid": "c3", "content": "Hiring notes", "timestamp": 3000},
+]
+
+@pytest.mark.unit
+class TestBlockState:
+    def test_save_and_load(self, tmp_path):
+        """Test state round-trips through its .npz file."""
+        state = BlockState.build(BLOCKS, seconds_per_block=0.002)
+        state.save(str(tmp_path / "blocks.npz"))
+
+        loaded = BlockState.load(str(tmp_path / "blocks.npz"))
+
+        assert loaded.same_as(state)
+        assert loaded.uids == ["a1", "b2", "c3"]
+        assert loaded.hashes[1] == content_hash("Budget review")
+        assert loaded.seconds_per_block == 0.002
+
+    def test_plan_reuses_unchanged_content(self):
+        """Test only new and changed blocks are planned for embedding."""
+        previous = BlockState.build(BLOCKS)
+        current = BlockState.build([
+            {"uid": "c3", "content": "Hiring notes", "timestamp": 9000},
+            {"uid": "a1", "content": "Launch plan v2", "timestamp": 4000},
+            {"uid": "d4", "content": "Offsite agenda", "timestamp": 5000},
+        ])
+
+        plan = ReindexPlan(previous, current)
+
+        assert plan.counts() == {"added": 1, "updated": 1, "removed": 1, "unchanged": 1}
+        assert plan.reuse_rows.tolist() == [2, -1, -1]
+        assert plan.embed_rows.tolist() == [1, 2]
+        assert not previous.same_as(current)
+
+    def test_plan_without_previous_build(self):
+        """Test a first build embeds everything."""
+        plan = ReindexPlan(None, BlockState.build(BLOCKS))
+
+        assert plan.counts() == {"added": 3, "updated": 0, "removed": 0, "unchanged": 0}
+        assert plan.embed_rows.tolist() == [0, 1, 2]
+
+@pytest.mark.unit
+class TestIncrementalReindex:
+    async def test_embeds_only_changed_blocks(self, roam, counting_backend):
+        """Test a second reindex re-embeds only what changed and matches a full build."""
+        backend = counting_backend
+        blocks = roam.blocks = [[f"uid-{i}", f"Block number {i}", 1000 + i] for i in range(10)]
+
+        first = await indexing.reindex_brain("ideas")
+        assert first["mode"] == "full"
+        assert first["embedded"] == 10
+
+        backend.texts.clear()
+        unchanged = await indexing.reindex_brain("ideas")
+        assert unchanged["mode"] == "incremental"
+        assert unchanged["unchanged"] == 10
+        assert backend.texts == []
+
+        blocks[3] = ["uid-3", "Rewritten block", 5000]
+        del blocks[5]
+        blocks.append(["uid-new", "Brand new block", 6000])
+        second = await indexing.reindex_brain("ideas")
+
+        assert sorted(backend.texts) == ["Brand new block", "Rewritten block"]
+        assert {key: second[key] for key in ("added", "updated", "removed", "unchanged")} == {
+            "added": 1, "updated": 1, "removed": 1, "unchanged": 8
+        }
+        incremental_vectors = np.load(get_filenames("ideas")["vectors"])
+
+        backend.texts.clear()
+        full = await indexing.reindex_brain("ideas", full=True)
+        assert full["mode"] == "full"
+        # A full build re-encodes every text instead of trusting the cache
+        assert full["embedding_cache"]["hit_rate"] == 0.0
+        assert len(backend.texts) == 10
+        np.testing.assert_allclose(np.load(get_filenames("ideas")["vectors"]), incremental_vectors, atol=1e-3)
+
+    async def test_index_config_change_rebuilds_index(self, roam, counting_backend, monkeypatch):
+        """Test unchanged blocks still get a new index when the index config changed."""
+        backend = counting_backend
+        first = await indexing.reindex_brain("ideas")
+        assert first["index_type"] == "flat"
+
+        backend.texts.clear()
+        monkeypatch.setenv("INDEX_TYPE_IDEAS", "hnsw")
+        monkeypatch.setenv("INDEX_MIN_ANN_ROWS_IDEAS", "0")
+        rebuilt = await indexing.reindex_brain("ideas")
+
+        assert rebuilt["index_type"] == "hnsw"
+        assert rebuilt["embedded"] == 0 and backend.texts == []
+        assert current_generation("ideas") == rebuilt["generation"] != first["generation"]
+        with open(get_filenames("ideas")["params"]) as f:
+            assert json.load(f)["type"] == "hnsw"
+
+        unchanged = await indexing.reindex_brain("ideas")
+        assert unchanged["generation"] == rebuilt["generation"]
+
+@pytest.mark.unit
+class TestMultiBrainReindex:
+    async def test_shared_text_embedded_once(self, roam, counting_backend):
+        """Test brains are reindexed together, embedding text they share once."""
+        backend = counting_backend
+        roam.pages = {
+            "TOC - ideas": [["i1", "Shared launch plan", 1000], ["i2", "Only in ideas", 1001]],
+            "TOC - marketing": [["m1", "Shared launch plan", 1002], ["m2", "Only in marketing", 1003]],
+        }
+
+        results = await indexing.reindex_brains(["ideas", "marketing"])
+
+        # Both fetches were in flight before either returned
+        assert roam.max_in_flight == 2
+        assert sorted(backend.texts) == ["Only in ideas", "Only in marketing", "Shared launch plan"]
+        assert results["ideas"]["embedding_cache"]["deduplicated"] == 1
+        for brain in ("ideas", "marketing"):
+            assert results[brain]["blocks_processed"] == 2
+            assert results[brain]["generation"] == current_generation(brain)
+        ideas, marketing = (np.load(get_filenames(brain)["vectors"]) for brain in ("ideas", "marketing"))
+        np.testing.assert_array_equal(ideas[0], marketing[0])
+
+    async def test_failed_brain_does_not_block_others(self, roam):
+        """Test a brain failing to fetch is raised after the others are published."""
+        roam.pages = {"TOC - ideas": [], "TOC - marketing": [["m1", "Campaign brief", 1000]]}
+
+        with pytest.raises(indexing.ReindexError, match="ideas: No blocks found under TOC - ideas") as exc_info:
+            await indexing.reindex_brains(["ideas", "marketing"])
+
+        assert list(exc_info.value.results) == ["marketing"]
+        assert isinstance(exc_info.value.failures["ideas"], ValueError)
+        with pytest.raises(ValueError, match="TOC - ideas"):
+            await indexing.reindex_brain("ideas")
+        assert current_generation("ideas") is None
+        assert current_generation("marketing") is not None
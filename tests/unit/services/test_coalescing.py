@@ -0,0 +1,63 @@
+"""Test single-flight coalescing."""
+
+import asyncio
+import pytest
+from app.services.coalescing import SingleFlight
+
+@pytest.mark.unit
+class TestSingleFlight:
+    async def test_identical_calls_share_one_run(self):
+        """Test concurrent calls with one key run the work once."""
+        flight = SingleFlight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return ["result"]
+
+        results = await asyncio.gather(*(flight.do("q", work) for _ in range(5)))
+
+        assert len(runs) == 1
+        assert all(result is results[0] for result in results)
+        assert flight.stats() == {"flights": 1, "coalesced": 4, "coalesced_ratio": 0.8, "in_flight": 0}
+
+    async def test_finished_flights_are_not_reused(self):
+        """Test a call after the run finished starts a new run."""
+        flight = SingleFlight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            return len(runs)
+
+        assert await flight.do("q", work) == 1
+        assert await flight.do("q", work) == 2
+        assert flight.stats()["coalesced"] == 0
+
+    async def test_errors_reach_every_caller(self):
+        """Test a failed run raises in all callers that joined it."""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        outcomes = await asyncio.gather(*(flight.do("q", work) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        """Test cancelling the first caller leaves the shared run intact."""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("q", work))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do("q", work))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
@@ -0,0 +1,128 @@
+"""Test the persistent embedding cache."""
+
+import os
+import time
+import pytest
+import numpy as np
+from app.services.block_state import content_hash
+from app.services.embedding_store import EmbeddingStore
+from app.services.indexing import create_embeddings
+
+def unit_vectors(rows: int, dimension: int = 8) -> np.ndarray:
+    vectors = np.random.default_rng(rows).standard_normal((rows, dimension)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@pytest.mark.unit
+class TestEmbeddingStore:
+    def test_put_and_get_across_instances(self, tmp_path):
+        """Test stored vectors are found by hash after reopening, as float16."""
+        vectors = unit_vectors(3)
+        hashes = [content_hash(f"text {i}") for i in range(3)]
+        store = EmbeddingStore(str(tmp_path), 8, max_bytes=1 << 20)
+        store.put_many(hashes, vectors)
+
+        reopened = EmbeddingStore(str(tmp_path), 8, max_bytes=1 << 20)
+        found, cached = reopened.get_many([hashes[2], content_hash("unseen"), hashes[0]])
+
+        assert found.tolist() == [True, False, True]
+        np.testing.assert_allclose(cached[[0, 2]], vectors[[2, 0]], atol=1e-3)
+        assert not cached[1].any()
+        assert reopened.stats()["hit_ratio"] == 2 / 3
+        assert os.path.getsize(tmp_path / "vectors.f16") == 3 * 8 * 2
+
+    def test_duplicates_stored_once(self, tmp_path):
+        """Test hashes already cached, or repeated in one call, are not appended again."""
+        store = EmbeddingStore(str(tmp_path), 8, max_bytes=1 << 20)
+        digest = content_hash("same")
+        store.put_many([digest, digest], unit_vectors(2))
+        store.put_many([digest], unit_vectors(1))
+
+        assert len(store) == 1
+        np.testing.assert_allclose(store.get_many([digest])[1], unit_vectors(2)[:1], atol=1e-3)
+
+        # A full reindex replaces the cached vector instead
+        store.put_many([digest], unit_vectors(1), overwrite=True)
+        reopened = EmbeddingStore(str(tmp_path), 8, max_bytes=1 << 20)
+        assert len(reopened) == 1
+        np.testing.assert_allclose(reopened.get_many([digest])[1], unit_vectors(1), atol=1e-3)
+
+    def test_garbage_collection(self, tmp_path):
+        """Test old unreferenced entries go, then least recently used past the budget."""
+        hashes = [content_hash(f"text {i}") for i in range(4)]
+        vectors = unit_vectors(4)
+        store = EmbeddingStore(str(tmp_path), 8, max_bytes=1 << 20)
+        store.put_many(hashes, vectors)
+        now = int(time.time())
+        store.used[:] = [now - 90 * 86400, now - 90 * 86400, now, now]
+
+        # text 0 is old but referenced; text 1 is old and unreferenced
+        assert store.collect_garbage([hashes[0]], max_age_days=30) == 1
+        assert store.get_many([hashes[1]])[0].tolist() == [False]
+
+        # Budget for two rows: referenced text 0 stays, then the newest other
+        store.max_bytes = 2 * store.row_bytes
+        store.used[store._rows[hashes[3]]] += 10
+        assert store.collect_garbage([hashes[0]]) == 1
+
+        reopened = EmbeddingStore(str(tmp_path), 8, max_bytes=1 << 20)
+        found, cached = reopened.get_many(hashes)
+        assert found.tolist() == [True, False, False, True]
+        np.testing.assert_allclose(cached[3], vectors[3], atol=1e-3)
+
+    def test_sees_compaction_by_another_process(self, tmp_path):
+        """Test a store reloads the index after another one compacted the shared cache."""
+        hashes = [content_hash(f"text {i}") for i in range(4)]
+        vectors = unit_vectors(4)
+        server = EmbeddingStore(str(tmp_path), 8, max_bytes=1 << 20)
+        server.put_many(hashes[:3], vectors[:3])
+        script = EmbeddingStore(str(tmp_path), 8, max_bytes=1 << 20)
+        script.used[0] = 0
+        script.flush()
+        assert script.collect_garbage(hashes[1:3], max_age_days=30) == 1
+
+        server.put_many(hashes[3:], vectors[3:])
+        found, cached = server.get_many(hashes)
+
+        assert found.tolist() == [False, True, True, True]
+        np.testing.assert_allclose(cached[1:], vectors[1:], atol=1e-3)
+        reopened = EmbeddingStore(str(tmp_path), 8, max_bytes=1 << 20)
+        assert len(reopened) == 3
+        assert os.path.getsize(tmp_path / "vectors.f16") == 3 * 8 * 2
+        np.testing.assert_allclose(reopened.get_many(hashes[1:])[1], vectors[1:], atol=1e-3)
+
+    def test_truncated_vectors_reset_cache(self, tmp_path):
+        """Test a vectors file shorter than its index is discarded, not misread."""
+        store = EmbeddingStore(str(tmp_path), 8, max_bytes=1 << 20)
+        store.put_many([content_hash("a"), content_hash("b")], unit_vectors(2))
+        with open(tmp_path / "vectors.f16", "r+b") as f:
+            f.truncate(8 * 2)
+
+        assert len(EmbeddingStore(str(tmp_path), 8, max_bytes=1 << 20)) == 0
+
+    def test_disabled(self, tmp_path):
+        """Test a zero budget stores nothing."""
+        store = EmbeddingStore(str(tmp_path / "cache"), 8, max_bytes=0)
+        store.put_many([content_hash("a")], unit_vectors(1))
+
+        assert len(store) == 0
+        assert not os.path.exists(tmp_path / "cache")
+
+    async def test_create_embeddings_encodes_each_text_once(self, tmp_path, counting_backend, monkeypatch):
+        """Test create_embeddings() encodes only distinct uncached texts."""
+        encoded = counting_backend.texts
+        monkeypatch.setattr("app.services.embedding_store.EMBEDDING_CACHE_DIR", str(tmp_path))
+        blocks = [{"uid": str(i), "content": text} for i, text in enumerate(["alpha", "beta", "alpha"])]
+
+        stats = {}
+        first, metadata = await create_embeddings(blocks, "ideas", stats)
+        assert encoded == ["alpha", "beta"]
+        assert stats == {"hits": 0, "misses": 3, "hit_rate": 0.0, "encoded": 2}
+        assert [row["uid"] for row in metadata] == ["0", "1", "2"]
+        np.testing.assert_array_equal(first[0], first[2])
+
+        blocks.append({"uid": "3", "content": "gamma"})
+        second, _ = await create_embeddings(blocks, "ideas", stats)
+        assert encoded == ["alpha", "beta", "gamma"]
+        assert stats == {"hits": 3, "misses": 1, "hit_rate": 0.75, "encoded": 1}
+        np.testing.assert_allclose(second[:3], first, atol=1e-3)
+        np.testing.assert_allclose(np.linalg.norm(second, axis=1), 1.0, rtol=1e-5)
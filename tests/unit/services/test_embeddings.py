@@ -0,0 +1,185 @@
+"""Test embedding backend registry and index compatibility checks."""
+
+import threading
+import pytest
+import faiss
+import numpy as np
+from app.services import embeddings
+from app.services.embeddings import (
+    BACKENDS,
+    EmbeddingBackend,
+    EmbeddingMismatchError,
+    HashingBackend,
+    check_compatible,
+    load_backend,
+    plan_batches,
+    register_backend
+)
+from app.services import indexing
+from app.services.registry import LoadedBrain
+from app.services.search import search, search_vectors
+from app.models.api import SearchRequest
+
+class StubBackend(EmbeddingBackend):
+    """Backend returning constant vectors of a fixed dimension."""
+    size = 4
+
+    @property
+    def dimension(self):
+        return self.size
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        if isinstance(texts, str):
+            return np.ones(self.size, dtype="float32")
+        return np.ones((len(texts), self.size), dtype="float32")
+
+@pytest.fixture
+def stub_backend(monkeypatch):
+    """Install a StubBackend as the configured backend."""
+    backend = StubBackend("stub-model")
+    monkeypatch.setattr(embeddings, "_model", backend)
+    return backend
+
+@pytest.mark.unit
+class TestEmbeddingBackends:
+    def test_builtin_backends_registered(self):
+        """Test the PyTorch, ONNX and quantized backends are selectable."""
+        assert {"torch", "onnx", "onnx-int8"} <= set(BACKENDS)
+        assert BACKENDS["onnx-int8"].name == "onnx-int8"
+        assert BACKENDS["onnx"].name == "onnx"
+
+    def test_register_and_load_backend(self, monkeypatch):
+        """Test a registered backend is loaded by name and describes itself."""
+        monkeypatch.setattr(embeddings, "BACKENDS", dict(BACKENDS))
+        register_backend("stub")(StubBackend)
+
+        backend = load_backend("stub", "stub-model")
+
+        assert isinstance(backend, StubBackend)
+        assert backend.info() == {"backend": "stub", "model": "stub-model", "dimension": 4}
+        assert backend.encode(["a", "b"]).shape == (2, 4)
+
+    def test_backend_must_implement_encode(self):
+        """Test a backend missing encode() cannot be instantiated."""
+        class Incomplete(EmbeddingBackend):
+            dimension = 4
+
+        with pytest.raises(TypeError, match="encode"):
+            Incomplete("stub-model")
+
+    def test_unknown_backend_rejected(self):
+        """Test an unregistered backend name is a ValueError."""
+        with pytest.raises(ValueError, match="Invalid embedding backend"):
+            load_backend("tensorflow")
+
+@pytest.mark.unit
+class TestHashingBackend:
+    def test_deterministic_across_instances(self):
+        """Test separately created backends embed a text identically."""
+        texts = ["Launch checklist for the spring campaign", "weekly review"]
+        first = HashingBackend("ignored").encode(texts)
+        second = HashingBackend("ignored").encode(texts)
+
+        assert first.shape == (2, 384)
+        assert first.dtype == np.float32
+        np.testing.assert_array_equal(first, second)
+        np.testing.assert_array_equal(HashingBackend("ignored").encode(texts[0]), first[0])
+
+    def test_shared_words_score_higher(self):
+        """Test texts sharing words are closer than unrelated texts."""
+        vectors = HashingBackend("ignored").encode(
+            ["project launch plan", "plan the project launch", "pasta recipe"]
+        )
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2] + 0.3
+
+    def test_records_its_own_model_name(self):
+        """Test the manifest names the encoder, not the configured model."""
+        backend = HashingBackend("sentence-transformers/all-MiniLM-L6-v2", dimension=64)
+
+        assert backend.info() == {"backend": "hash", "model": "hashed-ngrams-64", "dimension": 64}
+        assert np.linalg.norm(backend.encode("")) > 0
+
+    async def test_reindex_and_search_offline(self, roam, monkeypatch):
+        """Test the real indexing and search paths end to end without a model."""
+        monkeypatch.setattr("app.services.search._query_batcher", None)
+        monkeypatch.setattr("app.services.search._query_cache", None)
+        monkeypatch.setattr("app.services.search._result_cache", None)
+        monkeypatch.setattr("app.services.search._single_flight", None)
+        topics = ["marketing budget", "garden tomatoes", "database migration", "holiday travel"]
+        roam.blocks = [[f"uid-{i}", f"Notes on {topics[i % 4]} item {i}", 1000 + i] for i in range(40)]
+
+        result = await indexing.reindex_brain("ideas")
+        results = await search(SearchRequest(query="database migration", brain="ideas", top_k=5))
+
+        assert result["embedding_backend"] == "hash"
+        assert len(results) == 5
+        assert all("database migration" in r.content for r in results)
+
+@pytest.mark.unit
+class TestBatching:
+    def test_plan_batches_by_padded_tokens(self):
+        """Test batches hold texts of similar length within the padded token budget."""
+        counts = np.array([5, 200, 6, 40, 5, 190, 7, 5])
+
+        batches = plan_batches(counts, max_tokens=400, max_size=3)
+
+        assert [batch.tolist() for batch in batches] == [[1, 5], [3, 6, 2], [0, 4, 7]]
+        for batch in batches:
+            assert len(batch) * counts[batch].max() <= 400
+
+    def test_plan_batches_admits_oversized_text(self):
+        """Test a text longer than the budget still gets a batch of its own."""
+        batches = plan_batches(np.array([900, 3]), max_tokens=512, max_size=8)
+
+        assert [batch.tolist() for batch in batches] == [[0], [1]]
+
+    async def test_create_embeddings_keeps_input_order(self, tmp_path, counting_backend, monkeypatch):
+        """Test length-sorted batches are written back in input order."""
+        batches = counting_backend.batches
+        counted_in = counting_backend.token_threads
+        monkeypatch.setattr("app.services.embedding_store.EMBEDDING_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(indexing, "plan_batches", lambda counts: plan_batches(counts, max_tokens=12))
+        texts = ["short", "a much longer block of text about the launch plan", "tiny", "short", "mid sized note"]
+        blocks = [{"uid": str(i), "content": text} for i, text in enumerate(texts)]
+
+        vectors, metadata = await indexing.create_embeddings(blocks, "ideas")
+
+        assert [metadata_row["uid"] for metadata_row in metadata] == ["0", "1", "2", "3", "4"]
+        assert batches[0] == (["a much longer block of text about the launch plan"], 1)
+        # Tokenizing happens on the index pool, not the event loop's thread
+        assert counted_in and threading.main_thread() not in counted_in
+        assert sorted(text for batch, _ in batches for text in batch) == sorted(set(texts))
+        expected = HashingBackend("ignored").encode(texts)
+        np.testing.assert_allclose(vectors, expected / np.linalg.norm(expected, axis=1, keepdims=True), atol=1e-6)
+
+@pytest.mark.unit
+class TestCompatibility:
+    def test_matching_or_unrecorded_index_accepted(self, stub_backend):
+        """Test indexes from the same model, or without a record, are searchable."""
+        check_compatible("ideas", None)
+        check_compatible("ideas", {"backend": "torch", "model": "stub-model", "dimension": 4})
+
+    @pytest.mark.parametrize("recorded", [
+        {"backend": "torch", "model": "other-model", "dimension": 4},
+        {"backend": "torch", "model": "stub-model", "dimension": 768},
+    ])
+    def test_mismatched_index_refused(self, stub_backend, recorded):
+        """Test a different model or dimension is refused with a reindex hint."""
+        with pytest.raises(EmbeddingMismatchError, match="Reindex ideas"):
+            check_compatible("ideas", recorded)
+
+    def test_search_vectors_refuses_mismatched_index(self, stub_backend):
+        """Test searching an index built with another model fails before FAISS runs."""
+        index = faiss.IndexFlatIP(4)
+        index.add(np.eye(4, dtype="float32"))
+        params = {"type": "flat", "embedding": {"backend": "torch", "model": "other-model", "dimension": 4}}
+        loaded = LoadedBrain("ideas", index, [{"uid": str(i)} for i in range(4)], (), params)
+
+        with pytest.raises(EmbeddingMismatchError):
+            search_vectors(loaded, np.eye(4, dtype="float32")[:1], 2)
+
+        loaded.params["embedding"]["model"] = "stub-model"
+        D, I = search_vectors(loaded, np.eye(4, dtype="float32")[:1], 2)
+        assert I[0][0] == 0
@@ -0,0 +1,36 @@
+"""Test worker pools."""
+
+import asyncio
+import threading
+import time
+import pytest
+from app.services.executors import run_query, run_index, get_executor
+
+@pytest.mark.unit
+class TestExecutors:
+    async def test_work_runs_in_named_pools(self):
+        """Test query and index work land on their own threads."""
+        query_thread = await run_query(lambda: threading.current_thread().name)
+        index_thread = await run_index(lambda: threading.current_thread().name)
+
+        assert query_thread.startswith("query-worker")
+        assert index_thread.startswith("index-worker")
+
+    async def test_event_loop_stays_responsive(self):
+        """Test blocking work does not stall other coroutines."""
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(run_index(time.sleep, 0.2), ticker())
+
+        assert len(ticks) == 5
+        assert ticks[-1] - ticks[0] < 0.2
+
+    def test_invalid_pool(self):
+        """Test unknown pool names are rejected."""
+        with pytest.raises(ValueError):
+            get_executor("gpu")
@@ -0,0 +1,147 @@
+"""Test versioned index generations."""
+
+import os
+import pytest
+from fastapi import HTTPException
+from app.config import current_generation, get_filenames
+from app.routes.admin import rollback_brain
+from app.services import indexing
+from app.services.generations import (
+    create_generation,
+    list_generations,
+    prune_generations,
+    publish_generation,
+    rollback,
+    verify_generation,
+    write_manifest
+)
+from app.services.registry import BrainRegistry
+
+PARAMS = {"type": "flat", "rows": 1, "dimension": 4}
+
+def build(brain: str = "ideas", content: bytes = b"index") -> str:
+    """Write a minimal complete generation and return its id."""
+    generation, files = create_generation(brain)
+    for key in ("index", "meta"):
+        with open(files[key], "wb") as f:
+            f.write(content)
+    write_manifest(brain, generation, files, PARAMS, 1.5)
+    return generation
+
+@pytest.mark.unit
+class TestGenerations:
+    def test_publish_swaps_pointer(self, data_dir):
+        """Test files resolve to the published generation, legacy paths before that."""
+        assert get_filenames("ideas")["index"] == f"{data_dir}/index_ideas.faiss"
+        generation = build()
+
+        assert current_generation("ideas") is None
+        publish_generation("ideas", generation)
+
+        assert current_generation("ideas") == generation
+        assert get_filenames("ideas")["index"] == f"{data_dir}/brains/ideas/{generation}/index.faiss"
+        manifest = list_generations("ideas")[0]
+        assert manifest["current"] is True
+        assert manifest["rows"] == 1
+        assert set(manifest["files"]) == {"index", "meta"}
+
+    def test_incomplete_generation_not_published(self, data_dir):
+        """Test a build without a manifest cannot be published."""
+        generation, _ = create_generation("ideas")
+
+        with pytest.raises(FileNotFoundError):
+            publish_generation("ideas", generation)
+        assert current_generation("ideas") is None
+
+    def test_prune_keeps_newest_and_current(self, data_dir):
+        """Test pruning keeps the newest complete generations and the published one."""
+        ids = [build() for _ in range(4)]
+        publish_generation("ideas", ids[0], keep=4)
+        crashed, _ = create_generation("ideas")
+        os.rename(f"{data_dir}/brains/ideas/{crashed}", f"{data_dir}/brains/ideas/00000000-crashed")
+
+        deleted = prune_generations("ideas", keep=2)
+
+        assert sorted(deleted) == ["00000000-crashed", ids[1]]
+        assert [entry["generation"] for entry in list_generations("ideas")] == [ids[3], ids[2], ids[0]]
+
+    def test_rollback(self, data_dir):
+        """Test rollback republishes the previous generation, or a named one."""
+        first, second, third = build(), build(), build()
+        publish_generation("ideas", third)
+
+        assert rollback("ideas") == second
+        assert current_generation("ideas") == second
+        assert rollback("ideas", third) == third
+
+        with pytest.raises(FileNotFoundError):
+            rollback("ideas", "../../etc")
+        rollback("ideas", first)
+        with pytest.raises(FileNotFoundError, match="No earlier generation"):
+            rollback("ideas")
+
+    def test_rollback_refuses_corrupt_generation(self, data_dir):
+        """Test a generation whose files fail their checksums is not republished."""
+        first, second = build(), build()
+        publish_generation("ideas", second)
+        with open(f"{data_dir}/brains/ideas/{first}/index.faiss", "ab") as f:
+            f.write(b"torn")
+
+        with pytest.raises(ValueError, match="checksum"):
+            rollback("ideas")
+        assert current_generation("ideas") == second
+
+    async def test_rollback_route(self, data_dir):
+        """Test the admin route maps missing generations to 404."""
+        build()
+        publish_generation("ideas", build())
+
+        response = await rollback_brain("ideas", None, True)
+        assert response["generation"] == list_generations("ideas")[1]["generation"]
+        with pytest.raises(HTTPException) as exc_info:
+            await rollback_brain("ideas", "missing", True)
+        assert exc_info.value.status_code == 404
+
+@pytest.mark.unit
+class TestReindexPublication:
+    async def test_reader_keeps_its_generation(self, roam):
+        """Test a reader holding the old paths sees a complete old build after a reindex."""
+        first = await indexing.reindex_brain("ideas")
+        old_files = get_filenames("ideas")
+        roam.blocks.append(["uid-new", "Brand new block", 5000])
+
+        second = await indexing.reindex_brain("ideas")
+
+        assert second["generation"] != first["generation"]
+        assert current_generation("ideas") == second["generation"]
+        old = BrainRegistry().get("ideas", old_files)
+        new = BrainRegistry().get("ideas", get_filenames("ideas"))
+        assert (len(old.metadata), old.index.ntotal) == (6, 6)
+        assert (len(new.metadata), new.index.ntotal) == (7, 7)
+        manifest = list_generations("ideas")[0]
+        assert manifest["embedding"]["backend"] == "hash"
+        assert manifest["files"]["vectors"]["bytes"] == os.path.getsize(get_filenames("ideas")["vectors"])
+
+        # Array directories are checksummed file by file
+        lexical = get_filenames("ideas")["lexical"]
+        assert manifest["files"]["lexical"]["bytes"] == sum(
+            os.path.getsize(os.path.join(lexical, name)) for name in os.listdir(lexical)
+        )
+        with open(os.path.join(lexical, "tfs.npy"), "ab") as f:
+            f.write(b"torn")
+        with pytest.raises(ValueError, match="lexical checksum"):
+            verify_generation("ideas", second["generation"])
+
+    async def test_failed_build_leaves_published_generation(self, data_dir, roam, monkeypatch):
+        """Test a build failing midway is discarded and searches keep the old one."""
+        first = await indexing.reindex_brain("ideas")
+        roam.blocks.append(["uid-new", "Brand new block", 5000])
+
+        def broken_save(*args):
+            raise OSError("disk full")
+        monkeypatch.setattr(indexing, "save_brain_files", broken_save)
+        with pytest.raises(OSError):
+            await indexing.reindex_brain("ideas")
+
+        assert current_generation("ideas") == first["generation"]
+        assert sorted(os.listdir(f"{data_dir}/brains/ideas")) == sorted(["CURRENT", first["generation"]])
@@ -0,0 +1,162 @@
+"""Test background reindex jobs."""
+
+import asyncio
+import fcntl
+import pytest
+from fastapi import HTTPException
+from app.routes.reindex import reindex_endpoint, reindex_job_status
+from app.services import jobs
+from app.services.indexing import ReindexError
+from app.services.jobs import ReindexJob, ReindexJobs
+
+@pytest.fixture
+def tracker(data_dir, monkeypatch):
+    """Give each test its own job tracker, locking brains under data_dir."""
+    tracker = ReindexJobs(keep=2)
+    monkeypatch.setattr(jobs, "_jobs", tracker)
+    return tracker
+
+@pytest.fixture
+def gated_reindex(monkeypatch):
+    """Replace reindex_brains() with one that waits for a gate to open."""
+    gate = asyncio.Event()
+    calls = []
+
+    async def reindex(brains, full=False, progress=None):
+        calls.append((brains, full))
+        progress("fetch", 0, 0)
+        await gate.wait()
+        results = {brain: {"status": "success", "blocks_processed": 3} for brain in brains if brain != "broken"}
+        if "broken" in brains:
+            raise ReindexError(results, {"broken": ValueError("No blocks found under TOC - broken")})
+        return results
+    monkeypatch.setattr(jobs, "reindex_brains", reindex)
+    return gate, calls
+
+@pytest.mark.unit
+class TestReindexJobs:
+    async def test_duplicate_requests_attach(self, tracker, gated_reindex):
+        """Test requests covered by a running job join it instead of starting another."""
+        gate, calls = gated_reindex
+        job = tracker.submit()
+        await asyncio.sleep(0)
+
+        assert tracker.submit(["ideas"]) is job
+        assert tracker.submit() is job
+        assert job.attached == 2
+        assert job.to_dict()["status"] == "running"
+        assert job.to_dict()["phase"] == "fetch"
+
+        # Incremental jobs do not cover a full reindex
+        full = tracker.submit(["ideas"], full=True)
+        assert full is not job
+        await asyncio.sleep(0)
+        assert full.state == "queued" and full.started_at is None
+
+        gate.set()
+        await asyncio.gather(job.task, full.task)
+        assert job.state == full.state == "succeeded"
+        assert set(job.results) == {"ideas", "marketing"}
+        assert calls == [(["ideas", "marketing"], False), (["ideas"], True)]
+        assert tracker.submit(["ideas"]) is not job
+
+    async def test_failed_job(self, tracker, gated_reindex, monkeypatch):
+        """Test a failing brain marks the job failed and keeps the other brains' results."""
+        gate, _ = gated_reindex
+        monkeypatch.setattr(jobs, "BRAINS", ["ideas", "broken"])
+        gate.set()
+
+        job = tracker.submit(["ideas", "broken"])
+        await job.task
+
+        assert job.state == "failed"
+        assert job.error == "broken: No blocks found under TOC - broken"
+        assert job.errors == {"broken": "No blocks found under TOC - broken"}
+        assert job.results == {"ideas": {"status": "success", "blocks_processed": 3}}
+        assert job.finished_at is not None
+        with pytest.raises(ValueError):
+            tracker.submit(["unknown"])
+
+    async def test_waits_for_builds_in_other_processes(self, tracker, gated_reindex, data_dir, monkeypatch):
+        """Test a job stays queued while another process holds a brain's build lock."""
+        gate, calls = gated_reindex
+        gate.set()
+        monkeypatch.setattr("app.services.generations.BUILD_LOCK_POLL_SECONDS", 0.01)
+        (data_dir / "brains" / "ideas").mkdir(parents=True)
+        with open(data_dir / "brains" / "ideas" / ".build.lock", "ab") as other:
+            fcntl.flock(other, fcntl.LOCK_EX)
+            job = tracker.submit(["ideas"])
+            await asyncio.sleep(0.05)
+            assert job.state == "queued" and calls == []
+            fcntl.flock(other, fcntl.LOCK_UN)
+
+        await job.task
+        assert job.state == "succeeded"
+        assert calls == [(["ideas"], False)]
+
+    async def test_keeps_recent_finished_jobs(self, tracker, gated_reindex):
+        """Test only the newest finished jobs are kept."""
+        gate, _ = gated_reindex
+        gate.set()
+        finished = []
+        for _ in range(3):
+            job = tracker.submit(["ideas"])
+            await job.task
+            finished.append(job)
+
+        assert tracker.list() == [finished[2], finished[1]]
+        with pytest.raises(KeyError):
+            tracker.get(finished[0].id)
+
+    def test_progress_estimates(self, monkeypatch):
+        """Test throughput and ETA are measured from the first report of a phase."""
+        clock = iter([100.0, 104.0, 104.0, 104.0])
+        monkeypatch.setattr(jobs.time, "perf_counter", lambda: next(clock))
+        job = ReindexJob(["ideas"])
+        job.state = "running"
+
+        job.report("embed", 200, 1000)  # cache hits arrive at once
+        job.report("embed", 400, 1000)
+
+        assert job.throughput == 50.0
+        assert job.eta_seconds == 12.0
+
+    async def test_reports_real_reindex_phases(self, tracker, roam, monkeypatch):
+        """Test a job reports every phase of a real reindex and ends with all blocks done."""
+        roam.blocks = [[f"uid-{i}", f"Block number {i}", 1000 + i] for i in range(40)]
+        phases = []
+        report = ReindexJob.report
+        def record(job, phase, done=0, total=0):
+            phases.append((phase, done, total))
+            report(job, phase, done, total)
+        monkeypatch.setattr(ReindexJob, "report", record)
+
+        job = tracker.submit(["ideas"])
+        await job.task
+
+        assert job.state == "succeeded"
+        assert job.results["ideas"]["blocks_processed"] == 40
+        # Stages overlap, but the reported phase only moves forward
+        order = [phase for i, (phase, _, _) in enumerate(phases) if i == 0 or phases[i - 1][0] != phase]
+        assert order == ["fetch", "references", "embed", "build", "publish"]
+        assert [(done, total) for phase, done, total in phases if phase == "embed"][-1] == (40, 40)
+        assert all(done <= total for _, done, total in phases)
+
+@pytest.mark.unit
+class TestReindexRoutes:
+    async def test_start_and_poll(self, tracker, gated_reindex):
+        """Test the endpoint returns a job at once and the status route finds it."""
+        gate, _ = gated_reindex
+        started = await reindex_endpoint(brain="ideas", full=False, auth=True)
+
+        assert started.status == "queued"
+        assert started.brains == ["ideas"]
+        status = await reindex_job_status(started.job_id, auth=True)
+        assert status.job_id == started.job_id
+
+        gate.set()
+        await tracker.get(started.job_id).task
+        assert (await reindex_job_status(started.job_id, auth=True)).status == "succeeded"
+        with pytest.raises(HTTPException) as exc_info:
+            await reindex_job_status("missing", auth=True)
+        assert exc_info.value.status_code == 404
@@ -0,0 +1,53 @@
+"""Test BM25 lexical index."""
+
+import pytest
+import numpy as np
+from app.services.lexical import LexicalIndex, tokenize
+
+TEXTS = [
+    "Weekly sync with [[Dana Whitfield]] about the launch",
+    "#marketing ideas for the spring launch campaign",
+    "Grocery list: eggs, flour, sugar",
+    "Follow-up on #marketing budget with finance",
+]
+
+@pytest.mark.unit
+class TestLexicalIndex:
+    def test_tokenize_roam_markup(self):
+        """Test page links and tags reduce to their words."""
+        assert tokenize("Met [[Dana Whitfield]] re #Follow-up") == ["met", "dana", "whitfield", "re", "follow-up"]
+
+    def test_exact_terms_rank_first(self):
+        """Test blocks containing rare query terms outrank the rest."""
+        index = LexicalIndex.build(TEXTS)
+
+        scores, ids = index.search("marketing budget", 10)
+
+        assert ids.tolist()[0] == 3
+        assert set(ids.tolist()) == {1, 3}
+        assert scores[0] > scores[1] > 0
+
+    def test_mask_excludes_rows(self):
+        """Test masked-out rows are never returned."""
+        mask = np.array([True, False, True, True])
+        scores, ids = LexicalIndex.build(TEXTS).search("marketing launch", 10, mask)
+
+        assert 1 not in ids.tolist()
+        assert set(ids.tolist()) == {0, 3}
+
+    def test_no_matching_terms(self):
+        """Test unknown terms return no hits."""
+        scores, ids = LexicalIndex.build(TEXTS).search("zeppelin", 5)
+        assert len(ids) == 0 and len(scores) == 0
+
+    def test_save_and_load(self, tmp_path):
+        """Test a saved index answers queries identically after loading."""
+        index = LexicalIndex.build(TEXTS)
+        path = str(tmp_path / "lexical")
+        index.save(path)
+
+        loaded = LexicalIndex.load(path)
+        assert len(loaded) == len(TEXTS)
+        # Postings are mapped from their .npy files, not read into the heap
+        assert isinstance(loaded.doc_ids, np.memmap) and isinstance(loaded.tfs, np.memmap)
+        assert loaded.search("launch", 5)[1].tolist() == index.search("launch", 5)[1].tolist()
@@ -0,0 +1,47 @@
+"""Test metadata store."""
+
+import json
+import pytest
+from app.services.metadata_store import (
+    MetadataStore,
+    write_metadata_store,
+    open_metadata,
+    convert_json_metadata
+)
+
+ROWS = [
+    {"uid": "a1", "content": "Plain block", "brain": "ideas"},
+    {"uid": "b2", "content": "Ünïcode — and [[links]] #tag", "brain": "ideas"},
+    {"uid": "c3", "content": "", "brain": "ideas"},
+]
+
+@pytest.mark.unit
+class TestMetadataStore:
+    def test_round_trip_random_access(self, tmp_path):
+        """Test rows are read back individually and without the brain key."""
+        path = str(tmp_path / "metadata.bin")
+        assert write_metadata_store(path, ROWS) == 3
+
+        store = MetadataStore(path)
+        assert len(store) == 3
+        assert store[1] == {"uid": "b2", "content": "Ünïcode — and [[links]] #tag"}
+        assert [row["uid"] for row in store.get_many([2, 0])] == ["c3", "a1"]
+        with pytest.raises(IndexError):
+            store[3]
+
+    def test_convert_legacy_json(self, tmp_path):
+        """Test legacy JSON metadata converts to an equivalent store."""
+        json_path = tmp_path / "metadata.json"
+        json_path.write_text(json.dumps(ROWS))
+        store_path = str(tmp_path / "metadata.bin")
+
+        assert convert_json_metadata(str(json_path), store_path) == 3
+        assert open_metadata(store_path)[0]["content"] == "Plain block"
+        assert open_metadata(str(json_path)) == ROWS
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test arbitrary files are not mistaken for a store."""
+        path = tmp_path / "metadata.bin"
+        path.write_bytes(b"not a metadata store at all")
+        with pytest.raises(ValueError):
+            MetadataStore(str(path))
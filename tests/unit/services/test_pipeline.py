@@ -0,0 +1,128 @@
+"""Test the streaming reindex pipeline."""
+
+import asyncio
+import pytest
+import numpy as np
+from app.config import get_filenames
+from app.services import indexing
+from app.services.attributes import BlockAttributes
+from app.services.embeddings import HashingBackend
+from app.services.pipeline import Pipeline, StageQueue
+
+@pytest.mark.unit
+class TestStageQueue:
+    async def test_put_waits_for_room(self):
+        """Test a producer is held back once the queue reaches its byte budget."""
+        queue = StageQueue("test", max_bytes=100)
+        await queue.put("a", 60)
+        blocked = asyncio.ensure_future(queue.put("b", 60))
+        await asyncio.sleep(0)
+        assert not blocked.done()
+
+        assert await queue.get() == "a"
+        await blocked
+        assert await queue.get() == "b"
+        assert queue.stats()["peak_bytes"] == 60
+        assert queue.stats()["producer_wait_seconds"] >= 0
+
+    async def test_oversized_item_and_close(self):
+        """Test an item over budget passes an empty queue, and get() ends after close()."""
+        queue = StageQueue("test", max_bytes=10)
+        await queue.put("big", 50)
+        await queue.close()
+
+        assert await queue.get() == "big"
+        assert await queue.get() is None
+
+    async def test_failing_stage_cancels_the_rest(self):
+        """Test a stage failure is raised instead of leaving consumers waiting."""
+        pipeline = Pipeline(100, {"items": 1.0})
+        async def consumer():
+            while await pipeline.queues["items"].get() is not None:
+                pass
+        async def producer():
+            await pipeline.queues["items"].put(1, 1)
+            raise RuntimeError("fetch failed")
+
+        with pytest.raises(RuntimeError, match="fetch failed"):
+            await asyncio.wait_for(pipeline.run(producer(), consumer()), timeout=1)
+
+@pytest.mark.unit
+class TestStreamingReindex:
+    async def test_pages_stream_through_stages(self, data_dir, roam, counting_backend, monkeypatch):
+        """Test embedding starts before fetching ends and the build matches the blocks."""
+        monkeypatch.setattr(indexing, "REINDEX_PAGE_SIZE", 4)
+        monkeypatch.setattr(indexing, "REINDEX_PIPELINE_MAX_BYTES", 4096)
+        events = counting_backend.events = roam.events
+
+        toc = roam.blocks = [[f"toc-{i}", f"Topic {i}", 1000 + i] for i in range(12)]
+        roam.refs = {f"toc-{i}": [[f"ref-toc-{i}", f"Mentions toc-{i}", 2000]] for i in range(12)}
+        # ref-shared references a TOC block on every page
+        for i in (0, 4, 8):
+            roam.refs[f"toc-{i}"].append(["ref-shared", "Mentions several topics", 3000])
+        roam.delay = 0.01
+
+        result = (await indexing.reindex_brains(["ideas"]))["ideas"]
+
+        assert events.count("references") == 3
+        assert events.index("encode") < len(events) - 1 - events[::-1].index("references")
+        assert result["blocks_processed"] == 12 + 12 + 1
+        stats = result["pipeline"]
+        assert set(stats["stages"]) == {"fetch", "prepare", "embed", "write"}
+        assert stats["stages"]["write"]["blocks"] == 25
+        assert all(queue["depth"] == 0 for queue in stats["queues"].values())
+
+        files = get_filenames("ideas")
+        vectors = np.load(files["vectors"])
+        # TOC blocks, then references in page order; ref-shared first appears with toc-0
+        texts = [block[1] for block in toc] + ["Mentions toc-0", "Mentions several topics"]
+        texts += [f"Mentions toc-{i}" for i in range(1, 12)]
+        expected = HashingBackend("ignored").encode(texts)
+        np.testing.assert_allclose(vectors, expected / np.linalg.norm(expected, axis=1, keepdims=True), atol=1e-6)
+        attributes = BlockAttributes.load(files["attrs"])
+        for target in ("toc-0", "toc-4", "toc-8"):
+            assert attributes.mask(references=[target])[13]
+        assert not list((data_dir / "brains" / "ideas" / result["generation"]).glob("*.spill"))
+
+    async def test_unchanged_brain_copies_no_vectors(self, roam, monkeypatch):
+        """Test reused vectors are only copied once a brain needs a new build."""
+        await indexing.reindex_brain("ideas")
+        first_vectors = np.load(get_filenames("ideas")["vectors"])
+        copies = []
+        copy_reused = indexing._BrainBuild.copy_reused
+        def record(build):
+            copies.append(len(build.reuse_rows))
+            copy_reused(build)
+        monkeypatch.setattr(indexing._BrainBuild, "copy_reused", record)
+
+        await indexing.reindex_brain("ideas")
+        assert copies == []
+
+        roam.blocks.append(["uid-new", "Brand new block", 5000])
+        await indexing.reindex_brain("ideas")
+        assert copies == [6]
+        np.testing.assert_array_equal(np.load(get_filenames("ideas")["vectors"])[:6], first_vectors)
+
+    def test_spill_writes_runs_of_rows(self, tmp_path):
+        """Test out-of-order rows land in place with one write per consecutive run."""
+        build = indexing._BrainBuild("ideas", "g", {"vectors": str(tmp_path / "vectors.npy")}, 2, None, None, None)
+        writes = []
+        class CountingFile:
+            def __init__(self, f):
+                self.f = f
+            def __getattr__(self, name):
+                return getattr(self.f, name)
+            def write(self, data):
+                writes.append(len(data))
+                return self.f.write(data)
+        build._spill = CountingFile(build._spill)
+        vectors = np.arange(12, dtype="float32").reshape(6, 2)
+
+        build.write([3, 1, 2], vectors[[3, 1, 2]])
+        build.write([5, 0, 4], vectors[[5, 0, 4]])
+        build.blocks = [{}] * 6
+        build._spill.flush()
+
+        assert writes == [3 * 8, 8, 2 * 8]
+        np.testing.assert_array_equal(build.vectors(), vectors)
+        build.close()
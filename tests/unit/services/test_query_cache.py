@@ -0,0 +1,106 @@
+"""Test query embedding and search result caches."""
+
+import pytest
+import numpy as np
+from app.services.query_cache import (
+    QueryEmbeddingCache,
+    SearchResultCache,
+    normalize_query,
+    ENTRY_OVERHEAD_BYTES
+)
+
+def vector(value: float) -> np.ndarray:
+    """Create a small test embedding."""
+    return np.full(4, value, dtype="float32")
+
+ENTRY_BYTES = 16 + 1 + ENTRY_OVERHEAD_BYTES  # 4 float32s plus a one-letter key
+
+@pytest.mark.unit
+class TestQueryEmbeddingCache:
+    def test_normalize_query(self):
+        """Test case and whitespace variants share a key."""
+        assert normalize_query("  Launch   Plan\n") == normalize_query("launch plan") == "launch plan"
+
+    def test_hits_misses_and_read_only_vectors(self):
+        """Test cached vectors are returned read-only and counted as hits."""
+        cache = QueryEmbeddingCache(max_bytes=10 * ENTRY_BYTES, ttl_seconds=0)
+        assert cache.get("a") is None
+        cache.put("a", vector(1.0))
+
+        cached = cache.get("a")
+        assert cached.tolist() == [1.0] * 4
+        with pytest.raises(ValueError):
+            cached[0] = 2.0
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+    def test_evicts_least_recently_used_within_budget(self):
+        """Test the byte budget evicts the least recently used entry."""
+        cache = QueryEmbeddingCache(max_bytes=2 * ENTRY_BYTES, ttl_seconds=0)
+        cache.put("a", vector(1.0))
+        cache.put("b", vector(2.0))
+        cache.get("a")
+        cache.put("c", vector(3.0))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+        assert cache.bytes <= cache.max_bytes
+
+    def test_ttl_expiry(self, monkeypatch):
+        """Test entries older than the TTL are dropped on lookup."""
+        now = [100.0]
+        monkeypatch.setattr("app.services.query_cache.time.monotonic", lambda: now[0])
+        cache = QueryEmbeddingCache(max_bytes=10 * ENTRY_BYTES, ttl_seconds=60)
+        cache.put("a", vector(1.0))
+
+        now[0] += 61
+        assert cache.get("a") is None
+        assert cache.stats()["expirations"] == 1
+        assert len(cache) == 0
+
+    def test_inspect_and_clear(self):
+        """Test recent keys are listed newest first and clear() empties the cache."""
+        cache = QueryEmbeddingCache(max_bytes=10 * ENTRY_BYTES, ttl_seconds=0)
+        cache.put("a", vector(1.0))
+        cache.put("b", vector(2.0))
+
+        assert [entry["key"] for entry in cache.stats(entries=5)["recent"]] == ["b", "a"]
+        assert cache.clear() == 2
+        assert cache.stats()["bytes"] == 0
+
+    def test_disabled_cache(self):
+        """Test a zero budget stores nothing."""
+        cache = QueryEmbeddingCache(max_bytes=0, ttl_seconds=0)
+        cache.put("a", vector(1.0))
+        assert cache.get("a") is None
+
+@pytest.mark.unit
+class TestSearchResultCache:
+    def test_key_normalizes_query_and_filters(self):
+        """Test equivalent requests share a key and different ones do not."""
+        key = SearchResultCache.make_key("ideas", "Launch  Plan", 5, "semantic", {"tags": ["x"], "block_type": "block"})
+        assert key == SearchResultCache.make_key("ideas", "launch plan", 5, "semantic", {"block_type": "block", "tags": ["x"]})
+        assert key != SearchResultCache.make_key("ideas", "launch plan", 5, "hybrid", {"block_type": "block", "tags": ["x"]})
+        assert key != SearchResultCache.make_key("ideas", "launch plan", 5, "semantic", None)
+
+    def test_generation_change_is_a_miss(self):
+        """Test results cached for an older index generation are not served."""
+        cache = SearchResultCache(max_bytes=1024 * 1024, ttl_seconds=0)
+        key = SearchResultCache.make_key("ideas", "launch", 5, "semantic", None)
+        rows = [{"content": "Launch plan", "score": 0.9, "brain": "ideas", "metadata": {"uid": "a1"}}]
+        cache.put(key, ("gen", 1), rows)
+
+        assert cache.get(key, ("gen", 1)) == rows
+        assert cache.get(key, ("gen", 2)) is None
+        assert len(cache) == 0
+        assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+    def test_invalidate_brain(self):
+        """Test invalidating a brain keeps other brains' entries."""
+        cache = SearchResultCache(max_bytes=1024 * 1024, ttl_seconds=0)
+        for brain in ("ideas", "marketing"):
+            cache.put(SearchResultCache.make_key(brain, "q", 5, "semantic", None), 1, [])
+
+        assert cache.invalidate("ideas") == 1
+        assert cache.get(SearchResultCache.make_key("marketing", "q", 5, "semantic", None), 1) == []
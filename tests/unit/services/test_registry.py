@@ -0,0 +1,58 @@
+"""Test brain registry."""
+
+import json
+import pytest
+import faiss
+import numpy as np
+from app.services.registry import BrainRegistry
+
+def write_brain(tmp_path, rows: int) -> dict:
+    """Write a small index and metadata file pair."""
+    index = faiss.IndexFlatIP(8)
+    index.add(np.random.random((rows, 8)).astype('float32'))
+    files = {
+        "index": str(tmp_path / "index_ideas.faiss"),
+        "meta": str(tmp_path / "metadata_ideas.json")
+    }
+    faiss.write_index(index, files["index"])
+    with open(files["meta"], "w") as f:
+        json.dump([{"uid": str(i), "content": f"block {i}"} for i in range(rows)], f)
+    return files
+
+@pytest.mark.unit
+class TestBrainRegistry:
+    def test_loads_once_and_serves_from_memory(self, tmp_path):
+        """Test repeated lookups reuse the resident brain."""
+        files = write_brain(tmp_path, 5)
+        registry = BrainRegistry()
+
+        first = registry.get("ideas", files)
+        second = registry.get("ideas", files)
+
+        assert first is second
+        assert len(first.metadata) == 5
+        assert registry.misses == 1
+        assert registry.hits == 1
+        assert registry.reloads == 0
+
+    def test_reloads_when_files_change(self, tmp_path):
+        """Test a rewritten index is picked up on the next lookup."""
+        files = write_brain(tmp_path, 5)
+        registry = BrainRegistry()
+        registry.get("ideas", files)
+
+        write_brain(tmp_path, 7)
+        reloaded = registry.get("ideas", files)
+
+        assert reloaded.index.ntotal == 7
+        assert registry.reloads == 1
+
+    def test_invalidate_and_stats(self, tmp_path):
+        """Test invalidation drops resident brains from the stats."""
+        files = write_brain(tmp_path, 3)
+        registry = BrainRegistry()
+        registry.get("ideas", files)
+
+        assert registry.stats()["brains"]["ideas"]["rows"] == 3
+        registry.invalidate("ideas")
+        assert registry.stats()["brains"] == {}
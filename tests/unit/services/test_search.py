@@ -2,11 +2,36 @@
 
 import pytest
 import os
+import json
 import numpy as np
-from app.services.search import search, normalize_score
-from app.models.api import SearchRequest, SearchResult, SearchResponse
+from app.services.search import search, search_batch, search_multi, normalize_score, reciprocal_rank_fusion
+from app.models.api import SearchRequest, SearchResult, SearchResponse, BatchSearchRequest, MultiSearchRequest
 from app.config import get_filenames
 
+@pytest.fixture
+def write_brain(tmp_path, monkeypatch):
+    """
+    Point search at small flat indexes written on demand.
+
+    write_brain(brain, rows, uid) indexes the given rows of a 4x4 identity
+    matrix, with metadata uids formatted from uid, and returns the paths.
+    """
+    import faiss
+    vectors = np.eye(4, dtype='float32')
+    brain_files = {}
+    def write(brain="ideas", rows=range(4), uid="uid-{row}"):
+        rows = list(rows)
+        files = {"index": str(tmp_path / f"index_{brain}.faiss"), "meta": str(tmp_path / f"meta_{brain}.json")}
+        index = faiss.IndexFlatIP(4)
+        index.add(vectors[rows])
+        faiss.write_index(index, files["index"])
+        with open(files["meta"], "w") as f:
+            json.dump([{"uid": uid.format(brain=brain, row=row), "content": f"block {row}"} for row in rows], f)
+        brain_files[brain] = files
+        return files
+    monkeypatch.setattr("app.services.search.get_filenames", lambda brain: brain_files[brain])
+    return write
+
 @pytest.mark.unit
 class TestSearchService:
     async def test_search_valid_query(self, test_index, test_metadata, monkeypatch):
@@ -115,6 +140,148 @@ class TestSearchService:
             await search(request)
         assert "Search failed" in str(exc.value)
 
+    async def test_search_batch(self, write_brain, monkeypatch):
+        """Test batch search runs every query with its own top_k."""
+        vectors = np.eye(4, dtype='float32')
+        write_brain()
+
+        queries = {"first": vectors[0], "third": vectors[2]}
+        calls = []
+        def encode(texts):
+            calls.append(list(texts))
+            return np.stack([queries[t] for t in texts])
+        monkeypatch.setattr("app.services.search._encode_query_batch", encode)
+        monkeypatch.setattr("app.services.search._query_cache", None)
+
+        request = BatchSearchRequest(
+            brain="ideas",
+            top_k=3,
+            queries=[{"query": "first"}, {"query": "third", "top_k": 1}]
+        )
+        results = await search_batch(request)
+
+        assert [len(r) for r in results] == [3, 1]
+        assert results[0][0].metadata == {"uid": "uid-0"}
+        assert results[1][0].metadata == {"uid": "uid-2"}
+        assert results[1][0].score == 1.0
+
+        # Repeated queries are served from the embedding cache
+        request = BatchSearchRequest(brain="ideas", queries=[{"query": "Third"}, {"query": "first "}])
+        results = await search_batch(request)
+        assert calls == [["first", "third"]]
+        assert [r[0].metadata["uid"] for r in results] == ["uid-2", "uid-0"]
+
+        # The batch-wide top_k backs every query, so it cannot be null
+        with pytest.raises(ValueError, match="top_k"):
+            BatchSearchRequest(brain="ideas", top_k=None, queries=[{"query": "first"}])
+
+    async def test_queries_encoded_as_written(self, monkeypatch):
+        """Test the model sees the query's own casing while the cache key ignores it."""
+        from app.services.search import encode_query, encode_queries
+        calls = []
+        def encode(texts):
+            calls.append(list(texts))
+            return np.ones((len(texts), 4), dtype='float32')
+        monkeypatch.setattr("app.services.search._encode_query_batch", encode)
+        for name in ("_query_batcher", "_query_cache"):
+            monkeypatch.setattr(f"app.services.search.{name}", None)
+
+        await encode_queries([" NASA Launch ", "nasa  launch"])
+        await encode_query("Apple Pie", {})
+        await encode_query("apple pie", {})
+
+        assert calls == [["NASA Launch"], ["Apple Pie"]]
+
+    async def test_search_multi(self, write_brain, monkeypatch):
+        """Test multi-brain search encodes once and merges brains by score."""
+        write_brain("ideas", [0, 1], uid="{brain}-{row}")
+        marketing = write_brain("marketing", [2, 3], uid="{brain}-{row}")
+
+        calls = []
+        def encode(texts):
+            calls.append(texts)
+            return np.array([[1.0, 0.0, 0.9, 0.0]] * len(texts), dtype='float32')
+        monkeypatch.setattr("app.services.search._encode_query_batch", encode)
+        monkeypatch.setattr("app.services.search._query_batcher", None)
+        monkeypatch.setattr("app.services.search._query_cache", None)
+        monkeypatch.setattr("app.services.search._result_cache", None)
+
+        request = MultiSearchRequest(query="launch", top_k=2)
+        results, per_brain = await search_multi(request, ["ideas", "marketing"])
+
+        assert calls == [["launch"]]
+        assert [(r.brain, r.metadata["uid"]) for r in results] == [("ideas", "ideas-0"), ("marketing", "marketing-2")]
+        assert results[0].score > results[1].score
+        assert {brain: stats["count"] for brain, stats in per_brain.items()} == {"ideas": 2, "marketing": 2}
+        assert all(stats["latency_ms"] >= 0 and stats["error"] is None for stats in per_brain.values())
+
+        # An unindexed brain is reported without failing the whole search
+        for path in marketing.values():
+            os.remove(path)
+        results, per_brain = await search_multi(request, ["ideas", "marketing"])
+        assert calls == [["launch"]]  # second search reused the cached embedding
+        assert [r.brain for r in results] == ["ideas", "ideas"]
+        assert "Missing files" in per_brain["marketing"]["error"]
+
+    async def test_search_result_cache(self, write_brain, monkeypatch):
+        """Test repeated searches skip the model until the index is rewritten."""
+        vectors = np.eye(4, dtype='float32')
+        write_brain()
+
+        calls = []
+        def encode(texts):
+            calls.append(list(texts))
+            return np.stack([vectors[1]] * len(texts))
+        monkeypatch.setattr("app.services.search._encode_query_batch", encode)
+        monkeypatch.setattr("app.services.search._query_batcher", None)
+        monkeypatch.setattr("app.services.search._query_cache", None)
+        monkeypatch.setattr("app.services.search._result_cache", None)
+
+        first = await search(SearchRequest(query="second block", brain="ideas", top_k=2))
+        timings = {}
+        second = await search(SearchRequest(query="Second  Block", brain="ideas", top_k=2), timings=timings)
+
+        assert [r.metadata["uid"] for r in second] == [r.metadata["uid"] for r in first] == ["uid-1", "uid-0"]
+        assert "cached_ms" in timings and "encode_ms" not in timings
+
+        # A rewritten index is a new generation, so the cached results go stale
+        files = write_brain(rows=range(3))
+        os.utime(files["index"], ns=(1, 1))
+        timings = {}
+        await search(SearchRequest(query="second block", brain="ideas", top_k=2), timings=timings)
+        assert "cached_ms" not in timings and "semantic_ms" in timings
+        assert calls == [["second block"]]  # the embedding itself was still cached
+
+    async def test_identical_concurrent_searches_coalesce(self, write_brain, monkeypatch):
+        """Test identical in-flight searches share one encode and search."""
+        import asyncio
+        write_brain()
+
+        calls = []
+        def encode(texts):
+            calls.append(list(texts))
+            return np.stack([np.eye(4, dtype='float32')[2]] * len(texts))
+        monkeypatch.setattr("app.services.search._encode_query_batch", encode)
+        for name in ("_query_batcher", "_query_cache", "_result_cache", "_single_flight"):
+            monkeypatch.setattr(f"app.services.search.{name}", None)
+
+        from app.services.search import get_single_flight
+        request = SearchRequest(query="third", brain="ideas", top_k=1)
+        results = await asyncio.gather(*(search(request) for _ in range(3)))
+
+        assert calls == [["third"]]
+        assert [r[0].metadata["uid"] for r in results] == ["uid-2"] * 3
+        assert get_single_flight().stats()["coalesced"] == 2
+
+    def test_reciprocal_rank_fusion(self):
+        """Test rows ranked well by both retrievers win the fusion."""
+        scores, ids = reciprocal_rank_fusion([np.array([4, 7, 1, -1]), np.array([7, 2])], 3)
+
+        assert ids.tolist()[0] == 7
+        assert set(ids.tolist()) <= {1, 2, 4, 7}
+        assert len(ids) == 3
+        assert 0 < scores[-1] <= scores[0] < 1
+
     def test_normalize_score(self):
         """Test score normalization function."""
         assert normalize_score(0) == 1.0  # Perfect match
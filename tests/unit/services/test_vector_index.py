@@ -0,0 +1,119 @@
+"""Test vector index construction."""
+
+import pytest
+import numpy as np
+from app.config import INDEX_DEFAULTS
+import faiss
+from app.services.vector_index import (
+    build_index,
+    make_search_params,
+    search_index,
+    resolve_nlist,
+    measure_recall,
+    read_index,
+    make_selector,
+    search_subset
+)
+
+def random_vectors(rows: int, dimension: int = 16) -> np.ndarray:
+    """Create normalized random vectors."""
+    vectors = np.random.default_rng(1).standard_normal((rows, dimension)).astype('float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def index_config(**overrides) -> dict:
+    """Create index settings with a low ANN threshold for small test corpora."""
+    return {**INDEX_DEFAULTS, "min_ann_rows": 100, **overrides}
+
+@pytest.mark.unit
+class TestVectorIndex:
+    def test_small_corpus_falls_back_to_flat(self):
+        """Test ANN types are not built for tiny corpora."""
+        index, params = build_index(random_vectors(50), index_config(type="hnsw"))
+
+        assert params["type"] == "flat"
+        assert make_search_params(params["type"], index_config()) is None
+        assert index.ntotal == 50
+
+    @pytest.mark.parametrize("index_type", ["ivf", "hnsw"])
+    def test_ann_index_finds_exact_matches(self, index_type):
+        """Test trained ANN indexes return a stored vector as its own top hit."""
+        vectors = random_vectors(2000)
+        config = index_config(type=index_type, nprobe=8)
+        index, params = build_index(vectors, config)
+
+        assert params["type"] == index_type
+        assert params["rows"] == 2000
+        D, I = search_index(index, vectors[:20], 1, make_search_params(index_type, config))
+        assert (I[:, 0] == np.arange(20)).mean() >= 0.9
+
+    def test_sq8_rerank_matches_flat(self):
+        """Test exact re-ranking restores flat top-k from a compressed shortlist."""
+        vectors = random_vectors(2000)
+        index, params = build_index(vectors, index_config(type="sq8"))
+
+        assert params["type"] == "sq8"
+        assert index.sa_code_size() == 16  # one byte per dimension
+        assert measure_recall(index, vectors, vectors[:50], 5, rerank=4) == 1.0
+
+    def test_pq_requires_enough_training_rows(self):
+        """Test PQ falls back to flat when codebooks cannot be trained."""
+        _, params = build_index(random_vectors(2000), index_config(type="pq", pq_m=4))
+        assert params["type"] == "flat"
+
+        with pytest.raises(ValueError):
+            build_index(random_vectors(12000), index_config(type="pq", pq_m=5))
+
+    @pytest.mark.parametrize("index_type", ["flat", "ivf", "sq8", "hnsw"])
+    def test_mmap_read_matches_in_memory(self, tmp_path, index_type):
+        """Test memory-mapped indexes answer exactly like heap-loaded ones."""
+        vectors = random_vectors(2000)
+        config = index_config(type=index_type)
+        index, params = build_index(vectors, config)
+        path = str(tmp_path / "index.faiss")
+        faiss.write_index(index, path)
+
+        search_params = make_search_params(params["type"], config)
+        mapped = search_index(read_index(path, params["type"]), vectors[:10], 5, search_params)
+        loaded = search_index(read_index(path, params["type"], mmap=False), vectors[:10], 5, search_params)
+
+        assert np.array_equal(mapped[1], loaded[1])
+
+    @pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw", "sq8"])
+    def test_selector_restricts_results(self, index_type):
+        """Test filtered searches only return selected rows, best first."""
+        vectors = random_vectors(2000)
+        config = index_config(type=index_type, nprobe=4)
+        index, params = build_index(vectors, config)
+        mask = np.zeros(len(vectors), dtype=bool)
+        mask[::10] = True
+
+        selector = make_selector(mask)
+        search_params = make_search_params(params["type"], config, selector, selectivity=mask.mean())
+        _, ids = search_index(index, vectors[:5], 5, search_params)
+
+        assert mask[ids[ids >= 0]].all()
+        assert (ids >= 0).all()
+        # Row 0 is selected, so it is still its own nearest neighbour
+        assert ids[0][0] == 0
+
+    def test_search_subset_is_exact(self):
+        """Test exact subset search matches a flat index over the same rows."""
+        vectors = random_vectors(500)
+        rows = np.arange(1, 500, 3)
+        flat = faiss.IndexFlatIP(vectors.shape[1])
+        flat.add(vectors[rows])
+
+        _, expected = flat.search(vectors[:4], 5)
+        _, ids = search_subset(vectors, vectors[:4], rows, 5)
+
+        assert ids.tolist() == rows[expected].tolist()
+
+    def test_nlist_respects_training_size(self):
+        """Test IVF cell count is capped by available training points."""
+        assert resolve_nlist(2000, index_config(nlist=4096)) == 2000 // 39
+        assert resolve_nlist(1_000_000, index_config()) == 4000
+
+    def test_invalid_type(self):
+        """Test unknown index types are rejected."""
+        with pytest.raises(ValueError):
+            build_index(random_vectors(500), index_config(type="lsh"))
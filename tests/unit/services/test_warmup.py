@@ -0,0 +1,84 @@
+"""Test startup warm-up and readiness."""
+
+import json
+import pytest
+import faiss
+import numpy as np
+from app.services import warmup
+from app.services.warmup import Readiness, warm_up
+from app.routes.health import readiness_check
+
+class FakeModel:
+    """Encoder returning fixed-size vectors."""
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        return np.ones((len(texts), 4), dtype="float32")
+
+@pytest.mark.unit
+class TestWarmup:
+    async def test_warm_up_loads_indexed_brains(self, tmp_path, monkeypatch):
+        """Test warm-up loads indexed brains, skips the rest and becomes ready."""
+        index = faiss.IndexFlatIP(4)
+        index.add(np.eye(4, dtype="float32"))
+        files = {
+            "ideas": {"index": str(tmp_path / "index.faiss"), "meta": str(tmp_path / "meta.json")},
+            "marketing": {"index": str(tmp_path / "missing.faiss"), "meta": str(tmp_path / "missing.json")},
+        }
+        faiss.write_index(index, files["ideas"]["index"])
+        with open(files["ideas"]["meta"], "w") as f:
+            json.dump([{"uid": f"uid-{i}", "content": f"block {i}"} for i in range(4)], f)
+        monkeypatch.setattr("app.services.warmup.get_filenames", lambda brain: files[brain])
+        monkeypatch.setattr("app.services.search.get_filenames", lambda brain: files[brain])
+        model = FakeModel()
+        monkeypatch.setattr("app.services.warmup.get_model", lambda: model)
+        monkeypatch.setattr("app.services.warmup._readiness", Readiness())
+
+        readiness = await warm_up(["ideas", "marketing"])
+
+        assert readiness.ready
+        assert readiness.brains == {"ideas": "loaded", "marketing": "not indexed"}
+        assert set(readiness.phases) == {"model", "indexes", "encode", "search"}
+        assert model.calls == [warmup.WARMUP_QUERIES]
+
+    async def test_broken_brain_does_not_block_readiness(self, monkeypatch):
+        """Test a brain failing to load is recorded and the service still becomes ready."""
+        async def load_brain(brain):
+            raise ValueError(f"{brain}: corrupt index")
+        monkeypatch.setattr("app.services.warmup.os.path.exists", lambda path: True)
+        monkeypatch.setattr("app.services.warmup.load_brain", load_brain)
+        monkeypatch.setattr("app.services.warmup.get_model", FakeModel)
+        monkeypatch.setattr("app.services.warmup._readiness", Readiness())
+
+        readiness = await warm_up(["ideas"])
+
+        assert readiness.ready
+        assert readiness.error is None
+        assert readiness.brains == {"ideas": "failed: ideas: corrupt index"}
+
+    async def test_failed_warm_up_is_not_ready(self, monkeypatch):
+        """Test a model load failure is reported with its phase."""
+        def broken_model():
+            raise OSError("model download failed")
+        monkeypatch.setattr("app.services.warmup.get_model", broken_model)
+        monkeypatch.setattr("app.services.warmup._readiness", Readiness())
+
+        readiness = await warm_up([])
+
+        assert readiness.state == "failed"
+        assert readiness.error == "model: model download failed"
+
+    async def test_readiness_endpoint(self, monkeypatch):
+        """Test the readiness endpoint answers 503 until ready, then 200."""
+        readiness = Readiness()
+        monkeypatch.setattr("app.routes.health.get_readiness", lambda: readiness)
+
+        response = await readiness_check()
+        assert response.status_code == 503
+        assert json.loads(response.body)["status"] == "starting"
+
+        readiness.state = "ready"
+        response = await readiness_check()
+        assert response.status_code == 200
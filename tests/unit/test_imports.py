@@ -0,0 +1,30 @@
+"""Guard against heavy dependencies loading at import time."""
+
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).parent.parent.parent
+
+HEAVY_MODULES = ("faiss", "torch", "sentence_transformers", "transformers")
+
+def loaded_heavy_modules(module: str) -> list:
+    """Import a module in a fresh interpreter and list the heavy modules it loaded."""
+    probe = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    output = result.stdout.strip()
+    return output.split(",") if output else []
+
+@pytest.mark.unit
+class TestImports:
+    @pytest.mark.parametrize("module", ["app.server", "app.services.indexing"])
+    def test_app_import_defers_heavy_modules(self, module):
+        """Test importing the app loads no model or vector index libraries."""
+        assert loaded_heavy_modules(module) == []
+
+    def test_get_model_stays_importable_from_search(self):
+        """Test the model getter is still exported where callers expect it."""
+        from app.services.search import get_model
+        from app.services.embeddings import get_model as embeddings_get_model
+        assert get_model is embeddings_get_model